@@ -1,21 +1,86 @@
+import copy
+import time
 import numpy as np
 import gymnasium as gym
 from gymnasium import spaces
 from asteroids.main import MainGameLoop
 from asteroids.constants import *
-import math
+from asteroids.profiling import StageProfiler
+from observation_builder import ObservationBuilder, PixelObservationBuilder, RayObservationBuilder
+from reward import RewardEngine, MAX_DIST
+from recording import EpisodeRecorder
 
 class AsteroidShooterEnv(gym.Env):
-    def __init__(self):
+    # backend: simulation backend of the game loop, "sprite" or "array"
+    # obs_views: hand back the observation builder's buffers instead of copies;
+    #   they are overwritten by the next step or reset. The observation that
+    #   ends an episode is still a copy, as VecEnvs keep it as
+    #   info["terminal_observation"] across their reset, so views are safe
+    #   inside DummyVecEnv / SubprocVecEnv / SharedMemoryVecEnv (which copy
+    #   every other observation out); do not use them when stepping by hand
+    # obs_mode: "dict" for the keyed observation below, "flat" for the same
+    #   fields packed into one float32 Box (use with MlpPolicy), "rays" for
+    #   the small egocentric ray sensor Box of observation_builder.RayObservationBuilder,
+    #   "pixels" for stacked uint8 images of the game (use with CnnPolicy), see
+    #   observation_builder.PixelObservationBuilder
+    # n_rays: number of rays of the "rays" observation
+    # pixel_size: (width, height) of the "pixels" images
+    # frame_stack: number of images stacked into one "pixels" observation
+    # headless: never open a window, render() does nothing; use in workers
+    # action_repeat: physics frames of frame_dt each step() applies the action
+    #   for; observation and reward are built once, after the last frame
+    # substeps: updates per frame, each of frame_dt / substeps, so fast
+    #   shots and asteroids are tested for collisions more often
+    # profile: time every stage of step() (game stages plus observation and
+    #   reward) into self.profiler and return them in info["stage_times"]
+    # top_k: observe only the top_k most relevant asteroids, ordered by
+    #   relevance and flagged in an extra asteroids_mask field
+    # rank_by: what makes an asteroid relevant, one of
+    #   observation_builder.RANK_CRITERIA ("distance" when only top_k is
+    #   given); without top_k it orders all MAX_ASTEROIDS slots
+    # record: path of an episode file (see recording.py) every step's action,
+    #   reward and world state is appended to; None records nothing
+    # difficulty: asteroids.difficulty.DifficultySchedule of the asteroid
+    #   field, None for the fixed defaults; see set_difficulty(). Every env
+    #   plays its own copy, so envs built from one schedule change level
+    #   only at their own resets
+    def __init__(self, backend="sprite", obs_views=False, obs_mode="dict", headless=False,
+                 action_repeat=1, substeps=1, profile=False, record=None, top_k=None, rank_by=None,
+                 n_rays=32, pixel_size=(84, 84), frame_stack=4, difficulty=None):
         super().__init__()
+        if obs_mode not in ("dict", "flat", "rays", "pixels"):
+            raise ValueError(f"unknown obs_mode {obs_mode!r}, expected 'dict', 'flat', 'rays' or 'pixels'")
+        if obs_mode in ("rays", "pixels") and (top_k is not None or rank_by is not None):
+            raise ValueError(f"top_k and rank_by do not apply to the {obs_mode!r} observation")
+        if action_repeat < 1 or substeps < 1:
+            raise ValueError(f"action_repeat and substeps must be >= 1, got {action_repeat} and {substeps}")
+        if top_k is not None and top_k < 1:
+            raise ValueError(f"top_k must be >= 1, got {top_k}")
+        self.obs_mode = obs_mode
+        self.action_repeat = action_repeat
+        self.substeps = substeps
         # how many objects we’ll track at once
         self.MAX_ASTEROIDS = 200
         self.MAX_SHOTS     = 100
 
         # our game loop instance
-        self.game = MainGameLoop()
+        self.profiler = StageProfiler() if profile else None
+        self.game = MainGameLoop(backend=backend, asteroid_capacity=self.MAX_ASTEROIDS, shot_capacity=self.MAX_SHOTS,
+                                 headless=headless, profiler=self.profiler,
+                                 difficulty=copy.copy(difficulty))
+        # set_difficulty() arguments waiting for the next reset
+        self._pending_difficulty = None
         self.frame_dt  = 1/30.0
         self._last_score = 0
+        # nearest asteroid distance after the last update, for the dodge term
+        self._prev_min = MAX_DIST
+        self._reward_engine = RewardEngine()
+        self.recorder = None
+        if record is not None:
+            self.recorder = EpisodeRecorder(record, config={
+                "backend": backend, "obs_mode": obs_mode,
+                "action_repeat": action_repeat, "substeps": substeps,
+            })
 
         # Initial and dynamic telemetry fields
         self.size = self.game.game_size
@@ -29,17 +94,27 @@ class AsteroidShooterEnv(gym.Env):
         self.player_rotation = self.game.player_rotation
         self.player_turn_speed = self.game.player_turn_speed
         self.player_shoot_cooldown = self.game.player_shoot_cooldown
-        # Asteroid telemetry
+        # Asteroid and shot telemetry: self.game.telemetry(), one array view per frame
         self.number_of_alive_asteroids = self.game.number_of_alive_asteroids
-        self.asteroids_current_pos = self.game.asteroids_current_pos
-        self.asteroids_current_vel = self.game.asteroids_current_vel
-        self.asteroids_current_dist = self.game.asteroids_current_dist
-        self.asteroids_current_abs_angle = self.game.asteroids_current_abs_angle
-        self.asteroids_current_rel_angle = self.game.asteroids_current_rel_angle
-        self.asteroids_path = self.game.asteroids_path 
-        # Shot telemetry
-        self.shooter_current_pos = self.game.shooter_current_pos
-        self.shooter_current_speed = self.game.shooter_current_speed
+
+        # persistent observation buffers, filled from the game's array telemetry
+        # asteroid slots of the observation
+        n_slots = self.MAX_ASTEROIDS
+        if top_k is not None:
+            n_slots = top_k
+            rank_by = rank_by or "distance"
+        self.top_k = top_k
+        self.rank_by = rank_by
+        if obs_mode == "rays":
+            self._obs_builder = RayObservationBuilder(n_rays, copy=not obs_views)
+        elif obs_mode == "pixels":
+            width, height = pixel_size
+            self._obs_builder = PixelObservationBuilder(width, height, frame_stack, copy=not obs_views)
+        else:
+            self._obs_builder = ObservationBuilder(n_slots, self.MAX_SHOTS, copy=not obs_views,
+                                                   flat=obs_mode == "flat", rank_by=rank_by,
+                                                   count_scale=self.MAX_ASTEROIDS)
+        self.flat_layout = self._obs_builder.layout
 
         # define obeservation space
         # in the observation space we define a dict. 
@@ -59,16 +134,39 @@ class AsteroidShooterEnv(gym.Env):
             "high_score":           spaces.Box(0.0, 1.0, (1,), dtype=np.float32),
 
             "num_asteroids":        spaces.Box(0.0, 1.0, (1,), dtype=np.float32),
-            "asteroids_pos":        spaces.Box(0.0, 1.0, (self.MAX_ASTEROIDS, 2), dtype=np.float32),
-            "asteroids_vel":        spaces.Box(-1.0, 1.0, (self.MAX_ASTEROIDS, 2), dtype=np.float32),
-            "asteroids_dist":       spaces.Box(0.0, 1.0, (self.MAX_ASTEROIDS,), dtype=np.float32),
-            "asteroids_abs_angle":  spaces.Box(0.0, 1.0, (self.MAX_ASTEROIDS,), dtype=np.float32),
-            "asteroids_rel_angle":  spaces.Box(0.0, 1.0, (self.MAX_ASTEROIDS,), dtype=np.float32),
-            "asteroids_path":       spaces.Box(0.0, 1.0, (self.MAX_ASTEROIDS, 4), dtype=np.float32),
+            "asteroids_pos":        spaces.Box(0.0, 1.0, (n_slots, 2), dtype=np.float32),
+            "asteroids_vel":        spaces.Box(-1.0, 1.0, (n_slots, 2), dtype=np.float32),
+            "asteroids_dist":       spaces.Box(0.0, 1.0, (n_slots,), dtype=np.float32),
+            "asteroids_abs_angle":  spaces.Box(0.0, 1.0, (n_slots,), dtype=np.float32),
+            "asteroids_rel_angle":  spaces.Box(0.0, 1.0, (n_slots,), dtype=np.float32),
+            "asteroids_path":       spaces.Box(0.0, 1.0, (n_slots, 4), dtype=np.float32),
 
             "shots_pos":            spaces.Box(0.0, 1.0, (self.MAX_SHOTS, 2), dtype=np.float32),
             # "shots_speed":          spaces.Box(0.0, 1.0, (self.MAX_SHOTS,), dtype=np.float32),
         })
+        if rank_by is not None:
+            self.observation_space = spaces.Dict({
+                **self.observation_space.spaces,
+                "asteroids_mask":   spaces.Box(0.0, 1.0, (n_slots,), dtype=np.float32),
+            })
+
+        # in flat mode the same fields are packed back to back, each one row-major,
+        # into a single float32 vector. with the default 200 asteroids / 100 shots:
+        #   0:2        player_pos           1406:2206  asteroids_path (200, 4)
+        #   2 / 3      player_rot / cd      2206       num_asteroids
+        #   4 / 5      current / high score 2207:2407  shots_pos (100, 2)
+        #   6:406      asteroids_pos (200, 2)
+        #   406:806    asteroids_vel (200, 2)
+        #   806:1006   asteroids_dist
+        #   1006:1206  asteroids_abs_angle
+        #   1206:1406  asteroids_rel_angle
+        # self.flat_layout.describe() prints the table for any size and
+        # self.describe_obs_offset(i) names the field behind offset i
+        if obs_mode in ("flat", "rays"):
+            layout = self.flat_layout
+            self.observation_space = spaces.Box(layout.low, layout.high, dtype=np.float32)
+        elif obs_mode == "pixels":
+            self.observation_space = spaces.Box(0, 255, self._obs_builder.shape, dtype=np.uint8)
 
         # Here we define a action space. depending on the action chosen a different action occurs
         # there are two types discrete and continuos 
@@ -91,192 +189,121 @@ class AsteroidShooterEnv(gym.Env):
         }
 
     def _get_obs(self):
-        obs = {}
-
-        # — Player —
-        px, py = self.game.player_current_pos
-        obs["player_pos"]        = np.array([px/SCREEN_WIDTH, py/SCREEN_HEIGHT], dtype=np.float32)
-        obs["player_rot"]        = np.array([self.game.player_rotation / 360.0], dtype=np.float32)
-        obs["player_cd"]         = np.array([self.game.player_shoot_cooldown / PLAYER_SHOOT_COOLDOWN], dtype=np.float32)
-        # obs["player_turn_speed"] = np.array([self.game.player_turn_speed / PLAYER_TURN_SPEED], dtype=np.float32)
-
-        # — Score —
-        # Here we assume a max‐score scaling of, say, 1000 points
-        obs["current_score"] = np.array([self.game.current_score / 1000.0], dtype=np.float32)
-        obs["high_score"]    = np.array([self.game.high_score    / 1000.0], dtype=np.float32)
-
-        # — Asteroids — pad/truncate to MAX_ASTEROIDS
-        N = self.MAX_ASTEROIDS
-        # allocate
-        ap = np.zeros((N,2), dtype=np.float32)
-        av = np.zeros((N,2), dtype=np.float32)
-        ad = np.zeros((N,),   dtype=np.float32)
-        aa = np.zeros((N,),   dtype=np.float32)
-        ar = np.zeros((N,),   dtype=np.float32)
-        apa = np.zeros((N, 4), dtype=np.float32)  # path start and end points
-
-        # fill
-        for i, (pos, vel, dist, abs_ang, rel_ang, ast_pos) in enumerate(zip(
-                self.asteroids_current_pos,
-                self.asteroids_current_vel,
-                self.asteroids_current_dist,
-                self.asteroids_current_abs_angle,
-                self.asteroids_current_rel_angle,
-                self.asteroids_path
-            )):
-            if i >= N: break
-            x, y = pos
-            ap[i] = [x/SCREEN_WIDTH, y/SCREEN_HEIGHT]
-            vx, vy = vel
-            # assume max velocity of, e.g., 200 px/sec
-            av[i] = [vx/200.0, vy/200.0]
-            # normalize distance by screen‐diagonal
-            max_d = (SCREEN_WIDTH**2 + SCREEN_HEIGHT**2)**0.5
-            ad[i] = dist / max_d
-            aa[i] = abs_ang / 360.0
-            ar[i] = rel_ang / 360.0
-            # path start and end points
-            if ast_pos:
-                path_start, path_end = ast_pos
-                apa[i] = [
-                    path_start[0]/SCREEN_WIDTH, path_start[1]/SCREEN_HEIGHT,
-                    path_end[0]/SCREEN_WIDTH,   path_end[1]/SCREEN_HEIGHT
-                ]
+        return self._obs_builder.build(self.game)
 
-        obs["asteroids_pos"]       = ap
-        obs["asteroids_vel"]       = av
-        obs["asteroids_dist"]      = ad
-        obs["asteroids_abs_angle"] = aa
-        obs["asteroids_rel_angle"] = ar
-        obs["asteroids_path"]      = apa
-        obs["num_asteroids"] = np.array([len(self.asteroids_current_pos)/N], dtype=np.float32)
-
-        # — Shots — pad/truncate to MAX_SHOTS
-        M = self.MAX_SHOTS
-        sp = np.zeros((M,2), dtype=np.float32)
-        ss = np.zeros((M,),   dtype=np.float32)
-        for i, (pos, speed) in enumerate(zip(
-                self.shooter_current_pos,
-                self.shooter_current_speed,
-            )):
-            if i >= M: break
-            x, y = pos
-            sp[i] = [x/SCREEN_WIDTH, y/SCREEN_HEIGHT]
-            # assume max shot speed e.g. PLAYER_SHOOT_SPEED
-            ss[i] = speed / PLAYER_SHOOT_SPEED
-
-        obs["shots_pos"]   = sp
-        # obs["shots_speed"] = ss
-
-        return obs
+    def describe_obs_offset(self, offset):
+        # debugging helper: flat observation offset -> (field name, index)
+        if self.flat_layout is None:
+            raise ValueError(f"the {self.obs_mode!r} observation has no field layout")
+        return self.flat_layout.field_at(offset)
 
     def reset(self, *, seed=None, options=None):
+        # a seed restarts the game's own random stream; without one it carries on
+        super().reset(seed=seed)
+        if self._pending_difficulty is not None:
+            self.game.set_difficulty(*self._pending_difficulty)
+            self._pending_difficulty = None
         # populates all sprite groups, resets score, etc.
-        _ = self.game.reset()    
+        _ = self.game.reset(seed=seed)
+        self._obs_builder.reset()
         self._last_score = 0
+        dist = self.game.telemetry().asteroids_dist
+        self._prev_min = float(dist.min()) if len(dist) else MAX_DIST
+        if self.recorder is not None:
+            self.recorder.begin_episode(seed, self.get_state())
         # return the first observation
         return self._get_obs(), {}
     
 
     def step(self, action):
-        # define the space in which the agent can move 
-        max_d   = (SCREEN_WIDTH**2 + SCREEN_HEIGHT**2)**0.5
-        
-        # get the current distrubution of asteroids 
-        dists   = self.game.asteroids_current_dist
-        # calculate the min collection of asteroids in the space
-        prev_min = min(dists) if dists else max_d
-        # calculate the avg
-        prev_avg = sum(dists)/len(dists) if dists else max_d
-
-        # call the main game loop to apply user action
-        self.game.apply_action(action)
-        # update the game state
-        done = self.game.update(self.frame_dt)
+        prof = self.profiler
+        if prof is not None:
+            prof.begin_step()
+        # apply the user action and update the game state for every frame of
+        # the step, stopping early if the player gets hit
+        sub_dt = self.frame_dt / self.substeps
+        done = False
+        frames = 0
+        while frames < self.action_repeat and not done:
+            for _ in range(self.substeps):
+                self.game.apply_action(action)
+                done = self.game.update(sub_dt)
+                if done:
+                    break
+            frames += 1
         # get the new obs
+        if prof is not None:
+            t = time.perf_counter()
         obs  = self._get_obs()
+        if done and not self._obs_builder.copy:
+            # a VecEnv resets right after this step, which rewrites the views
+            # before it hands this one on as info["terminal_observation"]
+            obs = {key: buf.copy() for key, buf in obs.items()} if isinstance(obs, dict) else obs.copy()
+        if prof is not None:
+            t = prof.lap("observation", t)
 
-        # re intialize the reward
-        reward = 0.0    
-        # calculate the diff between the current score and the last score achieved 
+        # calculate the diff between the current score and the last score achieved
         delta = self.game.current_score - self._last_score
 
-         # kills + proximity‐weighted bonus
-        if delta > 0:
-            prox = 1 - (prev_min / max_d)
-            reward += 2.0 * delta
-            reward += 0.8 * delta * (1 + prox)
-
-        # # ── Action shaping ───
-        # if action in [1,2,3]:        # lateral moves
-        #     reward += 0.1
-        if action == 0:            # back-up is extra valuable
-            reward += 0.99
-        elif action == 4:            # shoot
-            # small cost per shot
-            reward -= 0.02
-            # penalty if no kill
-            if delta == 0:
-                reward -= 0.1
-
-        # Bonus for moving into sparse regions
-        # if dists:
-        #     new_avg   = sum(self.game.asteroids_current_dist)/len(self.game.asteroids_current_dist)
-        #     avg_delta = new_avg - prev_avg
-        #     reward   += max(-0.05, min(0.05, (avg_delta / max_d) * 0.8))
-
-        # Dodge bonus (getting farther from closest)
-        if dists:
-            new_min     = min(self.game.asteroids_current_dist)
-            dodge_delta = new_min - prev_min
-            prox        = 1 - (prev_min / max_d)
-            reward     += max(-0.05, min(0.05, (dodge_delta / max_d) * 0.8 * (1 + prox)))
-
-            # Border penalty
-            px, py = self.game.player_current_pos
-            margin = 250
-            if px < margin or px > SCREEN_WIDTH - margin or py < margin or py > SCREEN_HEIGHT - margin:
-                reward -= 10
-    
-            # ── Path danger penalty ──
-            danger_threshold = 40  # pixels, adjust as needed
-            asteroids_in_path = []
-            path_distances = []
-            for idx, (path_start, path_end) in enumerate(self.game.asteroids_path):
-                x0, y0 = px, py
-                x1, y1 = path_start
-                x2, y2 = path_end
-                dx, dy = x2 - x1, y2 - y1
-                if dx == dy == 0:
-                    dist = math.hypot(x0 - x1, y0 - y1)
-                else:
-                    t = max(0, min(1, ((x0 - x1) * dx + (y0 - y1) * dy) / (dx * dx + dy * dy)))
-                    proj_x = x1 + t * dx
-                    proj_y = y1 + t * dy
-                    dist = math.hypot(x0 - proj_x, y0 - proj_y)
-                if dist < danger_threshold:
-                    reward -= 2  # penalty for being in asteroid path
-                    asteroids_in_path.append(idx)
-                    path_distances.append(dist)
-
-        # Death penalty
-        if done:
-            reward -= 100.0
-
-        # ── Path kill bonus ──
-        if delta > 0 and asteroids_in_path:
-            # Agent killed at least one asteroid and was in the path of one or more
-            # Bonus increases with distance from path (up to danger_threshold)
-            for dist in path_distances:
-                bonus = 10.0 * (dist / danger_threshold)  # farther = bigger bonus
-                reward += bonus
+        # shaped reward, see reward.RewardEngine for the terms
+        tel = self.game.telemetry()
+        dist = tel.asteroids_dist
+        px, py = self.game.player_current_pos
+        reward, terms = self._reward_engine.compute_one(
+            action, delta, done, self._prev_min, px, py, dist, tel.asteroids_path, frames=frames,
+        )
+        if prof is not None:
+            prof.lap("reward", t)
 
         # Wrap up
-        # update the last score 
+        # update the last score and nearest-asteroid distance
         # return new obs reward and info
         self._last_score = self.game.current_score
-        info = {"asteroids_alive": self.game.number_of_alive_asteroids}
+        self._prev_min = float(dist.min()) if len(dist) else MAX_DIST
+        info = {
+            "asteroids_alive": self.game.number_of_alive_asteroids,
+            "frames": frames,
+            "reward_terms": terms,
+        }
+        if prof is not None:
+            info["stage_times"] = prof.last
+            info["pool_overflows"] = {kind: stats["overflows"] for kind, stats in self.game.pool_stats().items()}
+        if self.recorder is not None:
+            self.recorder.add(action, reward, done, self.game.snapshot())
         return obs, reward, done, False, info
 
+    def set_difficulty(self, difficulty=None, level=None):
+        # MainGameLoop.set_difficulty, from the next reset on, so that an
+        # episode (and its recording) plays one schedule throughout; reach
+        # all envs of a VecEnv with env_method("set_difficulty", level=...)
+        if self._pending_difficulty is not None:
+            pending, pending_level = self._pending_difficulty
+            difficulty = difficulty if difficulty is not None else pending
+            level = level if level is not None else pending_level
+        self._pending_difficulty = (difficulty, level)
+
+    def get_state(self):
+        # game state (see MainGameLoop.get_state) plus the env's reward memory
+        state = self.game.get_state()
+        state["env"] = np.array([self._last_score, self._prev_min])
+        return state
+
+    def set_state(self, state):
+        # continue from a get_state() snapshot, returns its observation
+        self.game.set_state(state)
+        last_score, self._prev_min = state["env"].tolist()
+        self._last_score = int(last_score)
+        self._obs_builder.reset()
+        return self._get_obs()
+
     def render(self):
         self.game.render()
+
+    def close(self):
+        if self.recorder is not None:
+            self.recorder.close()
+        self.game.close()
+
+    def snapshot(self):
+        # drawable state of the current frame, for viewer.AsyncViewer
+        return self.game.snapshot()
@@ -0,0 +1,231 @@
+import numpy as np
+import pygame
+import random
+from asteroids.constants import *
+from asteroids.player import Player
+from asteroids.asteroidfield import AsteroidField
+from asteroids.telemetry import Telemetry, time_to_closest_approach
+from asteroids.broadphase import overlapping
+
+
+class ArrayWorld:
+    """
+    Asteroids and shots held in preallocated NumPy arrays instead of sprites.
+
+    Rows are appended in spawn order and flagged dead when they are culled or
+    hit. Dead rows are compacted away at the start of every frame, so the row
+    order is always the order the sprite groups would iterate in.
+    """
+
+    ASTEROID_FIELDS = (
+        ("ast_pos", (2,), np.float64),
+        ("ast_vel", (2,), np.float64),
+        ("ast_radius", (), np.float64),
+        # path start xy / end xy, fixed when the asteroid spawns
+        ("ast_path", (4,), np.float64),
+        ("ast_alive", (), np.bool_),
+        # scratch and telemetry buffers, sized with the entity arrays
+        ("_ast_tmp", (2,), np.float64),
+        ("_tel_ast_pos", (2,), np.float64),
+        ("_tel_ast_vel", (2,), np.float64),
+        ("_tel_ast_dist", (), np.float64),
+        ("_tel_ast_abs", (), np.float64),
+        ("_tel_ast_rel", (), np.float64),
+        ("_tel_ast_path", (4,), np.float64),
+        ("_tel_ast_radius", (), np.float64),
+    )
+    SHOT_FIELDS = (
+        ("shot_pos", (2,), np.float64),
+        ("shot_vel", (2,), np.float64),
+        ("shot_alive", (), np.bool_),
+        ("_shot_tmp", (2,), np.float64),
+        ("_tel_shot_pos", (2,), np.float64),
+        ("_tel_shot_speed", (), np.float64),
+    )
+
+    def __init__(self, asteroid_capacity=256, shot_capacity=64):
+        self.asteroid_capacity = 0
+        self.shot_capacity = 0
+        self.n_asteroids = 0
+        self.n_shots = 0
+        self._resize(self.ASTEROID_FIELDS, "asteroid_capacity", asteroid_capacity)
+        self._resize(self.SHOT_FIELDS, "shot_capacity", shot_capacity)
+
+    def _resize(self, fields, capacity_attr, capacity):
+        # grows every array of one entity kind, keeping existing rows in place
+        old = getattr(self, capacity_attr)
+        for name, shape, dtype in fields:
+            arr = np.zeros((capacity,) + shape, dtype=dtype)
+            if old:
+                arr[:old] = getattr(self, name)
+            setattr(self, name, arr)
+        setattr(self, capacity_attr, capacity)
+
+    def clear(self):
+        self.ast_alive[:] = False
+        self.shot_alive[:] = False
+        self.n_asteroids = 0
+        self.n_shots = 0
+
+    # ——— Spawning ———
+    def add_asteroid(self, x, y, radius, vx, vy):
+        i = self.n_asteroids
+        if i == self.asteroid_capacity:
+            # never compact here: collisions hold row indices while splitting
+            self._resize(self.ASTEROID_FIELDS, "asteroid_capacity", 2 * self.asteroid_capacity)
+        self.ast_pos[i] = x, y
+        self.ast_vel[i] = vx, vy
+        self.ast_radius[i] = radius
+        # Asteroid snapshots its velocity in __init__, before the spawner
+        # assigns one, so the sprite spawn velocity is always zero and the
+        # path ends where it starts
+        self.ast_path[i] = x, y, x, y
+        self.ast_alive[i] = True
+        self.n_asteroids = i + 1
+        return i
+
+    def add_shot(self, x, y, vx, vy):
+        i = self.n_shots
+        if i == self.shot_capacity:
+            self._resize(self.SHOT_FIELDS, "shot_capacity", 2 * self.shot_capacity)
+        self.shot_pos[i] = x, y
+        self.shot_vel[i] = vx, vy
+        self.shot_alive[i] = True
+        self.n_shots = i + 1
+        return i
+
+    def split(self, i, rng=random):
+        # mirrors Asteroid.split, including its draw from the RNG
+        self.ast_alive[i] = False
+        radius = self.ast_radius[i]
+        if radius <= ASTEROID_MIN_RADIUS:
+            return
+        random_angle = rng.uniform(20, 50)
+        velocity = pygame.Vector2(self.ast_vel[i, 0], self.ast_vel[i, 1])
+        a = velocity.rotate(random_angle) * 1.2
+        b = velocity.rotate(-random_angle) * 1.2
+        x, y = self.ast_pos[i]
+        new_radius = radius - ASTEROID_MIN_RADIUS
+        self.add_asteroid(x, y, new_radius, a.x, a.y)
+        self.add_asteroid(x, y, new_radius, b.x, b.y)
+
+    # ——— Per-frame passes ———
+    def compact(self):
+        # drop dead rows, preserving spawn order
+        self.n_asteroids = self._compact(self.ASTEROID_FIELDS, self.ast_alive, self.n_asteroids)
+        self.n_shots = self._compact(self.SHOT_FIELDS, self.shot_alive, self.n_shots)
+
+    def _compact(self, fields, alive, n):
+        keep = alive[:n]
+        k = int(np.count_nonzero(keep))
+        if k == n:
+            return n
+        for name, _, _ in fields:
+            if name.startswith("_"):
+                continue
+            arr = getattr(self, name)
+            arr[:k] = arr[:n][keep]
+        alive[k:n] = False
+        return k
+
+    def integrate(self, dt, n_asteroids, n_shots):
+        # only rows that existed before this frame's spawns are moved,
+        # matching the sprite group snapshot taken by Group.update
+        tmp = self._ast_tmp[:n_asteroids]
+        np.multiply(self.ast_vel[:n_asteroids], dt, out=tmp)
+        self.ast_pos[:n_asteroids] += tmp
+        tmp = self._shot_tmp[:n_shots]
+        np.multiply(self.shot_vel[:n_shots], dt, out=tmp)
+        self.shot_pos[:n_shots] += tmp
+
+    def cull(self):
+        n = self.n_shots
+        x, y = self.shot_pos[:n, 0], self.shot_pos[:n, 1]
+        out = (x < 0) | (x > SCREEN_WIDTH) | (y < 0) | (y > SCREEN_HEIGHT)
+        self.shot_alive[:n] &= ~out
+
+        n = self.n_asteroids
+        x, y, r = self.ast_pos[:n, 0], self.ast_pos[:n, 1], self.ast_radius[:n]
+        out = (x < -r) | (x > SCREEN_WIDTH + r) | (y < -r) | (y > SCREEN_HEIGHT + r)
+        self.ast_alive[:n] &= ~out
+
+    def asteroid_rows(self):
+        return np.flatnonzero(self.ast_alive[:self.n_asteroids])
+
+    def shot_rows(self):
+        return np.flatnonzero(self.shot_alive[:self.n_shots])
+
+    def collect_telemetry(self, px, py, rotation, tca=False):
+        rows = self.asteroid_rows()
+        k = rows.size
+        pos = np.take(self.ast_pos, rows, axis=0, out=self._tel_ast_pos[:k])
+        vel = np.take(self.ast_vel, rows, axis=0, out=self._tel_ast_vel[:k])
+        dist = self._tel_ast_dist[:k]
+        abs_ang = self._tel_ast_abs[:k]
+        rel_ang = self._tel_ast_rel[:k]
+        dx = np.subtract(pos[:, 0], px, out=self._ast_tmp[:k, 0])
+        dy = np.subtract(pos[:, 1], py, out=self._ast_tmp[:k, 1])
+        np.hypot(dx, dy, out=dist)
+        np.arctan2(dy, dx, out=abs_ang)
+        np.degrees(abs_ang, out=abs_ang)
+        np.mod(abs_ang, 360, out=abs_ang)
+        np.subtract(abs_ang, rotation, out=rel_ang)
+        np.mod(rel_ang, 360, out=rel_ang)
+        path = np.take(self.ast_path, rows, axis=0, out=self._tel_ast_path[:k])
+        radius = np.take(self.ast_radius, rows, out=self._tel_ast_radius[:k])
+        ast_tca = time_to_closest_approach(pos, vel, px, py) if tca else None
+
+        rows = self.shot_rows()
+        m = rows.size
+        spos = np.take(self.shot_pos, rows, axis=0, out=self._tel_shot_pos[:m])
+        svel = np.take(self.shot_vel, rows, axis=0, out=self._shot_tmp[:m])
+        speed = np.hypot(svel[:, 0], svel[:, 1], out=self._tel_shot_speed[:m])
+
+        return Telemetry(pos, vel, dist, abs_ang, rel_ang, path, radius, spos, speed, ast_tca)
+
+    def player_hit(self, rows, px, py, player_radius):
+        dx = self.ast_pos[rows, 0] - px
+        dy = self.ast_pos[rows, 1] - py
+        return bool(np.any(np.sqrt(dx * dx + dy * dy) <= self.ast_radius[rows] + player_radius))
+
+    def shot_hits(self, rows, shot_rows, broad_phase):
+        # every overlapping (asteroid row, shot row) pair, asteroid-major in
+        # spawn order, which is the order the sprite loop visits them in
+        if rows.size == 0 or shot_rows.size == 0:
+            return []
+        a_pos, a_radius = self.ast_pos[rows], self.ast_radius[rows]
+        s_pos, s_radius = self.shot_pos[shot_rows], np.full(shot_rows.size, float(SHOT_RADIUS))
+        ia, js = broad_phase.candidate_pairs(a_pos, a_radius, s_pos, s_radius)
+        hit = overlapping(a_pos, a_radius, s_pos, s_radius, ia, js)
+        return list(zip(rows[ia[hit]].tolist(), shot_rows[js[hit]].tolist()))
+
+    def draw(self, screen):
+        for i in self.asteroid_rows():
+            pygame.draw.circle(screen, "white", self.ast_pos[i], self.ast_radius[i], 2)
+        for i in self.shot_rows():
+            pygame.draw.circle(screen, "white", self.shot_pos[i], SHOT_RADIUS, 2)
+
+
+class ArrayAsteroidField(AsteroidField):
+    """ AsteroidField whose spawns are written into an ArrayWorld. """
+
+    def __init__(self, world, rng=None):
+        super().__init__(containers=(), rng=rng)
+        self.world = world
+
+    def asteroid_count(self):
+        return len(self.world.asteroid_rows())
+
+    def spawn(self, radius, position, velocity):
+        self.world.add_asteroid(position.x, position.y, radius, velocity.x, velocity.y)
+
+
+class ArrayPlayer(Player):
+    """ Player whose shots are written into an ArrayWorld. """
+
+    def __init__(self, x, y, world, containers=None):
+        super().__init__(x, y, containers)
+        self.world = world
+
+    def spawn_shot(self, position, velocity):
+        self.world.add_shot(position.x, position.y, velocity.x, velocity.y)
@@ -3,11 +3,23 @@ from asteroids.circleshape import CircleShape
 import random
 from asteroids.constants import *
 class Asteroid(CircleShape):
-    def __init__(self, x, y, radius):
-        super().__init__(x,y,radius)
+    # rng is the random.Random (or the random module) splits draw from
+    def __init__(self, x, y, radius, containers=None, rng=None):
+        super().__init__(x,y,radius, containers)
+        self.rng = rng if rng is not None else random
         self.spawn_position = pygame.Vector2(x, y)
         self.spawn_velocity = pygame.Vector2(self.velocity)  # store initial velocity
-        
+        # path start / end only depend on spawn data, so they are built once here.
+        # the velocity is assigned after __init__, so the path is the spawn point
+        self.path = (tuple(self.spawn_position), tuple(self.get_path(ASTEROID_PATH_HORIZON)))
+
+    def respawn(self, x, y, radius, containers=None, rng=None):
+        super().respawn(x, y, radius, containers)
+        self.rng = rng if rng is not None else random
+        self.spawn_position.update(x, y)
+        self.spawn_velocity.update(self.velocity)
+        self.path = (tuple(self.spawn_position), tuple(self.get_path(ASTEROID_PATH_HORIZON)))
+
     def get_path(self, t):
         # Returns position at time t after spawn
         return self.spawn_position + self.spawn_velocity * t
@@ -23,12 +35,14 @@ class Asteroid(CircleShape):
         
         if self.radius <= ASTEROID_MIN_RADIUS:
             return
-        random_angle = random.uniform(20,50)
+        random_angle = self.rng.uniform(20,50)
         a = self.velocity.rotate(random_angle)
         b = self.velocity.rotate(-random_angle)
         
         new_radius = self.radius - ASTEROID_MIN_RADIUS
-        asteroid = Asteroid(self.position.x, self.position.y, new_radius)
+        # the halves come from the pool this asteroid was taken from, if any
+        spawn = self.pool.acquire if self.pool is not None else Asteroid
+        asteroid = spawn(self.position.x, self.position.y, new_radius, self.containers, self.rng)
         asteroid.velocity = a * 1.2
-        asteroid = Asteroid(self.position.x, self.position.y, new_radius)
+        asteroid = spawn(self.position.x, self.position.y, new_radius, self.containers, self.rng)
         asteroid.velocity = b * 1.2
\ No newline at end of file
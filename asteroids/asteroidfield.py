@@ -2,6 +2,7 @@ import pygame
 import random
 from asteroids.asteroid import Asteroid
 from asteroids.constants import *
+from asteroids.difficulty import Difficulty
 
 
 class AsteroidField(pygame.sprite.Sprite):
@@ -28,24 +29,51 @@ class AsteroidField(pygame.sprite.Sprite):
         ],
     ]
 
-    def __init__(self):
-        pygame.sprite.Sprite.__init__(self, self.containers)
+    # containers: groups of the field itself; asteroid_containers: groups
+    # its asteroids join, the first of them the one max_asteroids counts.
+    # None falls back to a class-level containers attribute if one is set,
+    # else to no groups (and an asteroid count of 0)
+    # rng: random.Random spawns and splits draw from, the random module if None
+    # pool: asteroids.pool.EntityPool of Asteroids to spawn from, None to
+    # build every asteroid anew
+    # difficulty: the asteroids.difficulty.Difficulty spawns follow, which
+    # the game may replace every frame; None plays the default one
+    def __init__(self, containers=None, asteroid_containers=None, rng=None, pool=None, difficulty=None):
+        if containers is None:
+            containers = getattr(self, "containers", ())
+        pygame.sprite.Sprite.__init__(self, containers)
+        self.asteroid_containers = asteroid_containers
+        self.rng = rng if rng is not None else random
+        self.pool = pool
         self.spawn_timer = 0.0
+        self.difficulty = difficulty if difficulty is not None else Difficulty()
 
     def spawn(self, radius, position, velocity):
-        asteroid = Asteroid(position.x, position.y, radius)
+        spawn = self.pool.acquire if self.pool is not None else Asteroid
+        asteroid = spawn(position.x, position.y, radius, self.asteroid_containers, self.rng)
         asteroid.velocity = velocity
 
+    def asteroid_count(self):
+        # asteroids alive in this field's game
+        containers = self.asteroid_containers
+        if containers is None:
+            containers = getattr(Asteroid, "containers", ())
+        return len(containers[0]) if containers else 0
+
     def update(self, dt):
+        d = self.difficulty
         self.spawn_timer += dt
-        if self.spawn_timer > ASTEROID_SPAWN_RATE:
+        if self.spawn_timer > d.spawn_interval:
             self.spawn_timer = 0
+            # a full field skips the spawn without drawing from the random stream
+            if d.max_asteroids is not None and self.asteroid_count() >= d.max_asteroids:
+                return
 
             # spawn a new asteroid at a random edge
-            edge = random.choice(self.edges)
-            speed = random.randint(40, 100)
+            edge = self.rng.choice(self.edges)
+            speed = self.rng.randint(d.speed_min, d.speed_max)
             velocity = edge[0] * speed
-            velocity = velocity.rotate(random.randint(-30, 30))
-            position = edge[1](random.uniform(0, 1))
-            kind = random.randint(1, ASTEROID_KINDS)
+            velocity = velocity.rotate(self.rng.randint(-30, 30))
+            position = edge[1](self.rng.uniform(0, 1))
+            kind = self.rng.randint(1, d.kinds)
             self.spawn(ASTEROID_MIN_RADIUS * kind, position, velocity)
\ No newline at end of file
@@ -0,0 +1,117 @@
+import numpy as np
+from asteroids.constants import *
+
+
+# Broad phases propose (asteroid, shot) index pairs that may overlap; the
+# exact circle test is left to the caller. Pairs always come back sorted
+# asteroid-major and then by shot index, which is the order the collision
+# loop in MainGameLoop.update visits them in, so kills, splits and scores do
+# not depend on which broad phase is used.
+
+# widens every reach a little so rounding can never drop a touching pair
+_SLACK = 1e-6
+
+
+def _expand_ranges(owners, starts, counts):
+    # (owner, start, count) ranges -> flat owner ids and positions
+    total = int(counts.sum())
+    if total == 0:
+        empty = np.zeros(0, dtype=np.intp)
+        return empty, empty
+    owner_ids = np.repeat(owners, counts)
+    offsets = np.repeat(starts - (np.cumsum(counts) - counts), counts)
+    return owner_ids, offsets + np.arange(total)
+
+
+def _sorted_pairs(ia, js, n_shots):
+    # one int64 sort on a combined key is far cheaper than a lexsort
+    keys = np.sort(ia * n_shots + js)
+    return keys // n_shots, keys % n_shots
+
+
+def overlapping(a_pos, a_radius, s_pos, s_radius, ia, js):
+    """ Exact circle test for candidate pairs, same arithmetic as CircleShape.collides_with. """
+    dx = a_pos[ia, 0] - s_pos[js, 0]
+    dy = a_pos[ia, 1] - s_pos[js, 1]
+    return np.sqrt(dx * dx + dy * dy) <= a_radius[ia] + s_radius[js]
+
+
+class BruteForceBroadPhase:
+    """ Every asteroid against every shot, the reference the others must agree with. """
+    name = "brute"
+
+    def candidate_pairs(self, a_pos, a_radius, s_pos, s_radius):
+        n, m = len(a_pos), len(s_pos)
+        ia = np.repeat(np.arange(n), m)
+        js = np.tile(np.arange(m), n)
+        return ia, js
+
+
+class UniformGridBroadPhase:
+    """
+    Buckets shots into square cells at least as wide as the largest possible
+    asteroid + shot reach, so an asteroid only has to look at the 3x3 block of
+    cells around its own.
+    """
+    name = "grid"
+
+    def __init__(self, cell_size=ASTEROID_MAX_RADIUS + SHOT_RADIUS):
+        self.cell_size = cell_size
+
+    def candidate_pairs(self, a_pos, a_radius, s_pos, s_radius):
+        n, m = len(a_pos), len(s_pos)
+        if n == 0 or m == 0:
+            return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+        cell = max(self.cell_size, float(a_radius.max()) + float(s_radius.max()) + _SLACK)
+        origin = np.minimum(a_pos.min(axis=0), s_pos.min(axis=0))
+        a_cells = ((a_pos - origin) // cell).astype(np.intp) + 1
+        s_cells = ((s_pos - origin) // cell).astype(np.intp) + 1
+        # one spare row on each side keeps neighbour keys from wrapping
+        stride = int(max(a_cells[:, 1].max(), s_cells[:, 1].max())) + 2
+
+        s_keys = s_cells[:, 0] * stride + s_cells[:, 1]
+        order = np.argsort(s_keys, kind="stable")
+        sorted_keys = s_keys[order]
+
+        a_keys = a_cells[:, 0] * stride + a_cells[:, 1]
+        neighbours = (np.array([-1, 0, 1])[:, None] * stride + np.array([-1, 0, 1])[None, :]).ravel()
+        query = (a_keys[:, None] + neighbours[None, :]).ravel()
+        lo = np.searchsorted(sorted_keys, query, side="left")
+        hi = np.searchsorted(sorted_keys, query, side="right")
+        owners = np.repeat(np.arange(n), len(neighbours))
+        ia, at = _expand_ranges(owners, lo, hi - lo)
+        return _sorted_pairs(ia, order[at], m)
+
+
+class SortAndSweepBroadPhase:
+    """ Sorts shots on x and keeps the ones inside each asteroid's x interval. """
+    name = "sweep"
+
+    def candidate_pairs(self, a_pos, a_radius, s_pos, s_radius):
+        n, m = len(a_pos), len(s_pos)
+        if n == 0 or m == 0:
+            return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+        order = np.argsort(s_pos[:, 0], kind="stable")
+        xs = s_pos[order, 0]
+        reach = a_radius + (float(s_radius.max()) + _SLACK)
+        lo = np.searchsorted(xs, a_pos[:, 0] - reach, side="left")
+        hi = np.searchsorted(xs, a_pos[:, 0] + reach, side="right")
+        ia, at = _expand_ranges(np.arange(n), lo, hi - lo)
+        return _sorted_pairs(ia, order[at], m)
+
+
+BROAD_PHASES = {
+    BruteForceBroadPhase.name: BruteForceBroadPhase,
+    UniformGridBroadPhase.name: UniformGridBroadPhase,
+    SortAndSweepBroadPhase.name: SortAndSweepBroadPhase,
+}
+
+
+def make_broad_phase(broad_phase):
+    # accepts a registered name or an object with candidate_pairs()
+    if isinstance(broad_phase, str):
+        try:
+            return BROAD_PHASES[broad_phase]()
+        except KeyError:
+            raise ValueError(f"unknown broad phase {broad_phase!r}, expected one of {sorted(BROAD_PHASES)}")
+    return broad_phase
@@ -1,14 +1,37 @@
 import pygame
 
 class CircleShape(pygame.sprite.Sprite):
-    def __init__(self, x,y,radius):
-        if hasattr(self,"containers"):
-            super().__init__(self.containers)
-        else:
-            super().__init__()
+    # containers are the sprite groups of the game that owns this shape;
+    # a class-level containers attribute is only used as a fallback
+    def __init__(self, x,y,radius, containers=None):
+        if containers is None:
+            containers = getattr(self, "containers", ())
+        super().__init__(containers)
+        self.containers = containers
         self.position = pygame.Vector2(x,y)
         self.velocity = pygame.Vector2(0,0)
         self.radius = radius
+        # the asteroids.pool.EntityPool this shape came from, if any, and
+        # whether that pool takes it back once killed
+        self.pool = None
+        self.pooled = False
+        # row of this shape in the game's asteroids.telemetry.TelemetryStore
+        self.slot = -1
+
+    # put a recycled shape back in play as if it had just been constructed,
+    # reusing its vectors
+    def respawn(self, x, y, radius, containers):
+        self.containers = containers
+        self.add(containers)
+        self.position.update(x, y)
+        self.velocity.update(0, 0)
+        self.radius = radius
+        self.slot = -1
+
+    def kill(self):
+        if self.pool is not None and self.alive():
+            self.pool.release(self)
+        super().kill()
         
     def draw(self,screen):
         pass
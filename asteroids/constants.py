@@ -5,6 +5,8 @@ ASTEROID_MIN_RADIUS = 20
 ASTEROID_KINDS = 3
 ASTEROID_SPAWN_RATE = 0.8
 ASTEROID_MAX_RADIUS = ASTEROID_MIN_RADIUS * ASTEROID_KINDS
+# seconds of travel covered by an asteroid's telemetry path
+ASTEROID_PATH_HORIZON = 5.0
 
 PLAYER_RADIUS = 20
 PLAYER_TURN_SPEED = 300
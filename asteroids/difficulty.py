@@ -0,0 +1,138 @@
+import copy
+import math
+from typing import NamedTuple, Optional
+import numpy as np
+from asteroids.constants import *
+
+
+class Difficulty(NamedTuple):
+    """
+    How hard the asteroid field plays. Every spawn_interval seconds the
+    field spawns an asteroid of a whole-number speed in [speed_min,
+    speed_max] and a kind in 1..kinds (radius ASTEROID_MIN_RADIUS * kind);
+    while max_asteroids are alive it skips the spawn (splits are never
+    held back). The defaults are the constants the game always played with.
+    Fields may also be arrays with one value per game (see DifficultySchedule.at).
+
+    Spawns start ASTEROID_MAX_RADIUS outside the screen, where anything
+    smaller is culled on its first frame, so fewer kinds thin the field out
+    rather than shrink its asteroids.
+    """
+    spawn_interval: float = ASTEROID_SPAWN_RATE  # seconds
+    speed_min: int = 40                          # pixels / sec
+    speed_max: int = 100
+    kinds: int = ASTEROID_KINDS
+    max_asteroids: Optional[int] = None          # None: no cap
+
+    def mix(self, other, p):
+        # p of the way from self to other, p a number or an array of games;
+        # the whole-number fields are rounded
+        def lerp(a, b):
+            return a + (b - a) * p
+
+        def whole(a, b):
+            return np.rint(lerp(a, b)).astype(np.int64) if np.ndim(p) else int(round(lerp(a, b)))
+
+        return Difficulty(
+            spawn_interval=lerp(self.spawn_interval, other.spawn_interval),
+            speed_min=whole(self.speed_min, other.speed_min),
+            speed_max=whole(self.speed_max, other.speed_max),
+            kinds=whole(self.kinds, other.kinds),
+            max_asteroids=None if self.max_asteroids is None else whole(self.max_asteroids, other.max_asteroids),
+        )
+
+
+def _check(d):
+    if not d.spawn_interval > 0:
+        raise ValueError(f"spawn_interval must be > 0, got {d.spawn_interval}")
+    if not 0 <= d.speed_min <= d.speed_max:
+        raise ValueError(f"need 0 <= speed_min <= speed_max, got {d.speed_min} and {d.speed_max}")
+    if not 1 <= d.kinds <= ASTEROID_KINDS:
+        # bigger kinds would outgrow ASTEROID_MAX_RADIUS, which spawn
+        # positions and observations are scaled by
+        raise ValueError(f"kinds must be in 1..{ASTEROID_KINDS}, got {d.kinds}")
+    if d.max_asteroids is not None and d.max_asteroids < 0:
+        raise ValueError(f"max_asteroids must be >= 0 or None, got {d.max_asteroids}")
+
+
+class DifficultySchedule:
+    """
+    The Difficulty of a game as it plays, from easy at progress 0 to hard at
+    progress 1 (hard defaults to easy, a fixed difficulty). A game's progress
+    is level + elapsed / ramp_time, clipped to [0, 1]:
+
+    - ramp_time, seconds of simulated time, ramps every episode from its
+      level up to hard; None keeps a game at its level all episode
+    - level is the curriculum's part, changed live by set_difficulty(level=...),
+      e.g. by a training callback from the agent's rolling performance
+
+    The default schedule is the fixed default Difficulty, which draws from
+    the game's random stream exactly like the field always did. The envs play
+    copies of the schedules they are given, so set_difficulty(level=...) on
+    an env never moves the caller's schedule.
+    """
+
+    def __init__(self, easy=None, hard=None, ramp_time=None, level=0.0):
+        self.easy = easy if easy is not None else Difficulty()
+        self.hard = hard if hard is not None else self.easy
+        _check(self.easy)
+        _check(self.hard)
+        if (self.easy.max_asteroids is None) != (self.hard.max_asteroids is None):
+            raise ValueError("max_asteroids must be set for both easy and hard, or for neither")
+        if ramp_time is not None and not ramp_time > 0:
+            raise ValueError(f"ramp_time must be > 0 or None, got {ramp_time}")
+        self.ramp_time = ramp_time
+        self.level = level
+        # (progress, Difficulty) of the last scalar at()
+        self._last = None
+
+    def progress(self, elapsed):
+        if self.ramp_time is None:
+            return min(max(float(self.level), 0.0), 1.0)
+        return np.clip(self.level + np.asarray(elapsed) / self.ramp_time, 0.0, 1.0)
+
+    def at(self, elapsed=0.0):
+        # the Difficulty after elapsed seconds of an episode; for an array of
+        # elapsed times (one per game) its fields are arrays too, unless
+        # nothing ramps
+        p = self.progress(elapsed)
+        if np.ndim(p):
+            return self.easy.mix(self.hard, p)
+        p = float(p)
+        if self._last is None or self._last[0] != p:
+            self._last = (p, self.easy.mix(self.hard, p))
+        return self._last[1]
+
+    def to_array(self):
+        # level, ramp_time, easy, hard as float64, NaN for None
+        def nan(v):
+            return np.nan if v is None else v
+        return np.array([self.level, nan(self.ramp_time), *map(nan, self.easy), *map(nan, self.hard)],
+                        dtype=np.float64)
+
+    @classmethod
+    def from_array(cls, values):
+        values = values.tolist()
+
+        def difficulty(v):
+            interval, speed_min, speed_max, kinds, cap = v
+            return Difficulty(interval, int(speed_min), int(speed_max), int(kinds),
+                              None if math.isnan(cap) else int(cap))
+
+        level, ramp_time = values[:2]
+        return cls(difficulty(values[2:7]), difficulty(values[7:12]),
+                   None if math.isnan(ramp_time) else ramp_time, level)
+
+
+def updated_schedule(schedule, difficulty=None, level=None):
+    # the schedule set_difficulty(difficulty, level) leaves: difficulty, a
+    # DifficultySchedule or a Difficulty to play fixed, replaces schedule;
+    # level then moves the curriculum level of the result, a copy of a given
+    # schedule so that the caller's keeps its level
+    if isinstance(difficulty, Difficulty):
+        difficulty = DifficultySchedule(difficulty)
+    if difficulty is not None:
+        schedule = copy.copy(difficulty)
+    if level is not None:
+        schedule.level = level
+    return schedule
@@ -0,0 +1,110 @@
+import contextlib
+import os
+import tempfile
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, writes stay atomic
+    fcntl = None
+
+HIGH_SCORE_FILE = "high_score.txt"
+
+
+class HighScoreStore:
+    """
+    The high score, kept in memory and written to disk only on flush().
+
+    The file is read once, on the first load(). update() only touches
+    memory, so scoring never waits on disk. flush() merges with whatever is
+    on disk (the larger value wins), writes a temporary file and moves it
+    over the old one with os.replace, so readers never see a half-written
+    file. Flushes are serialised across processes with a lock file where
+    fcntl is available, so workers sharing one file cannot lose each
+    other's records. With background=True a daemon thread also flushes
+    every interval seconds. With path=None the store lives in memory only.
+    """
+
+    def __init__(self, path=HIGH_SCORE_FILE, background=False, interval=5.0):
+        self.path = path
+        self.value = 0
+        self._loaded = False
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._stop = None
+        if background:
+            self._stop = threading.Event()
+            thread = threading.Thread(target=self._flush_loop, args=(interval,), daemon=True)
+            thread.start()
+
+    def load(self):
+        if not self._loaded:
+            self.value = max(self.value, self._read())
+            self._loaded = True
+        return self.value
+
+    def update(self, score):
+        # records a score, True if it is a new high score
+        if score <= self.value:
+            return False
+        with self._lock:
+            self.value = score
+            self._dirty = True
+        return True
+
+    def flush(self):
+        if not self._dirty or self.path is None:
+            return
+        with self._lock:
+            self._dirty = False
+            value = self.value
+        with self._file_lock():
+            value = max(value, self._read())
+            directory = os.path.dirname(os.path.abspath(self.path))
+            fd, tmp = tempfile.mkstemp(dir=directory, prefix=".high_score.")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    f.write(str(value))
+                os.replace(tmp, self.path)
+            except BaseException:
+                os.unlink(tmp)
+                raise
+        with self._lock:
+            self.value = max(self.value, value)
+
+    def close(self):
+        if self._stop is not None:
+            self._stop.set()
+        self.flush()
+
+    def _read(self):
+        if self.path is None:
+            return 0
+        try:
+            with open(self.path, "r") as f:
+                return int(f.read().strip())
+        except Exception:
+            return 0
+
+    def _file_lock(self):
+        return _FileLock(self.path + ".lock") if fcntl is not None else contextlib.nullcontext()
+
+    def _flush_loop(self, interval):
+        while not self._stop.wait(interval):
+            self.flush()
+
+
+class _FileLock:
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def __enter__(self):
+        self._file = open(self.path, "a")
+        fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        fcntl.flock(self._file, fcntl.LOCK_UN)
+        self._file.close()
+
@@ -1,15 +1,59 @@
 import sys
+import time
+import random
 import pygame
 import math
+import numpy as np
 from asteroids.constants import *
-import asteroids.constants as constants
 from asteroids.player import Player
 from asteroids.asteroid import Asteroid
 from asteroids.asteroidfield import AsteroidField
 from asteroids.shot import Shot
+from asteroids.arraysim import ArrayWorld, ArrayAsteroidField, ArrayPlayer
+from asteroids.telemetry import Snapshot, TelemetryStore
+from asteroids.broadphase import make_broad_phase
+from asteroids.highscore import HighScoreStore
+from asteroids.pool import EntityPool
+from asteroids.difficulty import DifficultySchedule, updated_schedule
 
 class MainGameLoop:
-    def __init__(self):
+    # backend="sprite" simulates every asteroid and shot as a pygame sprite,
+    # backend="array" keeps them in the preallocated arrays of an ArrayWorld.
+    # asteroid_capacity / shot_capacity size those arrays, or the sprite
+    # pools of the sprite backend (see pool_stats()).
+    # broad_phase picks how asteroid/shot candidate pairs are found, either a
+    # name from asteroids.broadphase.BROAD_PHASES or an object with candidate_pairs()
+    # headless=True never initialises pygame's display; render() is then a no-op.
+    # Every instance owns its sprite groups, so several games can share a process
+    # track_tca adds each asteroid's time to closest approach to the telemetry
+    # high_scores is the asteroids.highscore.HighScoreStore records go to,
+    # by default one for high_score.txt in the working directory
+    # profiler, an asteroids.profiling.StageProfiler, times the action, update,
+    # cull, telemetry and collisions stages; None (default) times nothing
+    # difficulty, an asteroids.difficulty.DifficultySchedule, sets how the
+    # asteroid field spawns over an episode; None plays the fixed defaults
+    def __init__(self, backend="sprite", asteroid_capacity=256, shot_capacity=64, broad_phase="sweep",
+                 headless=False, track_tca=False, high_scores=None, profiler=None, difficulty=None):
+        if backend not in ("sprite", "array"):
+            raise ValueError(f"unknown backend {backend!r}, expected 'sprite' or 'array'")
+        self.backend = backend
+        self.world = ArrayWorld(asteroid_capacity, shot_capacity) if backend == "array" else None
+        # the sprite backend recycles killed asteroids and shots, up to the
+        # same capacities, instead of building new sprites for every spawn
+        if self.world is None:
+            self.asteroid_pool = EntityPool(Asteroid, asteroid_capacity)
+            self.shot_pool = EntityPool(Shot, shot_capacity)
+            self.telemetry_store = TelemetryStore(asteroid_capacity, shot_capacity)
+        else:
+            self.asteroid_pool = self.shot_pool = self.telemetry_store = None
+        self.broad_phase = make_broad_phase(broad_phase)
+        self.headless = headless
+        self.track_tca = track_tca
+        self.high_scores = high_scores if high_scores is not None else HighScoreStore()
+        self.profiler = profiler
+        # this game's random stream, seeded through reset(seed=...)
+        self.rng = random.Random()
+        self._telemetry = None
         self.dt = None
         # Initial and dynamic telemetry fields
         self.game_size = None
@@ -23,21 +67,12 @@ class MainGameLoop:
         self.player_rotation = None
         self.player_turn_speed = None
         self.player_shoot_cooldown = None
-        # Asteroid telemetry
+        # Asteroid telemetry; the per-object telemetry is in telemetry()
         self.number_of_alive_asteroids = 0
-        self.asteroids_current_pos = []
-        self.asteroids_current_vel = []
-        self.asteroids_current_dist = []
-        self.asteroids_current_abs_angle = []
-        self.asteroids_current_rel_angle = []  # relative to player orientation
-        self.asteroids_path = [] 
-        # Shot telemetry
-        self.shooter_current_pos = []
-        self.shooter_current_speed = []
-        # Difficulty scaling: percent speed increase per second
-        self.asteroid_speed_increase_rate = 0.05
-        # Spawn rate decrease (interval reduction) per second
-        self.spawn_rate_decrease_rate = 0.05
+        # Difficulty of the asteroid field, and the simulated seconds of the
+        # current episode it is scheduled by
+        self.difficulty = difficulty if difficulty is not None else DifficultySchedule()
+        self.elapsed = 0.0
 
         self.upteable = None
         self.drawable = None
@@ -46,30 +81,38 @@ class MainGameLoop:
         self.screen = None
         self.score_font = None
         self.player = None
+        self.field = None
         self.asteroids = None
         self.shots = None
-        self.HIGH_SCORE_FILE = None
 
-    # Reset game and all states
-    def reset(self):
-        pygame.init()
-        pygame.font.init()
+    # Reset game and all states; a seed restarts this game's random stream
+    def reset(self, seed=None):
+        if seed is not None:
+            self.rng.seed(seed)
         self.current_score = 0
-        self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
         self.game_size = (SCREEN_WIDTH, SCREEN_HEIGHT)
-        clock = pygame.time.Clock()
-        self.clock = clock
-
-        # ——— Load high score from disk ———
-        self.HIGH_SCORE_FILE = "high_score.txt"
-        try:
-            with open(self.HIGH_SCORE_FILE, "r") as f:
-                self.high_score = int(f.read().strip())
-        except Exception:
-            self.high_score = 0
-
-        # Prepare font for on-screen display
-        self.score_font = pygame.font.Font(None, 36)
+
+        # ——— High score: read from disk once, then kept in memory ———
+        self.high_scores.flush()
+        self.high_score = self.high_scores.load()
+
+        self._build()
+        # Store initial player position & rotation
+        self.player_initial_pos = (self.player.position.x, self.player.position.y)
+        self.player_rotation = self.player.rotation
+
+        self.dt = 0
+        self.update(0.0)
+        return
+
+    # fresh sprite groups, field and player, with nothing spawned yet
+    def _build(self):
+        # hand the asteroids and shots of the previous game back to their pools
+        if self.asteroid_pool is not None and self.asteroids is not None:
+            for sprite in (*self.asteroids, *self.shots):
+                sprite.kill()
+            self.asteroid_pool.recycle()
+            self.shot_pool.recycle()
 
         # Sprite groups
         self.updateable = pygame.sprite.Group()
@@ -77,25 +120,103 @@ class MainGameLoop:
         self.asteroids = pygame.sprite.Group()
         self.shots = pygame.sprite.Group()
 
-        # Container setup for auto-add
-        Shot.containers = (self.shots, self.updateable, self.drawable)
-        Asteroid.containers = (self.asteroids, self.updateable, self.drawable)
-        AsteroidField.containers = self.updateable
-        Player.containers = (self.updateable, self.drawable)
+        # Containers of this game, handed to everything it spawns
+        self.shot_containers = (self.shots, self.updateable, self.drawable)
+        self.asteroid_containers = (self.asteroids, self.updateable, self.drawable)
+        player_containers = (self.updateable, self.drawable)
 
         # Create field and player
-        AsteroidField()
-        self.player = Player(SCREEN_WIDTH/2, SCREEN_HEIGHT/2)
-        # Store initial player position & rotation
-        self.player_initial_pos = (self.player.position.x, self.player.position.y)
-        self.player_rotation = self.player.rotation
+        self.elapsed = 0.0
+        if self.world is not None:
+            self.world.clear()
+            self.field = ArrayAsteroidField(self.world, self.rng)
+            self.player = ArrayPlayer(SCREEN_WIDTH/2, SCREEN_HEIGHT/2, self.world, player_containers)
+        else:
+            self.field = AsteroidField(self.updateable, self.asteroid_containers, self.rng, self.asteroid_pool)
+            self.player = Player(SCREEN_WIDTH/2, SCREEN_HEIGHT/2, player_containers, self.shot_containers,
+                                 self.shot_pool)
 
-        self.dt = 0
+    # The whole game as a dict of arrays: player (x, y, rotation, shoot timer),
+    # asteroids (n, 9: position, velocity, radius, spawn position, spawn
+    # velocity), shots (m, 4: position, velocity), clock (last dt, spawn
+    # timer, elapsed), score (current, high), the random stream and the
+    # difficulty schedule (DifficultySchedule.to_array). Either backend
+    # can set_state() what the other saved; the game then plays on the same
+    # way, up to last-bit rounding of the distances.
+    def get_state(self):
+        if self.world is not None:
+            w = self.world
+            rows, shot_rows = w.asteroid_rows(), w.shot_rows()
+            path = w.ast_path[rows]
+            spawn_vel = (path[:, 2:] - path[:, :2]) / ASTEROID_PATH_HORIZON
+            asteroids = np.column_stack((w.ast_pos[rows], w.ast_vel[rows], w.ast_radius[rows], path[:, :2], spawn_vel))
+            shots = np.column_stack((w.shot_pos[shot_rows], w.shot_vel[shot_rows]))
+        else:
+            asteroids = np.array([
+                (a.position.x, a.position.y, a.velocity.x, a.velocity.y, a.radius,
+                 a.spawn_position.x, a.spawn_position.y, a.spawn_velocity.x, a.spawn_velocity.y)
+                for a in self.asteroids
+            ], dtype=np.float64).reshape(-1, 9)
+            shots = np.array([
+                (s.position.x, s.position.y, s.velocity.x, s.velocity.y) for s in self.shots
+            ], dtype=np.float64).reshape(-1, 4)
+        _, rng_state, gauss_next = self.rng.getstate()
+        return {
+            "player": np.array([self.player.position.x, self.player.position.y,
+                                self.player.rotation, self.player.shoot_timer]),
+            "asteroids": asteroids,
+            "shots": shots,
+            "clock": np.array([self.dt, self.field.spawn_timer, self.elapsed]),
+            "score": np.array([self.current_score, self.high_score], dtype=np.int64),
+            "rng": np.array(rng_state, dtype=np.int64),
+            "rng_gauss": np.array([np.nan if gauss_next is None else gauss_next]),
+            "difficulty": self.difficulty.to_array(),
+        }
+
+    # Continue from a get_state() snapshot; telemetry is rebuilt with a
+    # zero-length frame, like reset() does
+    def set_state(self, state):
+        self._build()
+        x, y, rotation, shoot_timer = state["player"].tolist()
+        self.player.position = pygame.Vector2(x, y)
+        self.player.rotation = rotation
+        self.player.shoot_timer = shoot_timer
+        self.player_initial_pos = (SCREEN_WIDTH/2, SCREEN_HEIGHT/2)
+        # states saved before the difficulty schedule have no elapsed time or schedule
+        dt, self.field.spawn_timer, *elapsed = state["clock"].tolist()
+        self.elapsed = elapsed[0] if elapsed else 0.0
+        if "difficulty" in state:
+            self.difficulty = DifficultySchedule.from_array(state["difficulty"])
+        self.current_score, self.high_score = (int(v) for v in state["score"])
+        self.high_scores.update(self.high_score)
+
+        for x, y, vx, vy, radius, sx, sy, svx, svy in state["asteroids"].tolist():
+            if self.world is not None:
+                i = self.world.add_asteroid(x, y, radius, vx, vy)
+                self.world.ast_path[i] = sx, sy, sx + svx * ASTEROID_PATH_HORIZON, sy + svy * ASTEROID_PATH_HORIZON
+            else:
+                a = self.asteroid_pool.acquire(x, y, radius, self.asteroid_containers, self.rng)
+                a.velocity = pygame.Vector2(vx, vy)
+                a.spawn_position = pygame.Vector2(sx, sy)
+                a.spawn_velocity = pygame.Vector2(svx, svy)
+                a.path = (tuple(a.spawn_position), tuple(a.get_path(ASTEROID_PATH_HORIZON)))
+        for x, y, vx, vy in state["shots"].tolist():
+            if self.world is not None:
+                self.world.add_shot(x, y, vx, vy)
+            else:
+                shot = self.shot_pool.acquire(x, y, self.shot_containers)
+                shot.velocity = pygame.Vector2(vx, vy)
+
+        gauss_next = float(state["rng_gauss"][0])
+        self.rng.setstate((3, tuple(int(v) for v in state["rng"]), None if math.isnan(gauss_next) else gauss_next))
         self.update(0.0)
-        return
+        self.dt = dt
 
     # Apply actions from agent
     def apply_action(self, action):
+        prof = self.profiler
+        if prof is not None:
+            t = time.perf_counter()
         if action == 1:
             self.player.rotate(-self.dt)
         elif action == 2:
@@ -104,32 +225,37 @@ class MainGameLoop:
             self.player.move(self.dt)
         elif action == 4:
             self.player.shoot()
+        if prof is not None:
+            prof.lap("action", t)
+
+    # Change the difficulty from the next frame on: a DifficultySchedule
+    # replaces the current one, a Difficulty is played fixed, and level
+    # moves the curriculum level of the (new) schedule
+    def set_difficulty(self, difficulty=None, level=None):
+        self.difficulty = updated_schedule(self.difficulty, difficulty, level)
+
+    # advance one frame, True once the player is hit
+    def update(self, dt):
+        self.elapsed += dt
+        self.field.difficulty = self.difficulty.at(self.elapsed)
+        done = self._update_arrays(dt) if self.world is not None else self._update_sprites(dt)
+        if done:
+            # the episode is over: write a new record to disk now, never per kill
+            self.high_scores.flush()
+        return done
 
     # for each frame we reset all telem data 
     # continue rendering the game until user gets killed 
-    def update(self, dt):
+    def _update_sprites(self, dt):
             self.dt = dt
-
-            # Reset telemetry
-            self.asteroids_current_pos.clear()
-            self.asteroids_current_vel.clear()
-            self.asteroids_current_dist.clear()
-            self.asteroids_current_abs_angle.clear()
-            self.asteroids_current_rel_angle.clear()
-            self.shooter_current_pos.clear()
-            self.shooter_current_speed.clear()
-            self.asteroids_path.clear()
+            prof = self.profiler
+            if prof is not None:
+                t = time.perf_counter()
 
             self.updateable.update(dt)
+            if prof is not None:
+                t = prof.lap("update", t)
 
-            # # Ramping up difficulty 
-            # for a in self.asteroids:
-            #     a.velocity *= (1 + self.asteroid_speed_increase_rate * dt)
-            # constants.ASTEROID_SPAWN_RATE = max(
-            #     0.1,
-            #     constants.ASTEROID_SPAWN_RATE * (1 - self.spawn_rate_decrease_rate * dt)
-            # )
-            
             # cleanup shots so if it leaves bounds they get removed 
             for shot in list(self.shots):
                 x,y = shot.position
@@ -141,7 +267,8 @@ class MainGameLoop:
                 x,y = a.position
                 if x < -a.radius or x > SCREEN_WIDTH+a.radius or y < -a.radius or y > SCREEN_HEIGHT+a.radius:
                     a.kill()
-        
+            if prof is not None:
+                t = prof.lap("cull", t)
 
             # clamp player to game bounds
             px = max(self.player.radius, min(self.player.position.x, SCREEN_WIDTH - self.player.radius))
@@ -149,56 +276,156 @@ class MainGameLoop:
             self.player.position = pygame.Vector2(px, py)
 
             # telemetry collection
-            for a in self.asteroids:
-                pos = (a.position.x, a.position.y)
-                vel = (a.velocity.x, a.velocity.y)
-                dx, dy = pos[0]-px, pos[1]-py
-                dist = math.hypot(dx, dy)
-                abs_ang = math.degrees(math.atan2(dy, dx)) % 360
-                rel_ang = (abs_ang - self.player.rotation) % 360
-                self.asteroids_current_pos.append(pos)
-                self.asteroids_current_vel.append(vel)
-                self.asteroids_current_dist.append(dist)
-                self.asteroids_current_abs_angle.append(abs_ang)
-                self.asteroids_current_rel_angle.append(rel_ang)
-                path_start = tuple(a.spawn_position)
-                path_end   = tuple(a.get_path(5.0))
-                self.asteroids_path.append((path_start, path_end))
+            asteroids = self.asteroids.sprites()
+            shots = self.shots.sprites()
+            tel = self.telemetry_store.collect(asteroids, shots, px, py, self.player.rotation, self.track_tca)
+            self._telemetry = tel
             self.player_current_pos       = (px, py)
             self.player_rotation          = self.player.rotation
             self.player_turn_speed        = PLAYER_TURN_SPEED
             self.player_shoot_cooldown    = self.player.shoot_timer
-            
-            for shot in self.shots:
-                spos = (shot.position.x, shot.position.y)
-                speed=math.hypot(shot.velocity.x, shot.velocity.y)
-                self.shooter_current_pos.append(spos)
-                self.shooter_current_speed.append(speed)
-            self.number_of_alive_asteroids = len(self.asteroids)
+            self.number_of_alive_asteroids = len(asteroids)
+            if prof is not None:
+                t = prof.lap("telemetry", t)
 
             # collisions & scoring
             done = False
-            for a in list(self.asteroids):
+            for a in asteroids:
                 if a.collides_with(self.player):
                     done = True
-                for shot in list(self.shots):
-                    if a.collides_with(shot):
+            if asteroids and shots:
+                # the broad phase only proposes pairs, collides_with still decides;
+                # telemetry rows are in the same order as the sprite lists
+                ia, js = self.broad_phase.candidate_pairs(
+                    tel.asteroids_pos, tel.asteroids_radius,
+                    tel.shots_pos, np.full(len(shots), float(SHOT_RADIUS)),
+                )
+                for i, j in zip(ia.tolist(), js.tolist()):
+                    a, shot = asteroids[i], shots[j]
+                    # a shot only counts once, but a split asteroid keeps
+                    # colliding with the remaining shots
+                    if shot.alive() and a.collides_with(shot):
                         shot.kill(); a.split()
                         self.current_score += 1
                         if self.current_score > self.high_score:
                             self.high_score = self.current_score
-                            with open(self.HIGH_SCORE_FILE, "w") as f:
-                                f.write(str(self.high_score))
+                            self.high_scores.update(self.high_score)
+            # nothing of this frame looks at the killed sprites any more
+            self.asteroid_pool.recycle()
+            self.shot_pool.recycle()
+            if prof is not None:
+                prof.lap("collisions", t)
             return done
+
+    # same frame as update(), with each stage done as one pass over the arrays
+    def _update_arrays(self, dt):
+        self.dt = dt
+        prof = self.profiler
+        if prof is not None:
+            t = time.perf_counter()
+        world = self.world
+        world.compact()
+
+        # asteroids spawned by the field this frame are not moved until the next
+        n_asteroids, n_shots = world.n_asteroids, world.n_shots
+        self.field.update(dt)
+        self.updateable.update(dt)
+        world.integrate(dt, n_asteroids, n_shots)
+        if prof is not None:
+            t = prof.lap("update", t)
+        world.cull()
+        if prof is not None:
+            t = prof.lap("cull", t)
+
+        # clamp player to game bounds
+        px = max(self.player.radius, min(self.player.position.x, SCREEN_WIDTH - self.player.radius))
+        py = max(self.player.radius, min(self.player.position.y, SCREEN_HEIGHT - self.player.radius))
+        self.player.position = pygame.Vector2(px, py)
+
+        # telemetry collection
+        tel = world.collect_telemetry(px, py, self.player.rotation, self.track_tca)
+        self._telemetry = tel
+        self.player_current_pos       = (px, py)
+        self.player_rotation          = self.player.rotation
+        self.player_turn_speed        = PLAYER_TURN_SPEED
+        self.player_shoot_cooldown    = self.player.shoot_timer
+        self.number_of_alive_asteroids = len(tel.asteroids_dist)
+        if prof is not None:
+            t = prof.lap("telemetry", t)
+
+        # collisions & scoring
+        rows = world.asteroid_rows()
+        done = rows.size > 0 and world.player_hit(rows, px, py, self.player.radius)
+        for a, shot in world.shot_hits(rows, world.shot_rows(), self.broad_phase):
+            # a shot only counts once, but a split asteroid keeps colliding
+            # with the remaining shots exactly like the sprite loop
+            if not world.shot_alive[shot]:
+                continue
+            world.shot_alive[shot] = False
+            world.split(a, self.rng)
+            self.current_score += 1
+            if self.current_score > self.high_score:
+                self.high_score = self.current_score
+                self.high_scores.update(self.high_score)
+        if prof is not None:
+            prof.lap("collisions", t)
+        return done
+
+    # counters of the sprite pools, see asteroids.pool.EntityPool.stats;
+    # empty for the array backend, whose world grows its arrays instead
+    def pool_stats(self):
+        if self.asteroid_pool is None:
+            return {}
+        return {"asteroids": self.asteroid_pool.stats(), "shots": self.shot_pool.stats()}
+
+    # Array telemetry of the last update(), see asteroids.telemetry.Telemetry;
+    # valid until the next update()
+    def telemetry(self):
+        return self._telemetry
     
+    # window, clock and font are created once, on the first rendered frame
+    def _init_display(self):
+        pygame.init()
+        pygame.font.init()
+        self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+        self.clock = pygame.time.Clock()
+        self.score_font = pygame.font.Font(None, 36)
+
+    # persist the high score
+    def close(self):
+        self.high_scores.close()
+
+    # drawable state of the current frame, see asteroids.telemetry.Snapshot
+    def snapshot(self):
+        if self.world is not None:
+            rows, shot_rows = self.world.asteroid_rows(), self.world.shot_rows()
+            asteroids = np.column_stack((self.world.ast_pos[rows], self.world.ast_radius[rows]))
+            shots = self.world.shot_pos[shot_rows]
+        else:
+            asteroids = np.array([(a.position.x, a.position.y, a.radius) for a in self.asteroids]).reshape(-1, 3)
+            shots = np.array([(s.position.x, s.position.y) for s in self.shots]).reshape(-1, 2)
+        return Snapshot(
+            player=(self.player.position.x, self.player.position.y, self.player.rotation),
+            asteroids=asteroids.astype(np.float32),
+            shots=shots.astype(np.float32),
+            score=self.current_score,
+            high_score=self.high_score,
+        )
+
     # Render game frame 
     def render(self):
+        if self.headless:
+            return
+        if self.screen is None:
+            self._init_display()
         # let Pygame service its window system messages
         pygame.event.pump()
 
         self.screen.fill("black")
         for spr in self.drawable:
             spr.draw(self.screen)
+        if self.world is not None:
+            self.world.draw(self.screen)
         s1 = self.score_font.render(f"Score: {self.current_score}", True, pygame.Color('white'))
         s2 = self.score_font.render(f"High : {self.high_score}", True, pygame.Color('white'))
         self.screen.blit(s1, (10,10))
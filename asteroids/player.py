@@ -2,21 +2,32 @@ import pygame
 from asteroids.constants import *
 from asteroids.circleshape import CircleShape
 from asteroids.shot import Shot
+
+
+def triangle(position, rotation, radius=PLAYER_RADIUS):
+    # ship outline for a player at position facing rotation degrees
+    forward = pygame.Vector2(0, 1).rotate(rotation)
+    right = pygame.Vector2(0, 1).rotate(rotation + 90) * radius / 1.5
+    a = position + forward * radius
+    b = position - forward * radius - right
+    c = position - forward * radius + right
+    return [a, b, c]
+
+
 class Player(CircleShape):
-    def __init__(self, x, y):
-        super().__init__(x,y,PLAYER_RADIUS)
+    # shot_pool: asteroids.pool.EntityPool of Shots to fire from, None to
+    # build every shot anew
+    def __init__(self, x, y, containers=None, shot_containers=None, shot_pool=None):
+        super().__init__(x,y,PLAYER_RADIUS, containers)
+        self.shot_containers = shot_containers
+        self.shot_pool = shot_pool
         self.rotation = 0
         self.shoot_timer = 0
     def draw(self, screen):
         pygame.draw.polygon(screen,"white",self.triangle(),2)
 
     def triangle(self):
-        forward = pygame.Vector2(0, 1).rotate(self.rotation)
-        right = pygame.Vector2(0, 1).rotate(self.rotation + 90) * self.radius / 1.5
-        a = self.position + forward * self.radius
-        b = self.position - forward * self.radius - right
-        c = self.position - forward * self.radius + right
-        return [a, b, c]
+        return triangle(self.position, self.rotation, self.radius)
     
     def rotate(self,dt):
         self.rotation += PLAYER_TURN_SPEED * dt
@@ -39,8 +50,12 @@ class Player(CircleShape):
         if self.shoot_timer > 0:
             return
         self.shoot_timer = PLAYER_SHOOT_COOLDOWN
-        shot = Shot(self.position.x, self.position.y)
-        shot.velocity = pygame.Vector2(0,1).rotate(self.rotation) * PLAYER_SHOOT_SPEED
+        self.spawn_shot(self.position, pygame.Vector2(0,1).rotate(self.rotation) * PLAYER_SHOOT_SPEED)
+
+    def spawn_shot(self, position, velocity):
+        spawn = self.shot_pool.acquire if self.shot_pool is not None else Shot
+        shot = spawn(position.x, position.y, self.shot_containers)
+        shot.velocity = velocity
             
     def move(self,dt):
         forward = pygame.Vector2(0, 1).rotate(self.rotation)
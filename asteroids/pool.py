@@ -0,0 +1,65 @@
+class EntityPool:
+    """
+    Recycles the sprites of one entity class (Asteroid or Shot) so that
+    spawning reuses a killed sprite, its Vector2s and all, instead of
+    building a new one.
+
+    acquire() takes the class's constructor arguments and hands back a
+    recycled sprite put back in play with respawn(*args), or a new one when
+    none is free. A pooled sprite reports itself to the pool when killed, but
+    only becomes reusable on the next recycle(), which the game calls once
+    per frame after collisions: a sprite killed during a frame may still be
+    looked at by the rest of that frame (a split asteroid keeps colliding
+    with the remaining shots), so it must not be handed out again before.
+
+    The pool owns at most capacity sprites. When all of them are in play,
+    acquire() still builds a new sprite, so the game plays the same, but it
+    is counted in overflows and left to the garbage collector once killed.
+    """
+
+    def __init__(self, cls, capacity):
+        self.cls = cls
+        self.capacity = capacity
+        self._free = []
+        # killed since the last recycle()
+        self._dead = []
+        # sprites owned by the pool, in play or free
+        self.size = 0
+        self.in_use = 0
+        self.peak = 0
+        self.reused = 0
+        self.overflows = 0
+
+    def acquire(self, *args):
+        if self._free:
+            entity = self._free.pop()
+            entity.respawn(*args)
+            self.reused += 1
+        else:
+            entity = self.cls(*args)
+            entity.pool = self
+            entity.pooled = self.size < self.capacity
+            if entity.pooled:
+                self.size += 1
+            else:
+                self.overflows += 1
+        self.in_use += 1
+        if self.in_use > self.peak:
+            self.peak = self.in_use
+        return entity
+
+    def release(self, entity):
+        # called by CircleShape.kill() for a sprite that was still in play
+        self.in_use -= 1
+        if entity.pooled:
+            self._dead.append(entity)
+
+    def recycle(self):
+        # sprites killed since the last call become free for acquire()
+        if self._dead:
+            self._free.extend(self._dead)
+            self._dead.clear()
+
+    def stats(self):
+        return {"size": self.size, "in_use": self.in_use, "peak": self.peak,
+                "reused": self.reused, "overflows": self.overflows}
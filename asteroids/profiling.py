@@ -0,0 +1,71 @@
+import bisect
+import time
+import numpy as np
+
+# histogram bin edges in seconds: 8 log-spaced bins per decade from 1us to 1s
+_EDGES = [10 ** (e / 8) for e in range(-48, 1)]
+
+
+class StageProfiler:
+    """
+    Wall-clock timings of the named stages of a step, kept as histograms.
+
+    Callers that hold a profiler time consecutive stages with lap():
+
+        t = time.perf_counter()
+        ...                                # stage work
+        t = profiler.lap("collisions", t)
+
+    and leave the profiler as None to switch timing off, which costs one
+    `is not None` test per stage. Every lap is added to a fixed log-spaced
+    histogram per stage, and the laps since the last begin_step() are summed
+    in `last`, which the env returns as info["stage_times"].
+    """
+
+    def __init__(self):
+        self.histograms = {}
+        self.totals = {}
+        self.counts = {}
+        self.last = {}
+
+    def begin_step(self):
+        self.last = {}
+
+    def lap(self, stage, t0):
+        t1 = time.perf_counter()
+        self.add(stage, t1 - t0)
+        return t1
+
+    def add(self, stage, seconds):
+        hist = self.histograms.get(stage)
+        if hist is None:
+            hist = self.histograms[stage] = [0] * (len(_EDGES) + 1)
+            self.totals[stage] = 0.0
+            self.counts[stage] = 0
+        hist[bisect.bisect_right(_EDGES, seconds)] += 1
+        self.totals[stage] += seconds
+        self.counts[stage] += 1
+        self.last[stage] = self.last.get(stage, 0.0) + seconds
+
+    def percentile(self, stage, q):
+        # upper edge of the histogram bin holding the q-th percentile, in seconds
+        hist = np.asarray(self.histograms[stage])
+        cum = np.cumsum(hist)
+        i = int(np.searchsorted(cum, q / 100 * cum[-1]))
+        return _EDGES[min(i, len(_EDGES) - 1)]
+
+    def summary(self):
+        # {stage: {"mean", "p50", "p90", "p99", "count"}}, times in seconds
+        return {
+            stage: {
+                "mean": self.totals[stage] / self.counts[stage],
+                "p50": self.percentile(stage, 50),
+                "p90": self.percentile(stage, 90),
+                "p99": self.percentile(stage, 99),
+                "count": self.counts[stage],
+            }
+            for stage in self.histograms
+        }
+
+    def reset(self):
+        self.__init__()
@@ -0,0 +1,151 @@
+import numpy as np
+from asteroids.constants import *
+
+
+class Rasterizer:
+    """
+    Draws games into uint8 images of width x height pixels with NumPy alone,
+    no pygame display or surface involved, so it works headless and for a
+    whole batch of games in one call.
+
+    The screen is scaled down to the image (not necessarily keeping its
+    aspect ratio) and every shape is filled: asteroids and shots as disks,
+    the player as the ship triangle of Player.triangle(). A pixel is set when
+    its centre lies inside the shape, and the pixel holding the shape's
+    centre always is, so shots smaller than a pixel still show. Each kind of
+    shape is drawn for all games at once: every shape gets a stencil of
+    pixels around its centre, large enough for the biggest shape of that
+    kind, and the inside test runs over all stencils as one array operation.
+    """
+
+    ASTEROID_VALUE = 255
+    SHOT_VALUE = 255
+    PLAYER_VALUE = 128
+
+    def __init__(self, width=84, height=84):
+        self.width = width
+        self.height = height
+        # pixels per screen unit
+        self.sx = width / SCREEN_WIDTH
+        self.sy = height / SCREEN_HEIGHT
+
+    def draw(self, out, px, py, rotation, asteroids_pos, asteroids_radius, shots_pos):
+        """
+        One game into out, a (height, width) uint8 array: the player at
+        (px, py) facing rotation degrees, asteroids_pos (n, 2) with
+        asteroids_radius (n,) and shots_pos (m, 2), in screen coordinates.
+        """
+        out.fill(0)
+        out = out[None]
+        self._disks(out, np.zeros(len(asteroids_pos), dtype=np.intp), asteroids_pos[:, 0], asteroids_pos[:, 1],
+                    asteroids_radius, self.ASTEROID_VALUE)
+        self._disks(out, np.zeros(len(shots_pos), dtype=np.intp), shots_pos[:, 0], shots_pos[:, 1],
+                    np.full(len(shots_pos), SHOT_RADIUS), self.SHOT_VALUE)
+        self._ships(out, np.zeros(1, dtype=np.intp), np.array([px]), np.array([py]), np.array([rotation]))
+
+    def draw_batch(self, out, player_pos, player_rot, ast_pos, ast_radius, ast_alive, shot_pos, shot_alive,
+                   games=None):
+        """
+        Games into out, (games, height, width) uint8, possibly a view. The
+        other arguments are per-game slot arrays as AsteroidBatchVecEnv keeps
+        them: player_pos (games, 2), player_rot (games,), ast_pos (games, A, 2),
+        ast_radius / ast_alive (games, A), shot_pos (games, S, 2) and
+        shot_alive (games, S). games, when given, only draws those rows.
+        """
+        if games is None:
+            games = np.arange(len(out))
+        out[games] = 0
+        g, slot = np.nonzero(ast_alive[games])
+        g = games[g]
+        self._disks(out, g, ast_pos[g, slot, 0], ast_pos[g, slot, 1], ast_radius[g, slot], self.ASTEROID_VALUE)
+        g, slot = np.nonzero(shot_alive[games])
+        g = games[g]
+        self._disks(out, g, shot_pos[g, slot, 0], shot_pos[g, slot, 1], np.full(len(g), SHOT_RADIUS),
+                    self.SHOT_VALUE)
+        self._ships(out, games, player_pos[games, 0], player_pos[games, 1], player_rot[games])
+
+    def _stencil(self, x, y, reach):
+        # pixel columns (n, 2kx+1) and rows (n, 2ky+1) within reach screen
+        # units of each centre, the screen coordinates of their pixel
+        # centres, and the index of the centre pixel in each stencil
+        kx = int(np.ceil(reach * self.sx))
+        ky = int(np.ceil(reach * self.sy))
+        cols = np.floor(x * self.sx).astype(np.intp)[:, None] + np.arange(-kx, kx + 1)
+        rows = np.floor(y * self.sy).astype(np.intp)[:, None] + np.arange(-ky, ky + 1)
+        return cols, rows, (cols + 0.5) / self.sx, (rows + 0.5) / self.sy, kx, ky
+
+    def _scatter(self, out, games, cols, rows, inside, kx, ky, value):
+        # set the inside pixels (n, rows, cols) of every stencil that are on the image
+        inside[:, ky, kx] = True
+        inside &= ((cols >= 0) & (cols < self.width))[:, None, :]
+        inside &= ((rows >= 0) & (rows < self.height))[:, :, None]
+        k, iy, ix = np.nonzero(inside)
+        out[games[k], rows[k, iy], cols[k, ix]] = value
+
+    def _disks(self, out, games, x, y, radius, value):
+        if not len(games):
+            return
+        cols, rows, cx, cy, kx, ky = self._stencil(x, y, float(radius.max()))
+        dx = cx - x[:, None]
+        dy = cy - y[:, None]
+        inside = dx[:, None, :] ** 2 + dy[:, :, None] ** 2 <= (radius * radius)[:, None, None]
+        self._scatter(out, games, cols, rows, inside, kx, ky, value)
+
+    def _ships(self, out, games, px, py, rotation):
+        # the corners of Player.triangle(): tip a, back corners b and c
+        rad = np.radians(rotation)
+        fx, fy = -np.sin(rad), np.cos(rad)
+        rx, ry = -fy * (PLAYER_RADIUS / 1.5), fx * (PLAYER_RADIUS / 1.5)
+        ax, ay = px + fx * PLAYER_RADIUS, py + fy * PLAYER_RADIUS
+        bx, by = px - fx * PLAYER_RADIUS - rx, py - fy * PLAYER_RADIUS - ry
+        cx, cy = px - fx * PLAYER_RADIUS + rx, py - fy * PLAYER_RADIUS + ry
+        cols, rows, qx, qy, kx, ky = self._stencil(px, py, PLAYER_RADIUS * np.hypot(1.0, 1 / 1.5))
+        qx, qy = qx[:, None, :], qy[:, :, None]
+
+        def side(x0, y0, x1, y1):
+            # which side of the edge (x0, y0) -> (x1, y1) every pixel centre is on
+            return ((x1 - x0)[:, None, None] * (qy - y0[:, None, None])
+                    - (y1 - y0)[:, None, None] * (qx - x0[:, None, None]))
+
+        ab, bc, ca = side(ax, ay, bx, by), side(bx, by, cx, cy), side(cx, cy, ax, ay)
+        inside = ((ab >= 0) & (bc >= 0) & (ca >= 0)) | ((ab <= 0) & (bc <= 0) & (ca <= 0))
+        self._scatter(out, games, cols, rows, inside, kx, ky, self.PLAYER_VALUE)
+
+
+class FrameStack:
+    """
+    The last n_frames images of one game, shape (n_frames, height, width),
+    or of a batch of games, (games, n_frames, height, width), oldest first.
+
+    push() starts a new frame: the stack is written shifted by one into a
+    second buffer and the view of its newest frame is returned to draw into.
+    The two buffers alternate, so a stack handed out by current stays valid
+    until the push after next, like the batch env's observation buffers.
+    """
+
+    def __init__(self, n_frames, shape):
+        # shape: (height, width) for one game, (games, height, width) for a batch
+        shape = tuple(shape)
+        self.n_frames = n_frames
+        self._bufs = [np.zeros(shape[:-2] + (n_frames,) + shape[-2:], dtype=np.uint8) for _ in range(2)]
+        self._index = 0
+
+    @property
+    def current(self):
+        return self._bufs[self._index]
+
+    def push(self):
+        old = self._bufs[self._index]
+        self._index ^= 1
+        new = self._bufs[self._index]
+        new[..., :-1, :, :] = old[..., 1:, :, :]
+        return new[..., -1, :, :]
+
+    def fill(self, games=None):
+        # repeat the newest frame over the whole stack, for a game that just
+        # started; games picks the rows of a batch
+        stack = self.current
+        if games is None:
+            stack[...] = stack[..., -1:, :, :]
+        else:
+            stack[games] = stack[games, -1:]
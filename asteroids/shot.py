@@ -4,8 +4,11 @@ from asteroids.circleshape import CircleShape
 
 
 class Shot(CircleShape):
-    def __init__(self, x, y):
-        super().__init__(x, y, SHOT_RADIUS)
+    def __init__(self, x, y, containers=None):
+        super().__init__(x, y, SHOT_RADIUS, containers)
+
+    def respawn(self, x, y, containers=None):
+        super().respawn(x, y, SHOT_RADIUS, containers)
 
     def draw(self, screen):
         pygame.draw.circle(screen, "white", self.position, self.radius, 2)
@@ -0,0 +1,168 @@
+import math
+from itertools import chain
+from typing import NamedTuple, Optional
+import numpy as np
+
+
+class Telemetry(NamedTuple):
+    """ Per-frame asteroid and shot telemetry as arrays, one row per live object. """
+    asteroids_pos: np.ndarray        # (n, 2) pixels
+    asteroids_vel: np.ndarray        # (n, 2) pixels / sec
+    asteroids_dist: np.ndarray       # (n,) distance to the player
+    asteroids_abs_angle: np.ndarray  # (n,) degrees in [0, 360)
+    asteroids_rel_angle: np.ndarray  # (n,) degrees relative to player rotation
+    asteroids_path: np.ndarray       # (n, 4) path start xy, path end xy
+    asteroids_radius: np.ndarray     # (n,) pixels
+    shots_pos: np.ndarray            # (m, 2)
+    shots_speed: np.ndarray          # (m,)
+    asteroids_tca: Optional[np.ndarray] = None  # (n,) seconds to closest approach, if tracked
+
+
+class Snapshot(NamedTuple):
+    """ Just enough of a frame to draw it, cheap to pickle to a viewer process. """
+    player: tuple                    # (x, y, rotation)
+    asteroids: np.ndarray            # (n, 3) float32 x, y, radius
+    shots: np.ndarray                # (m, 2) float32
+    score: int
+    high_score: int
+
+
+def _rows(items, width, depth=1):
+    # flattens a list of (nested) tuples straight into an (n, width) array,
+    # several times faster than np.asarray on the tuples
+    flat = items
+    for _ in range(depth):
+        flat = chain.from_iterable(flat)
+    return np.fromiter(flat, dtype=np.float64, count=len(items) * width).reshape(-1, width)
+
+
+def time_to_closest_approach(pos, vel, px, py):
+    # seconds until each asteroid, flying straight on, is nearest to the
+    # player at (px, py); 0 for asteroids that are already moving away
+    dx = pos[:, 0] - px
+    dy = pos[:, 1] - py
+    speed2 = vel[:, 0] * vel[:, 0] + vel[:, 1] * vel[:, 1]
+    t = np.divide(-(dx * vel[:, 0] + dy * vel[:, 1]), speed2, out=np.zeros(len(pos)), where=speed2 > 0)
+    return np.maximum(t, 0.0, out=t)
+
+
+class _SlotTable:
+    """
+    Rows of per-entity fields that do not change over an entity's life.
+    Every sprite keeps the row it was given (sprite.slot, -1 until it has
+    one) for as long as it is in play; rows of sprites that left are reused.
+    """
+
+    def __init__(self, capacity, fields, read):
+        # fields: (name, shape, dtype) of every column; read(table, row,
+        # sprite) fills a new sprite's row
+        self.fields = fields + (("used", (), np.bool_),)
+        self.read = read
+        self.capacity = 0
+        self.n_used = 0
+        self._resize(capacity)
+
+    def _resize(self, capacity):
+        old = self.capacity
+        for name, shape, dtype in self.fields:
+            arr = np.zeros((capacity,) + shape, dtype=dtype)
+            if old:
+                arr[:old] = getattr(self, name)
+            setattr(self, name, arr)
+        self.capacity = capacity
+
+    def rows(self, sprites):
+        # the row of every sprite, in order, giving rows to the sprites seen
+        # for the first time and taking them back from those no longer there
+        slot_list = [s.slot for s in sprites]
+        slots = np.array(slot_list, dtype=np.intp)
+        # nothing came or went since the last call
+        if self.n_used == len(slot_list) and -1 not in slot_list:
+            return slots
+        new = np.flatnonzero(slots < 0)
+        self.used[:] = False
+        self.used[slots[slots >= 0]] = True
+        free = np.flatnonzero(~self.used)
+        if free.size < new.size:
+            capacity = self.capacity
+            self._resize(max(2 * capacity, capacity + new.size))
+            free = np.concatenate((free, np.arange(capacity, self.capacity)))
+        for i, row in zip(new.tolist(), free[:new.size].tolist()):
+            sprite = sprites[i]
+            sprite.slot = row
+            self.read(self, row, sprite)
+        slots[new] = free[:new.size]
+        self.used[free[:new.size]] = True
+        self.n_used = len(slots)
+        return slots
+
+
+def _read_asteroid(table, row, a):
+    # the velocity is assigned right after the asteroid is built, so it is
+    # read here, on the first frame the asteroid is in play
+    table.vel[row] = a.velocity
+    table.radius[row] = a.radius
+    (x0, y0), (x1, y1) = a.path
+    table.path[row] = x0, y0, x1, y1
+
+
+def _read_shot(table, row, shot):
+    table.speed[row] = math.hypot(shot.velocity.x, shot.velocity.y)
+
+
+class TelemetryStore:
+    """
+    Array telemetry of the sprite backend, kept up to date in place.
+
+    What never changes over an asteroid's or shot's life (velocity, radius,
+    path, shot speed) is written into a row of its own once, the first frame
+    it is in play, and left there until it is gone. Per frame only the
+    positions are gathered from the sprites, in sprite group (spawn) order;
+    distances and angles are derived from them with array operations into
+    buffers that are reused from frame to frame. collect() returns the frame
+    as one Telemetry, the same view the array backend produces, which stays
+    valid until the next collect().
+    """
+
+    def __init__(self, asteroid_capacity=256, shot_capacity=64):
+        self.asteroids = _SlotTable(asteroid_capacity, (
+            ("vel", (2,), np.float64),
+            ("radius", (), np.float64),
+            # path start xy / end xy
+            ("path", (4,), np.float64),
+        ), _read_asteroid)
+        self.shots = _SlotTable(shot_capacity, (("speed", (), np.float64),), _read_shot)
+        self._buffers = {}
+
+    def _buffer(self, name, n, shape=()):
+        # reused output buffer of n rows, grown as needed
+        buf = self._buffers.get(name)
+        if buf is None or len(buf) < n:
+            buf = self._buffers[name] = np.empty((max(n, 2 * len(buf) if buf is not None else 64),) + shape)
+        return buf[:n]
+
+    def collect(self, asteroids, shots, px, py, rotation, tca=False):
+        """
+        Telemetry of the asteroid and shot sprites (lists, in group order)
+        for the player at (px, py) facing rotation degrees.
+        """
+        k = len(asteroids)
+        rows = self.asteroids.rows(asteroids)
+        pos = _rows([a.position for a in asteroids], 2)
+        vel = self.asteroids.vel.take(rows, axis=0)
+        dx = np.subtract(pos[:, 0], px, out=self._buffer("dx", k))
+        dy = np.subtract(pos[:, 1], py, out=self._buffer("dy", k))
+        dist = np.hypot(dx, dy, out=self._buffer("dist", k))
+        abs_ang = np.arctan2(dy, dx, out=self._buffer("abs", k))
+        np.degrees(abs_ang, out=abs_ang)
+        np.mod(abs_ang, 360, out=abs_ang)
+        rel_ang = np.subtract(abs_ang, rotation, out=self._buffer("rel", k))
+        np.mod(rel_ang, 360, out=rel_ang)
+        path = self.asteroids.path.take(rows, axis=0)
+        radius = self.asteroids.radius.take(rows)
+        ast_tca = time_to_closest_approach(pos, vel, px, py) if tca else None
+
+        shot_rows = self.shots.rows(shots)
+        spos = _rows([s.position for s in shots], 2)
+        speed = self.shots.speed.take(shot_rows)
+        return Telemetry(pos, vel, dist, abs_ang, rel_ang, path, radius, spos, speed, ast_tca)
@@ -0,0 +1,545 @@
+import copy
+import time
+import numpy as np
+from gymnasium import spaces
+from stable_baselines3.common.vec_env import VecEnv
+from asteroids.constants import *
+from asteroids.difficulty import DifficultySchedule, updated_schedule
+from asteroids.rasterizer import FrameStack, Rasterizer
+from asteroids.telemetry import Snapshot
+from observation_builder import ASTEROID_KEYS, FlatLayout, observation_fields, relevance, top_k_indices
+from reward import RewardEngine, MAX_DIST
+
+# AsteroidField edges: travel direction, and the start position for u in [0, 1)
+_EDGE_DIRS = np.array([[1.0, 0.0], [-1.0, 0.0], [0.0, 1.0], [0.0, -1.0]])
+
+
+def _edge_positions(edge, u):
+    x = np.select(
+        [edge == 0, edge == 1],
+        [np.full_like(u, -ASTEROID_MAX_RADIUS), np.full_like(u, SCREEN_WIDTH + ASTEROID_MAX_RADIUS)],
+        u * SCREEN_WIDTH,
+    )
+    y = np.select(
+        [edge == 2, edge == 3],
+        [np.full_like(u, -ASTEROID_MAX_RADIUS), np.full_like(u, SCREEN_HEIGHT + ASTEROID_MAX_RADIUS)],
+        u * SCREEN_HEIGHT,
+    )
+    return x, y
+
+
+def _of(value, games):
+    # a Difficulty field for games: per-game arrays are indexed, numbers shared
+    return value[games] if np.ndim(value) else value
+
+
+def _rotate(x, y, degrees):
+    # pygame.Vector2.rotate for arrays
+    rad = np.radians(degrees)
+    c, s = np.cos(rad), np.sin(rad)
+    return c * x - s * y, s * x + c * y
+
+
+class AsteroidBatchVecEnv(VecEnv):
+    """
+    N independent asteroid games simulated in lockstep inside shared arrays.
+
+    Follows the rules of MainGameLoop and the reward of AsteroidShooterEnv,
+    with every stage (actions, spawning, physics, culling, collisions, reward
+    and observations) done in batched NumPy over (N, MAX) arrays instead of
+    one Python step() per game. Games that end are reset on the spot, with
+    the final observation in info["terminal_observation"] and Monitor-style
+    info["episode"] statistics, so no Monitor/VecMonitor wrapper is needed.
+
+    Randomness comes from one numpy Generator for the whole batch, so runs
+    are reproducible under seed() but do not replay the sprite game's
+    random-module sequence. Games hold at most max_asteroids asteroids and
+    max_shots shots (the observation limits without top_k); spawns beyond that
+    are dropped.
+    Observations are written into two alternating buffers, so a returned
+    observation stays valid until the step after next, which covers how
+    Stable-Baselines3 keeps _last_obs across env.step().
+
+    top_k and rank_by select and order the observed asteroids the way
+    AsteroidShooterEnv's do. obs_mode="pixels" observes stacks of frame_stack
+    uint8 images of pixel_size (width, height) like AsteroidShooterEnv's
+    "pixels" mode, with every game of the batch drawn in one rasterizer call.
+
+    difficulty is one asteroids.difficulty.DifficultySchedule for the whole
+    batch, every game ramping by its own episode time; like AsteroidShooterEnv
+    the env plays a copy of it. set_difficulty() changes it for all games
+    from the next frame on.
+    """
+
+    def __init__(self, num_envs, obs_mode="flat", max_asteroids=200, max_shots=100,
+                 frame_dt=1/30.0, high_score=0, seed=None, top_k=None, rank_by=None,
+                 pixel_size=(84, 84), frame_stack=4, difficulty=None):
+        if obs_mode not in ("dict", "flat", "pixels"):
+            raise ValueError(f"unknown obs_mode {obs_mode!r}, expected 'dict', 'flat' or 'pixels'")
+        if obs_mode == "pixels" and (top_k is not None or rank_by is not None):
+            raise ValueError("top_k and rank_by do not apply to the 'pixels' observation")
+        if top_k is not None and top_k < 1:
+            raise ValueError(f"top_k must be >= 1, got {top_k}")
+        if top_k is not None:
+            rank_by = rank_by or "distance"
+        self.obs_mode = obs_mode
+        self.top_k = top_k
+        self.rank_by = rank_by
+        # asteroid rows of the observation
+        self.obs_slots = top_k or max_asteroids
+        self.max_asteroids = max_asteroids
+        self.max_shots = max_shots
+        self.frame_dt = frame_dt
+        self.render_mode = None
+        self.rng = np.random.default_rng(seed)
+        self.difficulty = copy.copy(difficulty) if difficulty is not None else DifficultySchedule()
+        self._reward_engine = RewardEngine()
+
+        fields = observation_fields(self.obs_slots, max_shots, mask=rank_by is not None)
+        self.layout = FlatLayout(fields)
+        if obs_mode == "pixels":
+            width, height = pixel_size
+            self._rasterizer = Rasterizer(width, height)
+            self._frames = FrameStack(frame_stack, (num_envs, height, width))
+            # games whose stack is filled with their next frame
+            self._fresh = np.ones(num_envs, dtype=bool)
+            observation_space = spaces.Box(0, 255, self._frames.current.shape[1:], dtype=np.uint8)
+        elif obs_mode == "flat":
+            observation_space = spaces.Box(self.layout.low, self.layout.high, dtype=np.float32)
+        else:
+            observation_space = spaces.Dict({
+                key: spaces.Box(low, high, shape, dtype=np.float32) for key, shape, low, high in fields
+            })
+        super().__init__(num_envs, observation_space, spaces.Discrete(5))
+
+        N, A, S = num_envs, max_asteroids, max_shots
+        # — Player —
+        self.player_pos = np.zeros((N, 2))
+        self.player_rot = np.zeros(N)
+        self.shoot_timer = np.zeros(N)
+        # apply_action moves by the dt of the previous update, 0 right after a reset
+        self.action_dt = np.zeros(N)
+        # — Asteroids —
+        self.ast_pos = np.zeros((N, A, 2))
+        self.ast_vel = np.zeros((N, A, 2))
+        self.ast_radius = np.zeros((N, A))
+        # path start xy / end xy, written at spawn; the sprite game records
+        # spawn velocity before assigning it, so a path ends where it starts
+        self.ast_path = np.zeros((N, A, 4))
+        self.ast_alive = np.zeros((N, A), dtype=bool)
+        # spawn sequence numbers keep sprite-group (spawn) order across slots
+        self.ast_seq = np.zeros((N, A), dtype=np.int64)
+        # — Shots —
+        self.shot_pos = np.zeros((N, S, 2))
+        self.shot_vel = np.zeros((N, S, 2))
+        self.shot_alive = np.zeros((N, S), dtype=bool)
+        self.shot_seq = np.zeros((N, S), dtype=np.int64)
+        self._seq = 0
+        # — Game / episode —
+        self.spawn_timer = np.zeros(N)
+        # simulated seconds of every game's episode, for the difficulty schedule
+        self.elapsed = np.zeros(N)
+        self.score = np.zeros(N, dtype=np.int64)
+        self.last_score = np.zeros(N, dtype=np.int64)
+        self.high_score = np.full(N, high_score, dtype=np.int64)
+        self.prev_min = np.full(N, MAX_DIST)
+        self.ep_return = np.zeros(N)
+        self.ep_len = np.zeros(N, dtype=np.int64)
+        # like Monitor's, episode info reports "t" in seconds since the env started
+        self.t_start = time.time()
+
+        self._obs_bufs = [np.zeros((N, self.layout.size), dtype=np.float32) for _ in range(2)]
+        self._obs_views = [self.layout.unflatten(buf) for buf in self._obs_bufs]
+        self._obs_index = 0
+        # asteroid / shot rows each buffer may hold from earlier writes
+        self._obs_extent = [[self.obs_slots, max_shots], [self.obs_slots, max_shots]]
+        self._actions = np.zeros(N, dtype=np.int64)
+
+    # ——— VecEnv API ———
+    def reset(self):
+        if self._seeds[0] is not None:
+            self.rng = np.random.default_rng(self._seeds[0])
+        self._reset_seeds()
+        self._reset_options()
+        games = np.arange(self.num_envs)
+        self._reset_games(games)
+        buf = self._next_obs_buffer()
+        self._write_obs(buf, games, self._telemetry(games))
+        return self._obs(buf)
+
+    def step_async(self, actions):
+        self._actions = np.asarray(actions).reshape(self.num_envs).astype(np.int64)
+
+    def step_wait(self):
+        actions = self._actions
+        all_games = np.arange(self.num_envs)
+        self._apply_actions(actions)
+        tel, done = self._update(self.frame_dt)
+        rewards, terms = self._reward(actions, done, tel)
+        buf = self._next_obs_buffer()
+        self._write_obs(buf, all_games, tel)
+
+        self.last_score[:] = self.score
+        self.prev_min[:] = np.where(tel["any"], tel["min_dist"], MAX_DIST)
+        self.ep_return += rewards
+        self.ep_len += 1
+
+        term_rows = zip(*(terms[name].tolist() for name in RewardEngine.TERMS))
+        infos = [
+            {"asteroids_alive": int(n), "reward_terms": dict(zip(RewardEngine.TERMS, row))}
+            for n, row in zip(tel["count"].tolist(), term_rows)
+        ]
+        ended = np.flatnonzero(done)
+        if ended.size:
+            terminal = self._obs(buf, ended, copy=True)
+            now = time.time()
+            for j, i in enumerate(ended):
+                infos[i]["terminal_observation"] = (
+                    {key: value[j] for key, value in terminal.items()}
+                    if isinstance(terminal, dict) else terminal[j]
+                )
+                infos[i]["episode"] = {
+                    "r": round(float(self.ep_return[i]), 6),
+                    "l": int(self.ep_len[i]),
+                    "t": round(now - self.t_start, 6),
+                }
+            self._reset_games(ended)
+            self._write_obs(buf, ended, self._telemetry(ended))
+        return self._obs(buf), rewards.astype(np.float32), done.copy(), infos
+
+    def close(self):
+        pass
+
+    def get_attr(self, attr_name, indices=None):
+        return [getattr(self, attr_name) for _ in self._get_indices(indices)]
+
+    def set_attr(self, attr_name, value, indices=None):
+        setattr(self, attr_name, value)
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        method = getattr(self, method_name)
+        return [method(*method_args, **method_kwargs) for _ in self._get_indices(indices)]
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        return [False for _ in self._get_indices(indices)]
+
+    def set_difficulty(self, difficulty=None, level=None):
+        # see MainGameLoop.set_difficulty; env_method calls it once per game,
+        # which sets the same schedule every time
+        self.difficulty = updated_schedule(self.difficulty, difficulty, level)
+
+    def snapshot(self, game=0):
+        # drawable state of one game, for viewer.AsyncViewer
+        alive, shot_alive = self.ast_alive[game], self.shot_alive[game]
+        x, y = self.player_pos[game]
+        return Snapshot(
+            player=(float(x), float(y), float(self.player_rot[game])),
+            asteroids=np.column_stack((self.ast_pos[game, alive], self.ast_radius[game, alive])).astype(np.float32),
+            shots=self.shot_pos[game, shot_alive].astype(np.float32),
+            score=int(self.score[game]),
+            high_score=int(self.high_score[game]),
+        )
+
+    # ——— Simulation ———
+    def _reset_games(self, games):
+        self.player_pos[games] = (SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2)
+        self.player_rot[games] = 0.0
+        self.shoot_timer[games] = 0.0
+        self.action_dt[games] = 0.0
+        self.ast_alive[games] = False
+        self.shot_alive[games] = False
+        self.spawn_timer[games] = 0.0
+        self.elapsed[games] = 0.0
+        self.score[games] = 0
+        self.last_score[games] = 0
+        self.prev_min[games] = MAX_DIST
+        self.ep_return[games] = 0.0
+        self.ep_len[games] = 0
+        if self.obs_mode == "pixels":
+            self._fresh[games] = True
+
+    def _allocate(self, alive, games):
+        # lowest free slot for each request in `games` (sorted, may repeat);
+        # -1 where the game has no free slot left
+        if games.size == 0:
+            return games
+        uniq, first, counts = np.unique(games, return_index=True, return_counts=True)
+        rank = np.arange(games.size) - np.repeat(first, counts)
+        free_first = np.argsort(alive[uniq], axis=1, kind="stable")
+        n_free = alive.shape[1] - np.count_nonzero(alive[uniq], axis=1)
+        row = np.repeat(np.arange(uniq.size), counts)
+        slots = free_first[row, np.minimum(rank, alive.shape[1] - 1)]
+        return np.where(rank < n_free[row], slots, -1)
+
+    def _next_seq(self, n):
+        seq = np.arange(self._seq, self._seq + n)
+        self._seq += n
+        return seq
+
+    def _add_asteroids(self, games, x, y, radius, vx, vy):
+        slots = self._allocate(self.ast_alive, games)
+        ok = slots >= 0
+        g, s = games[ok], slots[ok]
+        self.ast_pos[g, s, 0], self.ast_pos[g, s, 1] = x[ok], y[ok]
+        self.ast_vel[g, s, 0], self.ast_vel[g, s, 1] = vx[ok], vy[ok]
+        self.ast_radius[g, s] = radius[ok]
+        self.ast_path[g, s] = np.stack([x[ok], y[ok], x[ok], y[ok]], axis=-1)
+        self.ast_alive[g, s] = True
+        self.ast_seq[g, s] = self._next_seq(g.size)
+
+    def _apply_actions(self, actions):
+        dt = self.action_dt
+        turn = np.where(actions == 1, -dt, np.where(actions == 2, dt, 0.0))
+        self.player_rot += PLAYER_TURN_SPEED * turn
+        fx, fy = _rotate(0.0, 1.0, self.player_rot)
+        move = np.where(actions == 3, PLAYER_SPEED * dt, 0.0)
+        self.player_pos[:, 0] += fx * move
+        self.player_pos[:, 1] += fy * move
+
+        shooting = np.flatnonzero((actions == 4) & (self.shoot_timer <= 0))
+        if shooting.size:
+            self.shoot_timer[shooting] = PLAYER_SHOOT_COOLDOWN
+            slots = self._allocate(self.shot_alive, shooting)
+            ok = slots >= 0
+            g, s = shooting[ok], slots[ok]
+            self.shot_pos[g, s] = self.player_pos[g]
+            self.shot_vel[g, s, 0] = fx[g] * PLAYER_SHOOT_SPEED
+            self.shot_vel[g, s, 1] = fy[g] * PLAYER_SHOOT_SPEED
+            self.shot_alive[g, s] = True
+            self.shot_seq[g, s] = self._next_seq(g.size)
+
+    def _spawn(self, dt):
+        self.spawn_timer += dt
+        self.elapsed += dt
+        d = self.difficulty.at(self.elapsed)
+        games = np.flatnonzero(self.spawn_timer > d.spawn_interval)
+        if games.size == 0:
+            return
+        self.spawn_timer[games] = 0.0
+        if d.max_asteroids is not None:
+            # full games skip their spawn
+            games = games[np.count_nonzero(self.ast_alive[games], axis=1) < _of(d.max_asteroids, games)]
+            if games.size == 0:
+                return
+        n = games.size
+        edge = self.rng.integers(0, 4, n)
+        speed = self.rng.integers(_of(d.speed_min, games), _of(d.speed_max, games) + 1, n)
+        angle = self.rng.integers(-30, 31, n)
+        u = self.rng.random(n)
+        kind = self.rng.integers(1, _of(d.kinds, games) + 1, n)
+        vx, vy = _rotate(_EDGE_DIRS[edge, 0] * speed, _EDGE_DIRS[edge, 1] * speed, angle)
+        x, y = _edge_positions(edge, u)
+        self._add_asteroids(games, x, y, (ASTEROID_MIN_RADIUS * kind).astype(np.float64), vx, vy)
+
+    def _update(self, dt):
+        self.action_dt[:] = dt
+        # asteroids spawned this frame are not moved until the next one;
+        # every pass only covers the slot columns some game is using
+        A = self._used(self.ast_alive)
+        moving = self.ast_alive[:, :A].copy()
+        self._spawn(dt)
+        self.shoot_timer -= dt
+        self.ast_pos[:, :A] += self.ast_vel[:, :A] * (dt * moving)[..., None]
+        S = self._used(self.shot_alive)
+        self.shot_pos[:, :S] += self.shot_vel[:, :S] * dt
+
+        # cull everything that left the screen
+        sx, sy = self.shot_pos[:, :S, 0], self.shot_pos[:, :S, 1]
+        self.shot_alive[:, :S] &= ~((sx < 0) | (sx > SCREEN_WIDTH) | (sy < 0) | (sy > SCREEN_HEIGHT))
+        A = self._used(self.ast_alive)
+        ax, ay, r = self.ast_pos[:, :A, 0], self.ast_pos[:, :A, 1], self.ast_radius[:, :A]
+        self.ast_alive[:, :A] &= ~((ax < -r) | (ax > SCREEN_WIDTH + r) | (ay < -r) | (ay > SCREEN_HEIGHT + r))
+
+        # clamp player to game bounds
+        np.clip(self.player_pos[:, 0], PLAYER_RADIUS, SCREEN_WIDTH - PLAYER_RADIUS, out=self.player_pos[:, 0])
+        np.clip(self.player_pos[:, 1], PLAYER_RADIUS, SCREEN_HEIGHT - PLAYER_RADIUS, out=self.player_pos[:, 1])
+
+        # telemetry is taken before collisions, like MainGameLoop.update
+        games = np.arange(self.num_envs)
+        tel = self._telemetry(games)
+        done = self._collide()
+        return tel, done
+
+    def _collide(self):
+        A = self._used(self.ast_alive)
+        S = self._used(self.shot_alive)
+        alive = self.ast_alive[:, :A]
+        pos, radius = self.ast_pos[:, :A], self.ast_radius[:, :A]
+        d = pos - self.player_pos[:, None, :]
+        done = np.any(alive & (np.sqrt(d[..., 0] ** 2 + d[..., 1] ** 2) <= radius + PLAYER_RADIUS), axis=1)
+        if A == 0 or S == 0:
+            return done
+
+        d = pos[:, :, None, :] - self.shot_pos[:, None, :S, :]
+        hit = np.sqrt(d[..., 0] ** 2 + d[..., 1] ** 2) <= radius[:, :, None] + SHOT_RADIUS
+        hit &= alive[:, :, None] & self.shot_alive[:, None, :S]
+        shot_hit = hit.any(axis=1)
+        if not shot_hit.any():
+            return done
+
+        # the sprite loop walks asteroids in spawn order, so each shot goes to
+        # the earliest-spawned asteroid it overlaps; every shot an asteroid
+        # takes splits it once more (the killed sprite keeps colliding)
+        seq = np.where(hit, self.ast_seq[:, :A, None], np.iinfo(np.int64).max)
+        owner = np.argmin(seq, axis=1)
+        g, s = np.nonzero(shot_hit)
+        a = owner[g, s]
+        self.shot_alive[g, s] = False
+        np.add.at(self.score, g, 1)
+        np.maximum(self.high_score, self.score, out=self.high_score)
+        self.ast_alive[g, a] = False
+
+        # order splits like the sprite loop: asteroid spawn order, then shot order
+        order = np.lexsort((self.shot_seq[g, s], self.ast_seq[g, a], g))
+        g, a = g[order], a[order]
+        big = self.ast_radius[g, a] > ASTEROID_MIN_RADIUS
+        g, a = g[big], a[big]
+        if g.size == 0:
+            return done
+        angle = self.rng.uniform(20, 50, g.size)
+        vx, vy = self.ast_vel[g, a, 0], self.ast_vel[g, a, 1]
+        ax, ay = _rotate(vx, vy, angle)
+        bx, by = _rotate(vx, vy, -angle)
+        x, y = self.ast_pos[g, a, 0], self.ast_pos[g, a, 1]
+        radius = self.ast_radius[g, a] - ASTEROID_MIN_RADIUS
+        # children in pairs (a, b) per split, grouped by game for allocation
+        self._add_asteroids(
+            np.repeat(g, 2), np.repeat(x, 2), np.repeat(y, 2), np.repeat(radius, 2),
+            np.column_stack([ax, bx]).ravel() * 1.2, np.column_stack([ay, by]).ravel() * 1.2,
+        )
+        return done
+
+    @staticmethod
+    def _used(alive):
+        # one past the highest live slot in any game
+        cols = np.flatnonzero(alive.any(axis=0))
+        return int(cols[-1]) + 1 if cols.size else 0
+
+    def _telemetry(self, games):
+        # live asteroids and shots of `games` in spawn order, packed to the front
+        A, S = self._used(self.ast_alive[games]), self._used(self.shot_alive[games])
+        alive = self.ast_alive[games, :A]
+        order = np.argsort(np.where(alive, self.ast_seq[games, :A], np.iinfo(np.int64).max), axis=1, kind="stable")
+        count = np.count_nonzero(alive, axis=1)
+        valid = np.arange(A)[None, :] < count[:, None]
+        rows = games[:, None]
+        pos = self.ast_pos[rows, order]
+        vel = self.ast_vel[rows, order]
+        path = self.ast_path[rows, order]
+        radius = self.ast_radius[rows, order]
+        player = self.player_pos[games]
+        dx = pos[..., 0] - player[:, 0, None]
+        dy = pos[..., 1] - player[:, 1, None]
+        dist = np.hypot(dx, dy)
+        abs_ang = np.degrees(np.arctan2(dy, dx)) % 360
+        rel_ang = (abs_ang - self.player_rot[games, None]) % 360
+
+        shot_alive = self.shot_alive[games, :S]
+        shot_order = np.argsort(np.where(shot_alive, self.shot_seq[games, :S], np.iinfo(np.int64).max), axis=1, kind="stable")
+        shot_count = np.count_nonzero(shot_alive, axis=1)
+        shot_valid = np.arange(S)[None, :] < shot_count[:, None]
+        shot_pos = self.shot_pos[rows, shot_order]
+
+        any_ast = count > 0
+        min_dist = np.where(valid, dist, np.inf).min(axis=1, initial=np.inf)
+        return {
+            "count": count, "valid": valid, "any": any_ast, "min_dist": min_dist,
+            "pos": pos, "vel": vel, "dist": dist, "abs": abs_ang, "rel": rel_ang, "path": path, "radius": radius,
+            "player": player.copy(),
+            "shot_count": shot_count, "shot_valid": shot_valid, "shot_pos": shot_pos,
+        }
+
+    # ——— Reward ———
+    def _reward(self, actions, done, tel):
+        # AsteroidShooterEnv.step reward, per game
+        return self._reward_engine.compute(
+            actions, self.score - self.last_score, done, self.prev_min,
+            tel["player"], tel["dist"], tel["path"], tel["valid"],
+        )
+
+    # ——— Observations ———
+    def _next_obs_buffer(self):
+        if self.obs_mode == "pixels":
+            self._frames.push()
+            return None
+        self._obs_index ^= 1
+        return self._obs_index
+
+    def _obs(self, buf, games=None, copy=False):
+        if self.obs_mode == "pixels":
+            stack = self._frames.current
+            if games is not None:
+                return stack[games]
+            return stack.copy() if copy else stack
+        flat = self._obs_bufs[buf]
+        if games is not None:
+            flat = flat[games]
+        elif copy:
+            flat = flat.copy()
+        if self.obs_mode == "flat":
+            return flat
+        if games is None and not copy:
+            return self._obs_views[buf]
+        return self.layout.unflatten(flat)
+
+    def _write_pixels(self, games):
+        newest = self._frames.current[:, -1]
+        self._rasterizer.draw_batch(newest, self.player_pos, self.player_rot, self.ast_pos, self.ast_radius,
+                                    self.ast_alive, self.shot_pos, self.shot_alive, games)
+        fresh = games[self._fresh[games]]
+        if fresh.size:
+            self._frames.fill(fresh)
+            self._fresh[fresh] = False
+
+    def _write_obs(self, buf, games, tel):
+        if self.obs_mode == "pixels":
+            self._write_pixels(games)
+            return
+        o = self._obs_views[buf]
+        A = tel["pos"].shape[1]
+        S = tel["shot_pos"].shape[1]
+        valid = tel["valid"]
+
+        player = tel["player"]
+        o["player_pos"][games] = player / (SCREEN_WIDTH, SCREEN_HEIGHT)
+        o["player_rot"][games, 0] = self.player_rot[games] / 360.0
+        o["player_cd"][games, 0] = self.shoot_timer[games] / PLAYER_SHOOT_COOLDOWN
+        o["current_score"][games, 0] = self.score[games] / 1000.0
+        o["high_score"][games, 0] = self.high_score[games] / 1000.0
+        o["num_asteroids"][games, 0] = tel["count"] / self.max_asteroids
+
+        A = min(A, self.obs_slots)
+        if self.rank_by is None:
+            v = valid[:, :A]
+            pos, vel, dist = tel["pos"][:, :A], tel["vel"][:, :A], tel["dist"][:, :A]
+            abs_ang, rel_ang, path = tel["abs"][:, :A], tel["rel"][:, :A], tel["path"][:, :A]
+        else:
+            score = relevance(self.rank_by, tel["pos"], tel["vel"], tel["radius"], player[:, 0, None], player[:, 1, None])
+            sel = top_k_indices(np.where(valid, score, np.inf), A)
+            v = np.take_along_axis(valid, sel, axis=1)
+            pos = np.take_along_axis(tel["pos"], sel[..., None], axis=1)
+            vel = np.take_along_axis(tel["vel"], sel[..., None], axis=1)
+            path = np.take_along_axis(tel["path"], sel[..., None], axis=1)
+            dist, abs_ang, rel_ang = (np.take_along_axis(tel[key], sel, axis=1) for key in ("dist", "abs", "rel"))
+            o["asteroids_mask"][games, :A] = v
+        o["asteroids_pos"][games, :A] = np.where(v[..., None], pos / (SCREEN_WIDTH, SCREEN_HEIGHT), 0.0)
+        o["asteroids_vel"][games, :A] = np.where(v[..., None], vel / 200.0, 0.0)
+        o["asteroids_dist"][games, :A] = np.where(v, dist / MAX_DIST, 0.0)
+        o["asteroids_abs_angle"][games, :A] = np.where(v, abs_ang / 360.0, 0.0)
+        o["asteroids_rel_angle"][games, :A] = np.where(v, rel_ang / 360.0, 0.0)
+        path = path / (SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_WIDTH, SCREEN_HEIGHT)
+        o["asteroids_path"][games, :A] = np.where(v[..., None], path, 0.0)
+        extent = self._obs_extent[buf]
+        if A < extent[0]:
+            for key in ASTEROID_KEYS:
+                if key in o:
+                    o[key][games, A:extent[0]] = 0.0
+
+        S = min(S, self.max_shots)
+        o["shots_pos"][games, :S] = np.where(tel["shot_valid"][:, :S, None], tel["shot_pos"][:, :S] / (SCREEN_WIDTH, SCREEN_HEIGHT), 0.0)
+        if S < extent[1]:
+            o["shots_pos"][games, S:extent[1]] = 0.0
+        if len(games) == self.num_envs:
+            extent[:] = A, S
+        else:
+            extent[:] = max(extent[0], A), max(extent[1], S)
@@ -0,0 +1,4 @@
+# python -m benchmarks runs the step-throughput suite, see benchmarks/throughput.py
+from benchmarks.throughput import main
+
+main()
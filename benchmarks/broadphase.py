@@ -0,0 +1,81 @@
+# Micro-benchmark for the asteroid/shot broad phases.
+#
+#   python -m benchmarks.broadphase [--sizes 25 50 100 ...] [--repeat 200]
+#
+# For each object count it scatters asteroids and shots over the screen,
+# times candidate generation plus the exact circle test for every broad
+# phase, checks that each one finds the same hits as brute force, and times
+# the original nested collides_with loop over sprites for reference.
+import argparse
+import time
+import numpy as np
+from asteroids.constants import *
+from asteroids.circleshape import CircleShape
+from asteroids.broadphase import BROAD_PHASES, overlapping
+
+
+def scatter(rng, n_asteroids, n_shots):
+    a_pos = np.column_stack([rng.uniform(0, SCREEN_WIDTH, n_asteroids), rng.uniform(0, SCREEN_HEIGHT, n_asteroids)])
+    a_radius = ASTEROID_MIN_RADIUS * rng.integers(1, ASTEROID_KINDS + 1, n_asteroids).astype(np.float64)
+    s_pos = np.column_stack([rng.uniform(0, SCREEN_WIDTH, n_shots), rng.uniform(0, SCREEN_HEIGHT, n_shots)])
+    s_radius = np.full(n_shots, float(SHOT_RADIUS))
+    return a_pos, a_radius, s_pos, s_radius
+
+
+def time_call(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def hits(broad_phase, a_pos, a_radius, s_pos, s_radius):
+    ia, js = broad_phase.candidate_pairs(a_pos, a_radius, s_pos, s_radius)
+    hit = overlapping(a_pos, a_radius, s_pos, s_radius, ia, js)
+    return ia[hit], js[hit], len(ia)
+
+
+def sprite_loop(asteroids, shots):
+    # the pre-broad-phase collision loop, minus the kills
+    found = 0
+    for a in asteroids:
+        for shot in shots:
+            if a.collides_with(shot):
+                found += 1
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Asteroid/shot broad phase micro-benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[25, 50, 100, 200, 400, 800])
+    parser.add_argument("--shots-per-asteroid", type=float, default=0.5)
+    parser.add_argument("--repeat", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    phases = {name: cls() for name, cls in BROAD_PHASES.items()}
+    print(f"{'asteroids':>9} {'shots':>6} {'sprite loop':>12} " + " ".join(f"{name + ' (pairs)':>18}" for name in phases))
+    for n in args.sizes:
+        m = max(1, int(n * args.shots_per_asteroid))
+        a_pos, a_radius, s_pos, s_radius = scatter(rng, n, m)
+
+        ref = hits(phases["brute"], a_pos, a_radius, s_pos, s_radius)
+        cols = []
+        for name, phase in phases.items():
+            got = hits(phase, a_pos, a_radius, s_pos, s_radius)
+            if not (np.array_equal(got[0], ref[0]) and np.array_equal(got[1], ref[1])):
+                raise AssertionError(f"{name} broad phase disagrees with brute force at {n} asteroids")
+            t = time_call(lambda: hits(phase, a_pos, a_radius, s_pos, s_radius), args.repeat)
+            cols.append(f"{t * 1e6:9.1f}us ({got[2]:>5})")
+
+        asteroids = [CircleShape(x, y, r) for (x, y), r in zip(a_pos.tolist(), a_radius.tolist())]
+        shots = [CircleShape(x, y, r) for (x, y), r in zip(s_pos.tolist(), s_radius.tolist())]
+        t_loop = time_call(lambda: sprite_loop(asteroids, shots), max(1, args.repeat // 10))
+        print(f"{n:>9} {m:>6} {t_loop * 1e6:10.1f}us " + " ".join(f"{c:>18}" for c in cols))
+
+
+if __name__ == "__main__":
+    main()
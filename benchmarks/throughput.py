@@ -0,0 +1,297 @@
+# Step-throughput benchmarks for the env, the game loop and its stages.
+#
+#   python -m benchmarks [--benchmarks env_step game_update ...]
+#                        [--backends sprite array] [--densities 25:5 100:20 200:40]
+#                        [--policy random|aim] [--steps 500] [--json out.json]
+#                        [--compare baseline.json]
+#
+# Every benchmark drives a headless AsteroidShooterEnv. Before each timed
+# call the field is topped up to the requested number of asteroids and shots
+# (away from the player, so episodes run long), which keeps the density
+# fixed however the policy plays. Reported per benchmark/backend/density:
+# calls per second, latency percentiles, and from a separate tracemalloc
+# pass the peak bytes allocated inside one call and the bytes it leaves
+# allocated. --json writes the results with the commit they were measured on;
+# --compare prints the change against such a file and exits non-zero when a
+# benchmark got slower than --tolerance.
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pygame
+from asteroids.constants import *
+from asteroids.highscore import HighScoreStore
+from asteroids.broadphase import overlapping
+from asteroid_shooter_env import AsteroidShooterEnv
+
+# nothing is topped up within this distance of the player
+SAFE_RADIUS = 150.0
+
+
+class Scenario:
+    """ A seeded headless env held at a fixed asteroid / shot density. """
+
+    def __init__(self, backend, n_asteroids, n_shots, policy, seed, high_score_path):
+        random.seed(seed)
+        self.rng = np.random.default_rng(seed)
+        self.env = AsteroidShooterEnv(backend=backend, obs_mode="flat", headless=True)
+        # never touch the real high_score.txt
+        self.env.game.high_scores = HighScoreStore(high_score_path)
+        self.game = self.env.game
+        self.n_asteroids = n_asteroids
+        self.n_shots = n_shots
+        self.policy = policy
+        self.env.reset()
+
+    def action(self):
+        if self.policy == "aim":
+            return self._aim()
+        return int(self.rng.integers(5))
+
+    def _aim(self):
+        # turn towards the nearest asteroid and shoot once facing it
+        tel = self.game.telemetry()
+        if len(tel.asteroids_dist) == 0:
+            return 0
+        px, py = self.game.player_current_pos
+        ax, ay = tel.asteroids_pos[int(np.argmin(tel.asteroids_dist))]
+        want = math.degrees(math.atan2(-(ax - px), ay - py)) % 360
+        diff = (want - self.game.player.rotation % 360 + 540) % 360 - 180
+        if abs(diff) < 8:
+            return 4
+        return 2 if diff > 0 else 1
+
+    def top_up(self):
+        px, py = self.game.player_current_pos
+        missing = self.n_asteroids - self.game.number_of_alive_asteroids
+        for _ in range(max(0, missing)):
+            x, y = self._away_from(px, py)
+            vx, vy = self.rng.uniform(-60, 60, 2)
+            kind = int(self.rng.integers(1, ASTEROID_KINDS + 1))
+            self.game.field.spawn(ASTEROID_MIN_RADIUS * kind, pygame.Vector2(x, y), pygame.Vector2(vx, vy))
+        missing = self.n_shots - len(self.game.telemetry().shots_pos)
+        for _ in range(max(0, missing)):
+            x, y = self.rng.uniform(0, SCREEN_WIDTH), self.rng.uniform(0, SCREEN_HEIGHT)
+            angle = self.rng.uniform(0, 2 * math.pi)
+            velocity = pygame.Vector2(math.cos(angle), math.sin(angle)) * PLAYER_SHOOT_SPEED
+            self.game.player.spawn_shot(pygame.Vector2(x, y), velocity)
+
+    def _away_from(self, px, py):
+        while True:
+            x, y = self.rng.uniform(0, SCREEN_WIDTH), self.rng.uniform(0, SCREEN_HEIGHT)
+            if (x - px) ** 2 + (y - py) ** 2 > SAFE_RADIUS ** 2:
+                return x, y
+
+    def advance(self):
+        # one untimed env step, resetting when the player is hit
+        _, _, done, _, _ = self.env.step(self.action())
+        if done:
+            self.env.reset()
+
+
+# ——— Benchmarks ———
+# each one returns (prepare, call): prepare runs untimed before every call
+def bench_env_step(s):
+    state = {}
+
+    def prepare():
+        s.top_up()
+        state["action"] = s.action()
+
+    def call():
+        _, _, done, _, _ = s.env.step(state["action"])
+        if done:
+            s.env.reset()
+    return prepare, call
+
+
+def bench_game_update(s):
+    state = {}
+
+    def prepare():
+        s.top_up()
+        state["action"] = s.action()
+
+    def call():
+        s.game.apply_action(state["action"])
+        if s.game.update(s.env.frame_dt):
+            s.game.reset()
+    return prepare, call
+
+
+def bench_observation(s):
+    def prepare():
+        s.top_up()
+        s.advance()
+    return prepare, s.env._get_obs
+
+
+def bench_collisions(s):
+    # the asteroid/shot pass of update(): broad phase plus exact test
+    state = {}
+
+    def prepare():
+        s.top_up()
+        s.advance()
+        tel = s.game.telemetry()
+        state["args"] = (
+            tel.asteroids_pos.copy(),
+            tel.asteroids_radius.copy(),
+            tel.shots_pos.copy(),
+            np.full(len(tel.shots_pos), float(SHOT_RADIUS)),
+        )
+
+    def call():
+        a_pos, a_radius, s_pos, s_radius = state["args"]
+        ia, js = s.game.broad_phase.candidate_pairs(a_pos, a_radius, s_pos, s_radius)
+        overlapping(a_pos, a_radius, s_pos, s_radius, ia, js)
+    return prepare, call
+
+
+BENCHMARKS = {
+    "env_step": bench_env_step,
+    "game_update": bench_game_update,
+    "observation": bench_observation,
+    "collisions": bench_collisions,
+}
+
+
+def measure(prepare, call, steps, warmup):
+    for _ in range(warmup):
+        prepare()
+        call()
+    latencies = np.empty(steps)
+    for i in range(steps):
+        prepare()
+        t0 = time.perf_counter()
+        call()
+        latencies[i] = time.perf_counter() - t0
+
+    # allocations in a separate, shorter pass: tracing slows every call down
+    alloc_steps = max(1, steps // 10)
+    peaks = np.empty(alloc_steps)
+    retained = np.empty(alloc_steps)
+    tracemalloc.start()
+    try:
+        for i in range(alloc_steps):
+            prepare()
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            call()
+            current, peak = tracemalloc.get_traced_memory()
+            peaks[i] = peak - before
+            retained[i] = current - before
+    finally:
+        tracemalloc.stop()
+
+    us = latencies * 1e6
+    return {
+        "calls_per_sec": round(steps / latencies.sum(), 1),
+        "latency_us": {
+            "mean": round(float(us.mean()), 2),
+            "p50": round(float(np.percentile(us, 50)), 2),
+            "p90": round(float(np.percentile(us, 90)), 2),
+            "p99": round(float(np.percentile(us, 99)), 2),
+        },
+        "peak_alloc_bytes": int(np.median(peaks)),
+        "retained_bytes": int(np.median(retained)),
+    }
+
+
+def result_key(r):
+    return f"{r['benchmark']}/{r['backend']}/{r['asteroids']}:{r['shots']}/{r['policy']}"
+
+
+def git_commit():
+    try:
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=root, text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+
+def compare(results, baseline_path, tolerance):
+    with open(baseline_path) as f:
+        baseline = {result_key(r): r for r in json.load(f)["results"]}
+    regressions = 0
+    print(f"\nagainst {baseline_path}:")
+    for r in results:
+        old = baseline.get(result_key(r))
+        if old is None:
+            continue
+        change = r["calls_per_sec"] / old["calls_per_sec"] - 1
+        flag = ""
+        if change < -tolerance:
+            flag = "  SLOWER"
+            regressions += 1
+        print(f"{result_key(r):<40} {old['calls_per_sec']:>10.1f} -> {r['calls_per_sec']:>10.1f} /s ({change:+.1%}){flag}")
+    return regressions
+
+
+def parse_density(text):
+    asteroids, _, shots = text.partition(":")
+    return int(asteroids), int(shots or 0)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Env / game loop step-throughput benchmarks")
+    parser.add_argument("--benchmarks", nargs="+", choices=sorted(BENCHMARKS), default=list(BENCHMARKS))
+    parser.add_argument("--backends", nargs="+", choices=["sprite", "array"], default=["sprite", "array"])
+    parser.add_argument("--densities", nargs="+", type=parse_density, default=["25:5", "100:20", "200:40"],
+                        help="asteroids:shots kept on screen")
+    parser.add_argument("--policy", choices=["random", "aim"], default="random")
+    parser.add_argument("--steps", type=int, default=500)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--compare", help="results file of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="slowdown (fraction) that --compare reports as a regression")
+    args = parser.parse_args(argv)
+    args.densities = [parse_density(d) if isinstance(d, str) else d for d in args.densities]
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        high_score_path = os.path.join(tmp, "high_score.txt")
+        print(f"{'benchmark':<12} {'backend':<7} {'ast:shot':>9} {'calls/s':>10} {'p50 us':>9} {'p90 us':>9} "
+              f"{'p99 us':>9} {'peak KiB':>9} {'kept KiB':>9}")
+        for name in args.benchmarks:
+            for backend in args.backends:
+                for n_asteroids, n_shots in args.densities:
+                    scenario = Scenario(backend, n_asteroids, n_shots, args.policy, args.seed, high_score_path)
+                    prepare, call = BENCHMARKS[name](scenario)
+                    r = measure(prepare, call, args.steps, args.warmup)
+                    r.update(benchmark=name, backend=backend, asteroids=n_asteroids, shots=n_shots, policy=args.policy)
+                    results.append(r)
+                    lat = r["latency_us"]
+                    print(f"{name:<12} {backend:<7} {f'{n_asteroids}:{n_shots}':>9} {r['calls_per_sec']:>10.1f} "
+                          f"{lat['p50']:>9.1f} {lat['p90']:>9.1f} {lat['p99']:>9.1f} "
+                          f"{r['peak_alloc_bytes'] / 1024:>9.1f} {r['retained_bytes'] / 1024:>9.1f}")
+
+    if args.json:
+        meta = {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pygame": pygame.version.ver,
+            "machine": platform.machine(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "args": {k: v for k, v in vars(args).items() if k not in ("json", "compare")},
+        }
+        with open(args.json, "w") as f:
+            json.dump({"meta": meta, "results": results}, f, indent=2)
+    if args.compare and compare(results, args.compare, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
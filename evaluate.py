@@ -0,0 +1,222 @@
+# evaluate.py
+#
+#   python evaluate.py [model.zip ...] [--episodes 200] [--workers 4] [--seed 0]
+#                      [--out eval.json]
+#
+# Plays many headless episodes of every given checkpoint (default: the newest
+# ppo_asteroids*.zip) and reports return, episode length and kills as mean,
+# median and percentiles. Episode i always starts from reset(seed=seed + i)
+# with a high score of 0, so checkpoints evaluated with the same --seed and
+# --episodes play the same asteroid fields. The episodes are split over a
+# process pool; every worker steps a handful of envs in lockstep and picks
+# all their actions with one batched model.predict call. A policy exported
+# with export_policy.py (.npz) is played by policy_runtime.NumpyPolicy, so
+# those workers never import torch.
+import argparse
+import glob
+import json
+import multiprocessing as mp
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+# episodes still running after this many steps are cut off and counted as truncated
+MAX_EPISODE_STEPS = 20_000
+PERCENTILES = (5, 25, 75, 95)
+
+
+def find_latest_model(pattern="ppo_asteroids*.zip"):
+    files = glob.glob(pattern)
+    if not files:
+        raise FileNotFoundError("No saved model found matching " + pattern)
+    return max(files, key=os.path.getmtime)
+
+
+def _stack(observations):
+    # one batched observation from a list of per-env ones (dict or flat)
+    if isinstance(observations[0], dict):
+        return {key: np.stack([obs[key] for obs in observations]) for key in observations[0]}
+    return np.stack(observations)
+
+
+def _load_policy(model_path):
+    # (model with predict(), obs_mode it was trained on)
+    if model_path.endswith(".npz"):
+        from policy_runtime import NumpyPolicy
+        policy = NumpyPolicy.load(model_path)
+        return policy, policy.obs_mode
+    import torch
+    from gymnasium import spaces
+    from stable_baselines3 import PPO
+    torch.set_num_threads(1)
+    model = PPO.load(model_path, device="cpu")
+    return model, "flat" if isinstance(model.observation_space, spaces.Box) else "dict"
+
+
+def _run_episodes(model_path, seeds, envs_per_worker, deterministic, env_kwargs, max_steps):
+    # worker process: play one episode per seed, envs_per_worker at a time
+    from asteroids.highscore import HighScoreStore
+    from asteroid_shooter_env import AsteroidShooterEnv
+
+    model, obs_mode = _load_policy(model_path)
+    if seeds:
+        model.set_random_seed(seeds[0])
+    # a Box policy may also have been trained on the "rays" observation, which
+    # the model cannot tell apart from "flat"; env_kwargs then says which
+    env_kwargs = {"obs_mode": obs_mode, **env_kwargs}
+    envs = [AsteroidShooterEnv(headless=True, **env_kwargs)
+            for _ in range(min(envs_per_worker, len(seeds)))]
+
+    results = []
+    pending = list(reversed(seeds))
+
+    def start(env):
+        # None once every seed of this worker has been started
+        if not pending:
+            return None
+        seed = pending.pop()
+        # a fresh in-memory store per episode: every episode starts from a
+        # high score of 0 and the real high_score.txt is never touched
+        env.game.high_scores = HighScoreStore(None)
+        obs, _ = env.reset(seed=seed)
+        return {"seed": seed, "obs": obs, "return": 0.0, "length": 0}
+
+    running = [(env, start(env)) for env in envs]
+    while running:
+        actions, _ = model.predict(_stack([ep["obs"] for _, ep in running]), deterministic=deterministic)
+        still_running = []
+        for (env, ep), action in zip(running, actions):
+            ep["obs"], reward, done, _, _ = env.step(int(action))
+            ep["return"] += reward
+            ep["length"] += 1
+            truncated = not done and ep["length"] >= max_steps
+            if done or truncated:
+                results.append({
+                    "seed": ep["seed"],
+                    "return": ep["return"],
+                    "length": ep["length"],
+                    "kills": env.game.current_score,
+                    "truncated": truncated,
+                })
+                ep = start(env)
+            if ep is not None:
+                still_running.append((env, ep))
+        running = still_running
+    for env in envs:
+        env.close()
+    return results
+
+
+def summarize(episodes):
+    # {"return" | "length" | "kills": {"mean", "std", "median", "p5", ..., "min", "max"}}
+    summary = {}
+    for key in ("return", "length", "kills"):
+        values = np.array([ep[key] for ep in episodes], dtype=np.float64)
+        stats = {"mean": float(values.mean()), "std": float(values.std()), "median": float(np.median(values))}
+        for q in PERCENTILES:
+            stats[f"p{q}"] = float(np.percentile(values, q))
+        stats.update(min=float(values.min()), max=float(values.max()))
+        summary[key] = stats
+    summary["episodes"] = len(episodes)
+    summary["truncated"] = sum(ep["truncated"] for ep in episodes)
+    return summary
+
+
+def evaluate(model_path, episodes=200, workers=None, seed=0, envs_per_worker=8,
+             deterministic=False, env_kwargs=None, max_steps=MAX_EPISODE_STEPS):
+    """
+    Plays `episodes` episodes of the checkpoint at model_path, seeded seed,
+    seed + 1, ..., across `workers` processes (default: one per CPU, at most
+    one per episode). Returns {"episodes": [per-episode results in seed
+    order], "summary": summarize(...)}.
+    """
+    seeds = list(range(seed, seed + episodes))
+    workers = max(1, min(workers or os.cpu_count() or 1, episodes))
+    # contiguous chunks, so every worker gets a similar share of the work
+    chunks = [list(c) for c in np.array_split(seeds, workers) if len(c)]
+    chunks = [[int(s) for s in c] for c in chunks]
+    # spawn keeps CUDA / pygame state of the caller out of the workers
+    with ProcessPoolExecutor(len(chunks), mp_context=mp.get_context("spawn")) as pool:
+        futures = [
+            pool.submit(_run_episodes, model_path, c, envs_per_worker, deterministic, env_kwargs or {}, max_steps)
+            for c in chunks
+        ]
+        results = [ep for f in futures for ep in f.result()]
+    results.sort(key=lambda ep: ep["seed"])
+    return {"episodes": results, "summary": summarize(results)}
+
+
+def print_summary(model_path, summary):
+    print(f"{model_path}: {summary['episodes']} episodes, {summary['truncated']} truncated")
+    cols = ["mean", "std", "median"] + [f"p{q}" for q in PERCENTILES] + ["min", "max"]
+    print(f"  {'':<7}" + "".join(f"{c:>10}" for c in cols))
+    for key in ("return", "length", "kills"):
+        print(f"  {key:<7}" + "".join(f"{summary[key][c]:>10.2f}" for c in cols))
+
+
+def add_env_arguments(parser):
+    # the AsteroidShooterEnv options a policy has to be played with as it was
+    # trained; env_kwargs_from_args() turns them into constructor arguments
+    parser.add_argument("--backend", choices=["sprite", "array"], default="sprite")
+    parser.add_argument("--action-repeat", type=int, default=1, help="must match the one trained with")
+    parser.add_argument("--obs-mode", choices=["dict", "flat", "rays", "pixels"], default=None,
+                        help="observation the policy was trained on (default: dict or flat, from the policy)")
+    parser.add_argument("--n-rays", type=int, default=32, help="rays of --obs-mode rays")
+    parser.add_argument("--pixel-size", type=int, nargs=2, default=(84, 84), metavar=("WIDTH", "HEIGHT"),
+                        help="image size of --obs-mode pixels")
+    parser.add_argument("--frame-stack", type=int, default=4, help="frames per --obs-mode pixels observation")
+    parser.add_argument("--top-k", type=int, default=None, help="must match the one trained with")
+    parser.add_argument("--rank-by", default=None, help="must match the one trained with")
+
+
+def env_kwargs_from_args(args):
+    # AsteroidShooterEnv keyword arguments from add_env_arguments' options;
+    # without --obs-mode there is no obs_mode key
+    kwargs = {"backend": args.backend, "action_repeat": args.action_repeat,
+              "top_k": args.top_k, "rank_by": args.rank_by}
+    if args.obs_mode == "rays":
+        kwargs.update(obs_mode="rays", n_rays=args.n_rays)
+    elif args.obs_mode == "pixels":
+        kwargs.update(obs_mode="pixels", pixel_size=tuple(args.pixel_size), frame_stack=args.frame_stack)
+    elif args.obs_mode:
+        kwargs["obs_mode"] = args.obs_mode
+    return kwargs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate PPO checkpoints over many seeded headless episodes")
+    parser.add_argument("models", nargs="*", help="checkpoints (.zip) or exported policies (.npz) to evaluate "
+                                                       "(default: newest ppo_asteroids*.zip)")
+    parser.add_argument("--episodes", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--envs-per-worker", type=int, default=8, help="envs every worker steps in one batch")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first episode")
+    parser.add_argument("--deterministic", action="store_true", help="take the most likely action")
+    add_env_arguments(parser)
+    parser.add_argument("--max-steps", type=int, default=MAX_EPISODE_STEPS)
+    parser.add_argument("--out", default="eval_results.json", help="file the results are written to")
+    args = parser.parse_args(argv)
+
+    models = args.models or [find_latest_model()]
+    kwargs = env_kwargs_from_args(args)
+    report = {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "settings": {
+            "episodes": args.episodes, "seed": args.seed, "deterministic": args.deterministic,
+            "max_steps": args.max_steps, "env": kwargs,
+        },
+        "models": {},
+    }
+    for path in models:
+        result = evaluate(path, args.episodes, args.workers, args.seed, args.envs_per_worker,
+                          args.deterministic, kwargs, args.max_steps)
+        print_summary(path, result["summary"])
+        report["models"][path] = result
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
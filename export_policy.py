@@ -0,0 +1,89 @@
+# export_policy.py
+#
+#   python export_policy.py [ppo_asteroids.zip] [--out ppo_asteroids.npz]
+#
+# Freezes the actor of a saved PPO model (feature flattening, policy MLP and
+# action head) into a .npz that policy_runtime.NumpyPolicy runs with NumPy
+# alone. The value network is not exported, it is only needed for training.
+# After writing, the exported policy is checked against the torch one on
+# random observations.
+import argparse
+import os
+import numpy as np
+import torch
+from torch import nn
+from gymnasium import spaces
+from stable_baselines3 import PPO
+from stable_baselines3.common.torch_layers import CombinedExtractor, FlattenExtractor
+from evaluate import find_latest_model
+from policy_runtime import NumpyPolicy
+
+ACTIVATION_NAMES = {nn.Tanh: "tanh", nn.ReLU: "relu"}
+
+
+def to_numpy_policy(model):
+    policy = model.policy
+    if not isinstance(model.action_space, spaces.Discrete):
+        raise ValueError(f"only Discrete action spaces can be exported, got {model.action_space}")
+    extractor = policy.pi_features_extractor
+    if isinstance(extractor, CombinedExtractor):
+        # the extractor flattens and concatenates the keys in this order
+        obs_mode, obs_keys = "dict", list(extractor.extractors)
+        obs_ndims = [len(model.observation_space[k].shape) for k in obs_keys]
+    elif isinstance(extractor, FlattenExtractor):
+        obs_mode, obs_keys, obs_ndims = "flat", [], [len(model.observation_space.shape)]
+    else:
+        raise ValueError(f"cannot export features extractor {type(extractor).__name__}")
+
+    layers, activations = [], []
+    for module in policy.mlp_extractor.policy_net:
+        if isinstance(module, nn.Linear):
+            layers.append(module)
+        elif type(module) in ACTIVATION_NAMES:
+            activations.append(ACTIVATION_NAMES[type(module)])
+        else:
+            raise ValueError(f"cannot export policy layer {module}")
+    if len(activations) != len(layers):
+        raise ValueError("expected an activation after every hidden layer")
+    layers.append(policy.action_net)
+    # torch keeps Linear weights as (out, in); the runtime multiplies x @ w
+    weights = [(l.weight.detach().cpu().numpy().T, l.bias.detach().cpu().numpy()) for l in layers]
+    return NumpyPolicy(weights, activations, obs_mode, obs_keys, obs_ndims, extractor.features_dim)
+
+
+def check(model, numpy_policy, n=64, seed=0):
+    # largest absolute logit difference between torch and NumPy on random observations
+    space = model.observation_space
+    space.seed(seed)
+    samples = [space.sample() for _ in range(n)]
+    if isinstance(space, spaces.Dict):
+        obs = {k: np.stack([s[k] for s in samples]) for k in space.spaces}
+    else:
+        obs = np.stack(samples)
+    with torch.no_grad():
+        obs_tensor, _ = model.policy.obs_to_tensor(obs)
+        # Categorical keeps normalised logits, i.e. log-probabilities
+        expected = model.policy.get_distribution(obs_tensor).distribution.logits.cpu().numpy()
+    got = numpy_policy.logits(obs)
+    got = got - got.max(axis=1, keepdims=True)
+    got -= np.log(np.exp(got).sum(axis=1, keepdims=True))
+    return float(np.abs(got - expected).max())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export a PPO checkpoint to a NumPy-only policy")
+    parser.add_argument("model", nargs="?", help="checkpoint (default: newest ppo_asteroids*.zip)")
+    parser.add_argument("--out", help="output .npz (default: next to the checkpoint)")
+    args = parser.parse_args(argv)
+
+    path = args.model or find_latest_model()
+    out = args.out or os.path.splitext(path)[0] + ".npz"
+    model = PPO.load(path, device="cpu")
+    numpy_policy = to_numpy_policy(model)
+    numpy_policy.save(out)
+    error = check(model, NumpyPolicy.load(out))
+    print(f"Exported {path} -> {out} (max logit difference to torch: {error:.2e})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,351 @@
+import math
+import numpy as np
+from asteroids.constants import *
+from asteroids.rasterizer import FrameStack, Rasterizer
+
+
+# per-asteroid observation fields, one row per asteroid slot
+ASTEROID_KEYS = ("asteroids_pos", "asteroids_vel", "asteroids_dist", "asteroids_abs_angle",
+                 "asteroids_rel_angle", "asteroids_path", "asteroids_mask")
+# ways of ranking asteroids for a top-K observation, see relevance()
+RANK_CRITERIA = ("distance", "time_to_impact", "path_danger")
+# time_to_impact of asteroids whose course misses the player; they rank after
+# every asteroid on a collision course, among themselves by distance
+NO_IMPACT = 1e6
+
+
+def relevance(rank_by, pos, vel, radius, px, py):
+    """
+    Relevance score of every asteroid, lower is more relevant. pos / vel are
+    (..., n, 2), radius is (..., n) and px / py broadcast against radius, so
+    one game with scalar px, py and a batch with (games, 1) both work.
+    Asteroids are taken to fly on in a straight line and the player to stay
+    put:
+
+      distance        distance to the player
+      time_to_impact  seconds until the asteroid touches the player, 0 when
+                      it already does; NO_IMPACT + distance when it misses
+      path_danger     how far the asteroid's course passes from the player,
+                      minus its radius (negative when it will hit)
+    """
+    dx, dy = pos[..., 0] - px, pos[..., 1] - py
+    if rank_by == "distance":
+        return np.hypot(dx, dy)
+    vx, vy = vel[..., 0], vel[..., 1]
+    speed2 = vx * vx + vy * vy
+    closing = dx * vx + dy * vy
+    # resting asteroids divide by zero and misses take square roots of
+    # negatives; the NaNs that gives fail every comparison below
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if rank_by == "path_danger":
+            t = np.fmax(-closing / speed2, 0.0)
+            return np.hypot(dx + t * vx, dy + t * vy) - radius
+        if rank_by == "time_to_impact":
+            # first t >= 0 with |d + v t| = radius + PLAYER_RADIUS
+            reach = radius + PLAYER_RADIUS
+            c = dx * dx + dy * dy - reach * reach
+            t = (-closing - np.sqrt(closing * closing - speed2 * c)) / speed2
+            return np.where(c <= 0, 0.0, np.where(t >= 0, t, NO_IMPACT + np.hypot(dx, dy)))
+    raise ValueError(f"unknown rank_by {rank_by!r}, expected one of {RANK_CRITERIA}")
+
+
+def top_k_indices(score, k):
+    """
+    Indices of the k lowest scores along the last axis, most relevant first
+    and equal scores in index order. np.argpartition picks them without
+    sorting the whole row; only the k picked are sorted.
+    """
+    n = score.shape[-1]
+    if k >= n:
+        return np.argsort(score, axis=-1, kind="stable")
+    idx = np.argpartition(score, k - 1, axis=-1)[..., :k]
+    idx.sort(axis=-1)
+    if score.ndim == 1:
+        return idx[np.argsort(score[idx], kind="stable")]
+    order = np.argsort(np.take_along_axis(score, idx, axis=-1), axis=-1, kind="stable")
+    return np.take_along_axis(idx, order, axis=-1)
+
+
+def observation_fields(max_asteroids, max_shots, mask=False):
+    # (key, shape, low, high) of every observation field, in flat-vector order;
+    # mask=True adds asteroids_mask, 1 for the asteroid rows that are filled
+    N, M = max_asteroids, max_shots
+    fields = [
+        ("player_pos",          (2,),   0.0, 1.0),
+        ("player_rot",          (1,),   0.0, 1.0),
+        ("player_cd",           (1,),   0.0, 1.0),
+        ("current_score",       (1,),   0.0, 1.0),
+        ("high_score",          (1,),   0.0, 1.0),
+        ("asteroids_pos",       (N, 2), 0.0, 1.0),
+        ("asteroids_vel",       (N, 2), -1.0, 1.0),
+        ("asteroids_dist",      (N,),   0.0, 1.0),
+        ("asteroids_abs_angle", (N,),   0.0, 1.0),
+        ("asteroids_rel_angle", (N,),   0.0, 1.0),
+        ("asteroids_path",      (N, 4), 0.0, 1.0),
+        ("num_asteroids",       (1,),   0.0, 1.0),
+        ("shots_pos",           (M, 2), 0.0, 1.0),
+    ]
+    if mask:
+        fields.append(("asteroids_mask", (N,), 0.0, 1.0))
+    return fields
+
+
+class FlatLayout:
+    """
+    Where each named observation field lives inside the flat float32 vector.
+
+    Fields are laid out back to back in observation_fields() order, each one
+    row-major, e.g. asteroids_pos[i] is at slices["asteroids_pos"].start + 2*i.
+    """
+
+    def __init__(self, fields):
+        self.fields = [(key, tuple(shape)) for key, shape, *_ in fields]
+        self.slices = {}
+        offset = 0
+        for key, shape in self.fields:
+            size = int(np.prod(shape))
+            self.slices[key] = slice(offset, offset + size)
+            offset += size
+        self.size = offset
+        self.low = np.empty(self.size, dtype=np.float32)
+        self.high = np.empty(self.size, dtype=np.float32)
+        for key, _, low, high in fields:
+            self.low[self.slices[key]] = low
+            self.high[self.slices[key]] = high
+
+    def field_at(self, offset):
+        # flat offset -> (field name, index inside that field)
+        if not 0 <= offset < self.size:
+            raise IndexError(f"offset {offset} outside flat observation of size {self.size}")
+        for key, shape in self.fields:
+            sl = self.slices[key]
+            if offset < sl.stop:
+                return key, tuple(int(i) for i in np.unravel_index(offset - sl.start, shape))
+
+    def unflatten(self, flat):
+        # views of a (..., size) flat observation as named (..., *shape) fields
+        lead = flat.shape[:-1]
+        return {key: flat[..., self.slices[key]].reshape(lead + shape) for key, shape in self.fields}
+
+    def describe(self):
+        return "\n".join(
+            f"{self.slices[key].start:>6}:{self.slices[key].stop:<6} {key} {shape}"
+            for key, shape in self.fields
+        )
+
+
+class ObservationBuilder:
+    """
+    Builds AsteroidShooterEnv observations into buffers allocated once.
+
+    All fields are views into one contiguous float32 vector laid out by
+    FlatLayout, so the same fill serves both the Dict and the flat Box
+    observation. Every step the asteroid and shot rows are written with bulk
+    slice assignments from the game's array telemetry, and only the rows that
+    were filled last step but not this one are zeroed. With copy=True
+    (default) each call returns fresh copies; with copy=False it returns the
+    same buffers every time, which the next call overwrites, for consumers
+    that copy into their own rollout buffer anyway.
+
+    With rank_by set (one of RANK_CRITERIA) the max_asteroids rows hold the
+    most relevant asteroids, most relevant first, instead of the first ones
+    in spawn order, and an asteroids_mask field flags the filled rows.
+    num_asteroids is the asteroid count over count_scale (default
+    max_asteroids).
+    """
+
+    def __init__(self, max_asteroids, max_shots, copy=True, flat=False, rank_by=None, count_scale=None):
+        if rank_by is not None and rank_by not in RANK_CRITERIA:
+            raise ValueError(f"unknown rank_by {rank_by!r}, expected one of {RANK_CRITERIA}")
+        self.max_asteroids = max_asteroids
+        self.max_shots = max_shots
+        self.copy = copy
+        self.flat = flat
+        self.rank_by = rank_by
+        self.count_scale = count_scale or max_asteroids
+        # normalizers, computed once instead of per row
+        self._screen_scale = np.array([SCREEN_WIDTH, SCREEN_HEIGHT], dtype=np.float64)
+        self._path_scale = np.array([SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_WIDTH, SCREEN_HEIGHT], dtype=np.float64)
+        self._max_dist = (SCREEN_WIDTH**2 + SCREEN_HEIGHT**2)**0.5
+
+        self.layout = FlatLayout(observation_fields(max_asteroids, max_shots, mask=rank_by is not None))
+        self.flat_buffer = np.zeros(self.layout.size, dtype=np.float32)
+        self.buffers = self.layout.unflatten(self.flat_buffer)
+        # rows written by the previous build, the only ones that need zeroing
+        self._asteroid_rows = 0
+        self._shot_rows = 0
+
+    def reset(self):
+        self.flat_buffer.fill(0.0)
+        self._asteroid_rows = 0
+        self._shot_rows = 0
+
+    def build(self, game):
+        b = self.buffers
+        tel = game.telemetry()
+
+        # — Player —
+        px, py = game.player_current_pos
+        b["player_pos"][0] = px / SCREEN_WIDTH
+        b["player_pos"][1] = py / SCREEN_HEIGHT
+        b["player_rot"][0] = game.player_rotation / 360.0
+        b["player_cd"][0] = game.player_shoot_cooldown / PLAYER_SHOOT_COOLDOWN
+
+        # — Score — max-score scaling of 1000 points
+        b["current_score"][0] = game.current_score / 1000.0
+        b["high_score"][0] = game.high_score / 1000.0
+
+        # — Asteroids — pad/truncate to max_asteroids, or the top max_asteroids by rank_by
+        # divisions run in float64 and are rounded once into the float32 buffers
+        total = len(tel.asteroids_dist)
+        n = min(total, self.max_asteroids)
+        if self.rank_by is None:
+            pos, vel, dist = tel.asteroids_pos[:n], tel.asteroids_vel[:n], tel.asteroids_dist[:n]
+            abs_ang, rel_ang, path = tel.asteroids_abs_angle[:n], tel.asteroids_rel_angle[:n], tel.asteroids_path[:n]
+        else:
+            score = relevance(self.rank_by, tel.asteroids_pos, tel.asteroids_vel, tel.asteroids_radius, px, py)
+            sel = top_k_indices(score, n)
+            pos, vel, dist = tel.asteroids_pos[sel], tel.asteroids_vel[sel], tel.asteroids_dist[sel]
+            abs_ang, rel_ang, path = tel.asteroids_abs_angle[sel], tel.asteroids_rel_angle[sel], tel.asteroids_path[sel]
+            b["asteroids_mask"][:n] = 1.0
+        np.divide(pos, self._screen_scale, out=b["asteroids_pos"][:n], casting="same_kind")
+        # assume max velocity of 200 px/sec
+        np.divide(vel, 200.0, out=b["asteroids_vel"][:n], casting="same_kind")
+        np.divide(dist, self._max_dist, out=b["asteroids_dist"][:n], casting="same_kind")
+        np.divide(abs_ang, 360.0, out=b["asteroids_abs_angle"][:n], casting="same_kind")
+        np.divide(rel_ang, 360.0, out=b["asteroids_rel_angle"][:n], casting="same_kind")
+        np.divide(path, self._path_scale, out=b["asteroids_path"][:n], casting="same_kind")
+        if n < self._asteroid_rows:
+            for key in ASTEROID_KEYS:
+                if key in b:
+                    b[key][n:self._asteroid_rows] = 0.0
+        self._asteroid_rows = n
+        b["num_asteroids"][0] = total / self.count_scale
+
+        # — Shots — pad/truncate to max_shots
+        m = min(len(tel.shots_pos), self.max_shots)
+        np.divide(tel.shots_pos[:m], self._screen_scale, out=b["shots_pos"][:m], casting="same_kind")
+        if m < self._shot_rows:
+            b["shots_pos"][m:self._shot_rows] = 0.0
+        self._shot_rows = m
+
+        if self.flat:
+            return self.flat_buffer.copy() if self.copy else self.flat_buffer
+        if self.copy:
+            return {key: buf.copy() for key, buf in b.items()}
+        return b
+
+
+def ray_fields(n_rays):
+    # (key, shape, low, high) of the ray sensor observation, in flat-vector order
+    return [
+        ("ray_asteroid_dist",   (n_rays,), 0.0, 1.0),
+        ("ray_closing_speed",   (n_rays,), -1.0, 1.0),
+        ("ray_wall_dist",       (n_rays,), 0.0, 1.0),
+        ("player_cd",           (1,),      0.0, 1.0),
+    ]
+
+
+class RayObservationBuilder:
+    """
+    Egocentric ray sensor: n_rays rays cast from the player, evenly spaced
+    around it with ray 0 pointing where the ship faces. Each ray reports
+
+      ray_asteroid_dist  distance to the first asteroid it hits, 1 if none
+      ray_closing_speed  how fast that asteroid comes towards the player
+                         along the ray (negative: moving away), 0 if none
+      ray_wall_dist      distance to the edge of the screen
+
+    plus the shot cooldown, all in one float32 vector laid out by FlatLayout.
+    Distances are over the screen diagonal and speeds over 200 px/sec, the
+    asteroids_vel scale. All rays are tested against all asteroids in one
+    (rays, asteroids) ray-vs-circle pass, so the size of the observation
+    never depends on how many asteroids there are.
+    """
+
+    def __init__(self, n_rays=32, copy=True):
+        self.n_rays = n_rays
+        self.copy = copy
+        self._max_dist = (SCREEN_WIDTH**2 + SCREEN_HEIGHT**2)**0.5
+        # unit ray directions at rotation 0: pygame.Vector2(0, 1).rotate(offset)
+        offsets = np.radians(np.arange(n_rays) * (360.0 / n_rays))
+        self._directions = np.column_stack((-np.sin(offsets), np.cos(offsets)))
+        self._rays = np.arange(n_rays)
+        self._screen = np.array([SCREEN_WIDTH, SCREEN_HEIGHT], dtype=np.float64)
+        self.layout = FlatLayout(ray_fields(n_rays))
+        self.flat_buffer = np.zeros(self.layout.size, dtype=np.float32)
+        self.buffers = self.layout.unflatten(self.flat_buffer)
+
+    def reset(self):
+        self.flat_buffer.fill(0.0)
+
+    def build(self, game):
+        b = self.buffers
+        tel = game.telemetry()
+        px, py = game.player_current_pos
+
+        # unit ray directions, (n_rays, 2), turned by the ship's rotation
+        rad = math.radians(game.player_rotation)
+        c, s = math.cos(rad), math.sin(rad)
+        u = self._directions @ np.array([[c, s], [-s, c]])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            # walls: the nearest screen edge the ray crosses (rays parallel
+            # to an edge divide by zero and never reach it)
+            to_edge = np.where(u >= 0, self._screen - (px, py), (px, py)) / np.abs(u)
+            np.divide(to_edge.min(axis=1), self._max_dist, out=b["ray_wall_dist"], casting="same_kind")
+
+            # asteroids: entry distance of every (ray, asteroid) pair, NaN or
+            # negative for rays that miss or point away
+            if len(tel.asteroids_dist):
+                along = u @ (tel.asteroids_pos - (px, py)).T
+                radius = tel.asteroids_radius
+                entry = along - np.sqrt(radius * radius - tel.asteroids_dist * tel.asteroids_dist + along * along)
+                entry = np.where(entry >= 0, entry, np.inf)
+                inside = tel.asteroids_dist <= radius
+                if inside.any():
+                    entry[:, inside] = 0.0
+                nearest = entry.argmin(axis=1)
+                hit_dist = entry[self._rays, nearest]
+                hit = hit_dist < np.inf
+                closing = (tel.asteroids_vel[nearest] * u).sum(axis=1) / -200.0
+                np.divide(np.where(hit, np.minimum(hit_dist, self._max_dist), self._max_dist), self._max_dist,
+                          out=b["ray_asteroid_dist"], casting="same_kind")
+                np.clip(np.where(hit, closing, 0.0), -1.0, 1.0, out=b["ray_closing_speed"], casting="same_kind")
+            else:
+                b["ray_asteroid_dist"].fill(1.0)
+                b["ray_closing_speed"].fill(0.0)
+
+        b["player_cd"][0] = game.player_shoot_cooldown / PLAYER_SHOOT_COOLDOWN
+        return self.flat_buffer.copy() if self.copy else self.flat_buffer
+
+
+class PixelObservationBuilder:
+    """
+    Image observation: the game drawn by asteroids.rasterizer.Rasterizer
+    into a width x height uint8 frame, the last n_frames of them stacked
+    oldest first, shape (n_frames, height, width) for CnnPolicy. After a
+    reset() the first frame built fills the whole stack.
+    """
+
+    def __init__(self, width=84, height=84, n_frames=4, copy=True):
+        self.copy = copy
+        self.rasterizer = Rasterizer(width, height)
+        self.frames = FrameStack(n_frames, (height, width))
+        self.shape = self.frames.current.shape
+        # there is no flat field layout to describe
+        self.layout = None
+        self._fresh = True
+
+    def reset(self):
+        self._fresh = True
+
+    def build(self, game):
+        tel = game.telemetry()
+        px, py = game.player_current_pos
+        frame = self.frames.push()
+        self.rasterizer.draw(frame, px, py, game.player_rotation,
+                             tel.asteroids_pos, tel.asteroids_radius, tel.shots_pos)
+        if self._fresh:
+            self.frames.fill()
+            self._fresh = False
+        return self.frames.current.copy() if self.copy else self.frames.current
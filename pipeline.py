@@ -0,0 +1,358 @@
+import multiprocessing as mp
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import torch as th
+from gymnasium import spaces
+from stable_baselines3 import PPO
+from stable_baselines3.common.utils import obs_as_tensor
+from stable_baselines3.common.vec_env import DummyVecEnv, VecEnv
+from stable_baselines3.common.vec_env.base_vec_env import CloudpickleWrapper
+
+
+def _take(obs, sl):
+    # the rows sl of a batched observation (dict or flat)
+    if isinstance(obs, dict):
+        return {key: value[sl] for key, value in obs.items()}
+    return obs[sl]
+
+
+def _concat(parts):
+    # one batched observation from the observations of consecutive groups
+    if isinstance(parts[0], dict):
+        return {key: np.concatenate([p[key] for p in parts]) for key in parts[0]}
+    return np.concatenate(parts)
+
+
+def _run(venv, name, args, kwargs):
+    # venv.name(*args, **kwargs), or the attribute venv.name
+    value = getattr(venv, name)
+    return value(*args, **kwargs) if callable(value) else value
+
+
+def _group_worker(remote, parent_remote, env_fns):
+    parent_remote.close()
+    venv = DummyVecEnv(env_fns.var)
+    try:
+        while True:
+            name, args, kwargs = remote.recv()
+            if name == "close":
+                venv.close()
+                remote.send(None)
+                break
+            remote.send(_run(venv, name, args, kwargs))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        remote.close()
+
+
+class _ThreadGroup:
+    # a DummyVecEnv driven by its own worker thread
+    def __init__(self, env_fns):
+        self.venv = DummyVecEnv(env_fns)
+        self._executor = ThreadPoolExecutor(1)
+        self._future = None
+
+    def call_async(self, name, *args, **kwargs):
+        self._future = self._executor.submit(_run, self.venv, name, args, kwargs)
+
+    def wait(self):
+        future, self._future = self._future, None
+        return future.result()
+
+    def call(self, name, *args, **kwargs):
+        self.call_async(name, *args, **kwargs)
+        return self.wait()
+
+    def close(self):
+        self.venv.close()
+        self._executor.shutdown()
+
+
+class _ProcessGroup(_ThreadGroup):
+    # a DummyVecEnv living in its own worker process
+    def __init__(self, env_fns, ctx):
+        self._remote, work_remote = ctx.Pipe()
+        self._process = ctx.Process(target=_group_worker, args=(work_remote, self._remote, CloudpickleWrapper(env_fns)),
+                                    daemon=True)
+        self._process.start()
+        work_remote.close()
+
+    def call_async(self, name, *args, **kwargs):
+        self._remote.send((name, args, kwargs))
+
+    def wait(self):
+        return self._remote.recv()
+
+    def close(self):
+        self.call("close")
+        self._process.join()
+
+
+class PipelinedVecEnv(VecEnv):
+    """
+    The envs of env_fns split into n_groups contiguous groups that step
+    independently of each other, so PipelinedPPO can run the policy on one
+    group while the others are being simulated.
+
+    Every group is a DummyVecEnv. workers="process" runs each of them in a
+    worker process of its own (start_method as for SubprocVecEnv), which
+    overlaps simulation and inference on any machine with a core to spare.
+    workers="thread" keeps the envs in-process, every group stepped by its
+    own thread; the game holds the GIL, so there the overlap is limited to
+    the time the policy spends without it, mostly waiting on a GPU.
+
+    step_group_async(g, actions) / step_group_wait(g) step group g alone and
+    return its part of the batch; step_async / step_wait step all of them,
+    so this is also an ordinary VecEnv for any other algorithm. get_attr,
+    env_method and friends first finish the step a group has in flight.
+    """
+
+    def __init__(self, env_fns, n_groups=2, workers="thread", start_method=None):
+        if workers not in ("thread", "process"):
+            raise ValueError(f"workers must be 'thread' or 'process', got {workers!r}")
+        if not 2 <= n_groups <= len(env_fns):
+            raise ValueError(f"need 2 <= n_groups <= number of envs ({len(env_fns)}), got {n_groups}")
+        self.workers = workers
+        bounds = np.linspace(0, len(env_fns), n_groups + 1).astype(int)
+        self.slices = [slice(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:])]
+        if workers == "process":
+            if start_method is None:
+                # as SubprocVecEnv: forkserver where available, it is fork-safe and fast
+                start_method = "forkserver" if "forkserver" in mp.get_all_start_methods() else "spawn"
+            ctx = mp.get_context(start_method)
+            self.groups = [_ProcessGroup(env_fns[sl], ctx) for sl in self.slices]
+        else:
+            self.groups = [_ThreadGroup(env_fns[sl]) for sl in self.slices]
+        # per group: whether a step is in flight, and the result of a step
+        # that was finished before step_group_wait asked for it
+        self._pending = [False] * n_groups
+        self._results = [None] * n_groups
+        observation_space, action_space = self.groups[0].call("observation_space"), self.groups[0].call("action_space")
+        super().__init__(len(env_fns), observation_space, action_space)
+
+    @property
+    def n_groups(self):
+        return len(self.groups)
+
+    def step_group_async(self, g, actions):
+        if self._pending[g] or self._results[g] is not None:
+            raise RuntimeError(f"group {g} still has a step to wait for")
+        self.groups[g].call_async("step", actions)
+        self._pending[g] = True
+
+    def _finish(self, g):
+        # completes group g's step in flight, if any, keeping its result for step_group_wait
+        if self._pending[g]:
+            self._results[g] = self.groups[g].wait()
+            self._pending[g] = False
+
+    def step_group_wait(self, g):
+        # (obs, rewards, dones, infos) of group g's envs
+        self._finish(g)
+        result, self._results[g] = self._results[g], None
+        if result is None:
+            raise RuntimeError(f"group {g} has no step in flight")
+        return result
+
+    def step_async(self, actions):
+        for g, sl in enumerate(self.slices):
+            self.step_group_async(g, actions[sl])
+
+    def step_wait(self):
+        results = [self.step_group_wait(g) for g in range(self.n_groups)]
+        obs, rewards, dones, infos = zip(*results)
+        return _concat(obs), np.concatenate(rewards), np.concatenate(dones), [i for part in infos for i in part]
+
+    def _settle(self):
+        # finishes every step in flight and forgets its result
+        for g in range(self.n_groups):
+            self._finish(g)
+            self._results[g] = None
+
+    def reset(self):
+        self._settle()
+        obs = [group.call("reset") for group in self.groups]
+        self.reset_infos = [info for group in self.groups for info in group.call("reset_infos")]
+        return _concat(obs)
+
+    def seed(self, seed=None):
+        seeds = super().seed(seed)
+        for group, sl in zip(self.groups, self.slices):
+            group.call("seed", seeds[sl.start])
+        return seeds
+
+    def set_options(self, options=None):
+        for group, sl in zip(self.groups, self.slices):
+            group.call("set_options", options[sl] if isinstance(options, list) else options)
+
+    def close(self):
+        self._settle()
+        for group in self.groups:
+            group.close()
+
+    def get_images(self):
+        self._settle()
+        return [image for group in self.groups for image in group.call("get_images")]
+
+    def _call(self, name, indices, *args, **kwargs):
+        # group.venv.name(*args, indices=..., **kwargs) for the groups holding
+        # indices, results in the order of indices
+        indices = list(self._get_indices(indices))
+        results = {}
+        for g, (group, sl) in enumerate(zip(self.groups, self.slices)):
+            mine = [i for i in indices if sl.start <= i < sl.stop]
+            if mine:
+                self._finish(g)
+                out = group.call(name, *args, indices=[i - sl.start for i in mine], **kwargs)
+                results.update(zip(mine, out if out is not None else [None] * len(mine)))
+        return [results[i] for i in indices]
+
+    def get_attr(self, attr_name, indices=None):
+        return self._call("get_attr", indices, attr_name)
+
+    def set_attr(self, attr_name, value, indices=None):
+        self._call("set_attr", indices, attr_name, value)
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        return self._call("env_method", indices, method_name, *method_args, **method_kwargs)
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        return self._call("env_is_wrapped", indices, wrapper_class)
+
+
+class PipelinedPPO(PPO):
+    """
+    PPO whose rollouts on a PipelinedVecEnv overlap simulation and policy
+    inference: while group g steps, the policy already picks the actions of
+    group g + 1 (and the last group's step hides the inference of group 0
+    for the next row). With two groups every env step runs next to half a
+    batch of inference, and the other way round.
+
+    The rollout buffer is filled as usual, one row per step of every env:
+    a row is added once all groups have finished that step, with the
+    timeout bootstrapping, callbacks (whose locals hold the whole row) and
+    episode info of OnPolicyAlgorithm.collect_rollouts. The policy does not
+    change during a rollout, so every transition is exactly as on-policy as
+    with the sequential loop. On any other env it collects sequentially.
+    """
+
+    def _env_actions(self, actions):
+        # the actions to send to the env, as OnPolicyAlgorithm.collect_rollouts does
+        if isinstance(self.action_space, spaces.Box):
+            if self.policy.squash_output:
+                return self.policy.unscale_action(actions)
+            return np.clip(actions, self.action_space.low, self.action_space.high)
+        return actions
+
+    def _launch(self, env, g, obs):
+        # picks group g's actions for obs and starts its step; returns (actions, values, log_probs)
+        with th.no_grad():
+            actions, values, log_probs = self.policy(obs_as_tensor(obs, self.device))
+        actions = actions.cpu().numpy()
+        env.step_group_async(g, self._env_actions(actions))
+        return actions, values, log_probs
+
+    def collect_rollouts(self, env, callback, rollout_buffer, n_rollout_steps):
+        if not isinstance(env, PipelinedVecEnv):
+            return super().collect_rollouts(env, callback, rollout_buffer, n_rollout_steps)
+        assert self._last_obs is not None, "No previous observation was provided"
+        self.policy.set_training_mode(False)
+
+        n_steps = 0
+        rollout_buffer.reset()
+        if self.use_sde:
+            self.policy.reset_noise(env.num_envs)
+
+        callback.on_rollout_start()
+
+        slices = env.slices
+        # every group's observation its next actions are picked for, and the
+        # (actions, values, log_probs) of every group's step of the current row
+        obs = [_take(self._last_obs, sl) for sl in slices]
+        row = [self._launch(env, 0, obs[0])] + [None] * (len(slices) - 1)
+        while n_steps < n_rollout_steps:
+            if self.use_sde and self.sde_sample_freq > 0 and n_steps % self.sde_sample_freq == 0:
+                # Sample a new noise matrix
+                self.policy.reset_noise(env.num_envs)
+
+            results = []
+            next_first = None
+            for g in range(len(slices)):
+                # infer the next group while group g steps
+                if g + 1 < len(slices):
+                    row[g + 1] = self._launch(env, g + 1, obs[g + 1])
+                elif n_steps + 1 < n_rollout_steps:
+                    # group 0 already has its observation of the next row
+                    next_first = self._launch(env, 0, obs[0])
+                results.append(env.step_group_wait(g))
+                obs[g] = results[-1][0]
+
+            actions = np.concatenate([a for a, _, _ in row])
+            values = th.cat([v for _, v, _ in row])
+            log_probs = th.cat([lp for _, _, lp in row])
+            new_obs = _concat(obs)
+            rewards = np.concatenate([r[1] for r in results])
+            dones = np.concatenate([r[2] for r in results])
+            infos = [info for r in results for info in r[3]]
+            row = [next_first] + [None] * (len(slices) - 1)
+
+            self.num_timesteps += env.num_envs
+
+            # Give access to local variables
+            callback.update_locals(locals())
+            if not callback.on_step():
+                if next_first is not None:
+                    self._drain(env, new_obs, dones)
+                self._last_obs = new_obs
+                self._last_episode_starts = dones
+                return False
+
+            self._update_info_buffer(infos, dones)
+            n_steps += 1
+
+            if isinstance(self.action_space, spaces.Discrete):
+                # Reshape in case of discrete action
+                actions = actions.reshape(-1, 1)
+
+            # Handle timeout by bootstrapping with value function
+            for idx, done in enumerate(dones):
+                if (
+                    done
+                    and infos[idx].get("terminal_observation") is not None
+                    and infos[idx].get("TimeLimit.truncated", False)
+                ):
+                    terminal_obs = self.policy.obs_to_tensor(infos[idx]["terminal_observation"])[0]
+                    with th.no_grad():
+                        terminal_value = self.policy.predict_values(terminal_obs)[0]
+                    rewards[idx] += self.gamma * terminal_value
+
+            rollout_buffer.add(self._last_obs, actions, rewards, self._last_episode_starts, values, log_probs)
+            self._last_obs = new_obs
+            self._last_episode_starts = dones
+
+        with th.no_grad():
+            # Compute value for the last timestep
+            values = self.policy.predict_values(obs_as_tensor(new_obs, self.device))
+
+        rollout_buffer.compute_returns_and_advantage(last_values=values, dones=dones)
+
+        callback.update_locals(locals())
+
+        callback.on_rollout_end()
+
+        return True
+
+    def _drain(self, env, new_obs, dones):
+        # a callback stopped training while group 0 was already stepping into
+        # the next row: finish that step and put its outcome into new_obs and
+        # dones, so the next learn() starts from the envs' actual observations
+        # (the step's transition itself is dropped)
+        obs, _, group_dones, _ = env.step_group_wait(0)
+        sl = env.slices[0]
+        if isinstance(new_obs, dict):
+            for key in new_obs:
+                new_obs[key][sl] = obs[key]
+        else:
+            new_obs[sl] = obs
+        dones[sl] = group_dones
@@ -0,0 +1,101 @@
+import numpy as np
+
+ACTIVATIONS = {
+    "tanh": np.tanh,
+    "relu": lambda x: np.maximum(x, 0.0),
+    "identity": lambda x: x,
+}
+
+
+class NumpyPolicy:
+    """
+    The actor of a PPO policy exported with export_policy.py, run with NumPy
+    only: no torch and no Stable-Baselines3 to import, so a worker is ready
+    to play as soon as the .npz is read.
+
+    predict() takes the env observation as it comes out of
+    AsteroidShooterEnv, a flat vector or an observation dict, either for one
+    env or batched along a leading axis, and has model.predict's signature,
+    so it can stand in for the PPO model when playing:
+
+        policy = NumpyPolicy.load("ppo_asteroids.npz")
+        action, _ = policy.predict(obs)
+    """
+
+    def __init__(self, layers, activations, obs_mode, obs_keys, obs_ndims, obs_dim, seed=None):
+        # layers: [(weight (in, out), bias (out,)), ...], the last one giving
+        # the action logits; activations: one name per hidden layer;
+        # obs_keys / obs_ndims: the dict keys in network input order and the
+        # number of dimensions of one env's value of each
+        if len(activations) != len(layers) - 1:
+            raise ValueError(f"{len(layers)} layers need {len(layers) - 1} activations, got {len(activations)}")
+        self.layers = [(np.ascontiguousarray(w, dtype=np.float32), np.asarray(b, dtype=np.float32))
+                       for w, b in layers]
+        self.activation_names = list(activations)
+        self.activations = [ACTIVATIONS[name] for name in activations]
+        self.obs_mode = obs_mode
+        self.obs_keys = list(obs_keys)
+        self.obs_ndims = [int(n) for n in obs_ndims]
+        self.obs_dim = obs_dim
+        self.rng = np.random.default_rng(seed)
+
+    @classmethod
+    def load(cls, path, seed=None):
+        with np.load(path) as data:
+            n = int(data["n_layers"])
+            layers = [(data[f"w{i}"], data[f"b{i}"]) for i in range(n)]
+            return cls(layers, [str(a) for a in data["activations"]], str(data["obs_mode"]),
+                       [str(k) for k in data["obs_keys"]], data["obs_ndims"], int(data["obs_dim"]), seed)
+
+    def save(self, path):
+        arrays = {f"w{i}": w for i, (w, _) in enumerate(self.layers)}
+        arrays.update({f"b{i}": b for i, (_, b) in enumerate(self.layers)})
+        np.savez(
+            path,
+            n_layers=len(self.layers),
+            activations=np.array(self.activation_names),
+            obs_mode=self.obs_mode,
+            obs_keys=np.array(self.obs_keys),
+            obs_ndims=np.array(self.obs_ndims),
+            obs_dim=self.obs_dim,
+            **arrays,
+        )
+
+    def set_random_seed(self, seed):
+        self.rng = np.random.default_rng(seed)
+
+    def _features(self, obs):
+        # (batch, obs_dim) float32 input of the network, and whether obs was batched
+        if self.obs_mode == "dict":
+            first = np.asarray(obs[self.obs_keys[0]])
+            batch = first.shape[0] if first.ndim > self.obs_ndims[0] else None
+            parts = [np.asarray(obs[k], dtype=np.float32).reshape(batch or 1, -1) for k in self.obs_keys]
+            x = np.concatenate(parts, axis=1)
+        else:
+            obs = np.asarray(obs, dtype=np.float32)
+            batch = obs.shape[0] if obs.ndim > 1 else None
+            x = obs.reshape(batch or 1, -1)
+        if x.shape[1] != self.obs_dim:
+            raise ValueError(f"observation has {x.shape[1]} values, the policy expects {self.obs_dim}")
+        return x, batch is not None
+
+    def _forward(self, x):
+        for (w, b), activation in zip(self.layers, self.activations):
+            x = activation(x @ w + b)
+        w, b = self.layers[-1]
+        return x @ w + b
+
+    def logits(self, obs):
+        # (batch, actions) action logits
+        return self._forward(self._features(obs)[0])
+
+    def predict(self, obs, state=None, episode_start=None, deterministic=False):
+        # (actions, None); one action for a single observation, else one per row
+        x, batched = self._features(obs)
+        logits = self._forward(x)
+        if deterministic:
+            actions = logits.argmax(axis=1)
+        else:
+            # Gumbel-max: argmax of logits + Gumbel noise samples the softmax
+            actions = (logits - np.log(-np.log(self.rng.random(logits.shape)))).argmax(axis=1)
+        return (actions if batched else actions[0]), None
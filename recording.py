@@ -0,0 +1,300 @@
+# recording.py
+#
+#   python recording.py episodes.rec                      list the recorded episodes
+#   python recording.py episodes.rec --episode 3 [--fps 30] [--start 100]
+#   python recording.py episodes.rec --episode 3 --frame 250
+#   python recording.py episodes.rec --episode 3 --resimulate
+#
+# AsteroidShooterEnv(record="episodes.rec") appends every step's action,
+# reward and drawable world state to an episode file; this module writes and
+# reads those files and plays them back.
+#
+# File format: the magic line below, then frames of
+#   kind (1 byte) | payload length (uint32, little endian) | zlib payload
+# kind b"H": JSON env settings (backend, action_repeat, ...), written each
+#            time a recorder opens the file; applies to the episodes after it
+# kind b"E": start of an episode, an .npz of the env's get_state() right
+#            after reset plus the seed (-1 when reset without one)
+# kind b"S": a chunk of up to chunk_steps steps of the current episode, an
+#            .npz of per-step columns with the asteroids and shots of all
+#            steps concatenated (n_asteroids / n_shots say how many per step)
+# Files are only ever appended to, so several runs can share one, and a
+# frame cut short by a crash is ignored when reading.
+import argparse
+import io
+import json
+import struct
+import zlib
+import numpy as np
+from asteroids.telemetry import Snapshot
+
+MAGIC = b"ASTEROIDS-REC 1\n"
+_FRAME = struct.Struct("<cI")
+_STEP_COLUMNS = {
+    # name: dtype of the per-step columns of a b"S" chunk
+    "action": np.uint8,
+    "reward": np.float64,
+    "done": np.bool_,
+    "score": np.int32,
+    "high_score": np.int32,
+    "player": np.float32,
+    "n_asteroids": np.uint16,
+    "n_shots": np.uint16,
+}
+
+
+def _pack(arrays):
+    buf = io.BytesIO()
+    np.savez(buf, **arrays)
+    return buf.getvalue()
+
+
+def _unpack(payload):
+    with np.load(io.BytesIO(payload), allow_pickle=False) as data:
+        return {key: data[key] for key in data.files}
+
+
+class EpisodeRecorder:
+    """
+    Streams episodes to an append-only, chunked, zlib-compressed file.
+
+    add() only appends to in-memory lists; every chunk_steps steps, and when
+    an episode ends, they are packed, compressed and written as one frame,
+    so memory stays bounded by one chunk whatever the episode length.
+    """
+
+    def __init__(self, path, config=None, chunk_steps=256, level=1):
+        self.path = path
+        self.chunk_steps = chunk_steps
+        self.level = level
+        self._file = open(path, "ab")
+        if self._file.tell() == 0:
+            self._file.write(MAGIC)
+        self._write(b"H", json.dumps(config or {}).encode())
+        self._in_episode = False
+        self._clear()
+
+    def _clear(self):
+        self._steps = {name: [] for name in _STEP_COLUMNS}
+        self._asteroids = []
+        self._shots = []
+
+    def _write(self, kind, payload):
+        payload = zlib.compress(payload, self.level)
+        self._file.write(_FRAME.pack(kind, len(payload)))
+        self._file.write(payload)
+
+    def begin_episode(self, seed, state):
+        # state: the env's get_state() right after reset
+        self.flush()
+        arrays = dict(state)
+        arrays["seed"] = np.array(-1 if seed is None else seed)
+        self._write(b"E", _pack(arrays))
+        self._in_episode = True
+
+    def add(self, action, reward, done, snap):
+        if not self._in_episode:
+            raise RuntimeError("add() before begin_episode()")
+        steps = self._steps
+        steps["action"].append(action)
+        steps["reward"].append(reward)
+        steps["done"].append(done)
+        steps["score"].append(snap.score)
+        steps["high_score"].append(snap.high_score)
+        steps["player"].append(snap.player)
+        steps["n_asteroids"].append(len(snap.asteroids))
+        steps["n_shots"].append(len(snap.shots))
+        self._asteroids.append(snap.asteroids)
+        self._shots.append(snap.shots)
+        if done or len(steps["action"]) >= self.chunk_steps:
+            self.flush()
+        if done:
+            self._in_episode = False
+
+    def flush(self):
+        if self._steps["action"]:
+            arrays = {name: np.asarray(values, dtype=_STEP_COLUMNS[name]) for name, values in self._steps.items()}
+            arrays["asteroids"] = np.concatenate(self._asteroids).astype(np.float32, copy=False)
+            arrays["shots"] = np.concatenate(self._shots).astype(np.float32, copy=False)
+            self._write(b"S", _pack(arrays))
+            self._clear()
+        self._file.flush()
+
+    def close(self):
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
+
+
+class Episode:
+    """ One recorded episode: its env settings, start state and per-step columns. """
+
+    def __init__(self, config, start, chunks):
+        self.config = config
+        self.seed = int(start.pop("seed"))
+        self.initial_state = start
+        columns = {name: np.concatenate([c[name] for c in chunks]) if chunks else np.zeros(0, dtype)
+                   for name, dtype in _STEP_COLUMNS.items()}
+        self.actions = columns["action"]
+        self.rewards = columns["reward"]
+        self.dones = columns["done"]
+        self.scores = columns["score"]
+        self.high_scores = columns["high_score"]
+        self.player = columns["player"].reshape(-1, 3)
+        self.asteroids = np.concatenate([c["asteroids"] for c in chunks]).reshape(-1, 3) if chunks else np.zeros((0, 3))
+        self.shots = np.concatenate([c["shots"] for c in chunks]).reshape(-1, 2) if chunks else np.zeros((0, 2))
+        # start of every step's rows in asteroids / shots
+        self._ast_start = np.concatenate(([0], np.cumsum(columns["n_asteroids"], dtype=np.int64)))
+        self._shot_start = np.concatenate(([0], np.cumsum(columns["n_shots"], dtype=np.int64)))
+
+    def __len__(self):
+        return len(self.actions)
+
+    @property
+    def complete(self):
+        # False when the recording stopped before the player was hit
+        return len(self) > 0 and bool(self.dones[-1])
+
+    def frame(self, t):
+        # the world after step t, as an asteroids.telemetry.Snapshot
+        return Snapshot(
+            player=tuple(float(v) for v in self.player[t]),
+            asteroids=self.asteroids[self._ast_start[t]:self._ast_start[t + 1]],
+            shots=self.shots[self._shot_start[t]:self._shot_start[t + 1]],
+            score=int(self.scores[t]),
+            high_score=int(self.high_scores[t]),
+        )
+
+
+class EpisodeReader:
+    """
+    Index of a recording file. Opening it only walks the frame headers;
+    an episode's chunks are read and decompressed by episode(i).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        # per episode: (config, offset of its b"E" frame, offsets of its b"S" frames)
+        self._index = []
+        config = {}
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not an episode recording")
+            size = f.seek(0, io.SEEK_END)
+            offset = len(MAGIC)
+            while offset + _FRAME.size <= size:
+                f.seek(offset)
+                kind, length = _FRAME.unpack(f.read(_FRAME.size))
+                if offset + _FRAME.size + length > size:
+                    break
+                if kind == b"H":
+                    config = json.loads(zlib.decompress(f.read(length)))
+                elif kind == b"E":
+                    self._index.append((config, offset, []))
+                elif kind == b"S" and self._index:
+                    self._index[-1][2].append(offset)
+                offset += _FRAME.size + length
+
+    def __len__(self):
+        return len(self._index)
+
+    def _read(self, f, offset):
+        f.seek(offset)
+        _, length = _FRAME.unpack(f.read(_FRAME.size))
+        return _unpack(zlib.decompress(f.read(length)))
+
+    def episode(self, i):
+        config, start, chunks = self._index[i]
+        with open(self.path, "rb") as f:
+            return Episode(config, self._read(f, start), [self._read(f, offset) for offset in chunks])
+
+
+def resimulate(episode, backend=None):
+    """
+    Plays the recorded actions again from the episode's start state in a
+    headless env with the recorded settings, yielding (reward, snapshot)
+    after every step. backend overrides the recorded one.
+    """
+    from asteroids.highscore import HighScoreStore
+    from asteroid_shooter_env import AsteroidShooterEnv
+    config = episode.config
+    env = AsteroidShooterEnv(
+        backend=backend or config.get("backend", "sprite"),
+        obs_mode=config.get("obs_mode", "dict"),
+        headless=True,
+        action_repeat=config.get("action_repeat", 1),
+        substeps=config.get("substeps", 1),
+    )
+    # replays must not touch the real high score
+    env.game.high_scores = HighScoreStore(None)
+    env.reset()
+    env.set_state(episode.initial_state)
+    try:
+        for action in episode.actions.tolist():
+            _, reward, done, _, _ = env.step(action)
+            yield reward, env.snapshot()
+            if done:
+                break
+    finally:
+        env.close()
+
+
+def play(frames, fps=30, title="Asteroids (replay)"):
+    # draws Snapshots in a window at up to fps; closing the window stops early
+    import pygame
+    from asteroids.constants import SCREEN_WIDTH, SCREEN_HEIGHT
+    from viewer import draw_snapshot
+    pygame.init()
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption(title)
+    font = pygame.font.Font(None, 36)
+    clock = pygame.time.Clock()
+    try:
+        for snap in frames:
+            if any(event.type == pygame.QUIT for event in pygame.event.get()):
+                return
+            draw_snapshot(screen, font, snap)
+            pygame.display.flip()
+            clock.tick(fps)
+    finally:
+        pygame.quit()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="List, replay or re-simulate recorded episodes")
+    parser.add_argument("path")
+    parser.add_argument("--episode", type=int, help="episode to show (negative counts from the end)")
+    parser.add_argument("--start", type=int, default=0, help="first step to show")
+    parser.add_argument("--frame", type=int, help="show only this step, until the window is closed")
+    parser.add_argument("--fps", type=float, default=30)
+    parser.add_argument("--resimulate", action="store_true",
+                        help="replay the actions in a fresh game instead of drawing the recorded frames")
+    args = parser.parse_args(argv)
+
+    reader = EpisodeReader(args.path)
+    if args.episode is None:
+        for i in range(len(reader)):
+            ep = reader.episode(i)
+            print(f"{i:>5}  seed {ep.seed:>6}  {len(ep):>6} steps  return {ep.rewards.sum():>10.2f}  "
+                  f"score {ep.scores[-1] if len(ep) else 0:>4}{'' if ep.complete else '  (incomplete)'}")
+        return
+
+    ep = reader.episode(args.episode)
+    if args.resimulate:
+        rewards, snaps = [], []
+        for reward, snap in resimulate(ep):
+            rewards.append(reward)
+            snaps.append(snap)
+        n = min(len(rewards), len(ep))
+        error = float(np.abs(np.array(rewards[:n]) - ep.rewards[:n]).max()) if n else 0.0
+        print(f"re-simulated {len(rewards)} of {len(ep)} steps, max reward difference {error:.3g}")
+        play(snaps[args.start:], args.fps)
+    elif args.frame is not None:
+        play(iter(lambda: ep.frame(args.frame), None), args.fps)
+    else:
+        play((ep.frame(t) for t in range(args.start, len(ep))), args.fps)
+
+
+if __name__ == "__main__":
+    main()
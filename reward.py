@@ -0,0 +1,130 @@
+import numpy as np
+from asteroids.constants import *
+
+# diagonal of the screen, the largest possible player/asteroid distance
+MAX_DIST = (SCREEN_WIDTH**2 + SCREEN_HEIGHT**2)**0.5
+
+
+def nearest_distance(dist, valid):
+    # (games, asteroids) distances -> distance of the closest asteroid per
+    # game, MAX_DIST for games without asteroids
+    return np.where(valid, dist, MAX_DIST).min(axis=1, initial=MAX_DIST)
+
+
+def segment_distance(px, py, path):
+    """
+    Distance from the player (px, py), shape (games,), to every asteroid path
+    segment in path, shape (games, asteroids, 4) as start xy / end xy.
+    Degenerate segments measure to their start point.
+    """
+    x1, y1 = path[..., 0], path[..., 1]
+    dx, dy = path[..., 2] - x1, path[..., 3] - y1
+    x0, y0 = px[:, None] - x1, py[:, None] - y1
+    length2 = dx * dx + dy * dy
+    t = np.divide(x0 * dx + y0 * dy, length2, out=np.zeros_like(length2), where=length2 != 0)
+    np.clip(t, 0.0, 1.0, out=t)
+    return np.hypot(x0 - t * dx, y0 - t * dy)
+
+
+class RewardEngine:
+    """
+    The AsteroidShooterEnv reward shaping, computed with array operations
+    over every asteroid of a batch of games at once.
+
+    compute() returns the total reward per game and the value of each term in
+    TERMS, so the terms can be logged without recomputing anything:
+
+      kill         2 per kill plus 0.8 per kill scaled by how close the
+                   nearest asteroid was before the step
+      action       0.99 for backing up, -0.02 per shot and -0.1 more if the
+                   step scored nothing
+      dodge        change of the nearest-asteroid distance, within +-0.05
+      border       -10 within border_margin pixels of the screen edge
+      path_danger  -2 per asteroid path closer than danger_threshold
+      death        -100 when the player was hit
+      path_kill    on a scoring step, 10 * distance / danger_threshold for
+                   every asteroid path the player is in
+
+    dodge, border, path_danger and path_kill only apply while there are
+    asteroids on screen.
+
+    When one decision covers several physics frames (action repeat), kill,
+    death and path_kill count the events of all of them and dodge compares
+    the nearest distance before and after, while the per-frame terms action,
+    border and path_danger are taken from the last frame and multiplied by
+    the number of frames.
+    """
+
+    TERMS = ("kill", "action", "dodge", "border", "path_danger", "death", "path_kill")
+
+    def __init__(self, border_margin=250, danger_threshold=40):
+        self.border_margin = border_margin
+        self.danger_threshold = danger_threshold
+
+    def compute(self, actions, delta, done, prev_min, player_pos, dist, path, valid, frames=1):
+        """
+        actions, delta (score gained), done and prev_min (nearest asteroid
+        distance before the step) have shape (games,); player_pos is
+        (games, 2); dist, path and valid are the per-asteroid telemetry after
+        the step, shaped (games, asteroids[, 4]), with valid flagging the
+        rows that hold a live asteroid. frames is the number of physics
+        frames the step covered, a scalar or per game.
+        """
+        delta = np.asarray(delta, dtype=np.float64)
+        any_asteroids = valid.any(axis=1)
+        prox = 1 - prev_min / MAX_DIST
+        terms = {}
+
+        terms["kill"] = np.where(delta > 0, 2.0 * delta + 0.8 * delta * (1 + prox), 0.0)
+        terms["action"] = frames * (np.where(actions == 0, 0.99, 0.0) - np.where(actions == 4, 0.02 + 0.1 * (delta == 0), 0.0))
+
+        new_min = nearest_distance(dist, valid)
+        dodge = np.clip((new_min - prev_min) / MAX_DIST * 0.8 * (1 + prox), -0.05, 0.05)
+        terms["dodge"] = np.where(any_asteroids, dodge, 0.0)
+
+        px, py = player_pos[:, 0], player_pos[:, 1]
+        margin = self.border_margin
+        border = (px < margin) | (px > SCREEN_WIDTH - margin) | (py < margin) | (py > SCREEN_HEIGHT - margin)
+        terms["border"] = frames * np.where(any_asteroids & border, -10.0, 0.0)
+
+        path_dist = segment_distance(px, py, path)
+        in_path = valid & (path_dist < self.danger_threshold)
+        terms["path_danger"] = frames * (-2.0 * in_path.sum(axis=1))
+        terms["death"] = np.where(done, -100.0, 0.0)
+
+        kill_bonus = np.where(in_path, 10.0 * (path_dist / self.danger_threshold), 0.0).sum(axis=1)
+        terms["path_kill"] = np.where(delta > 0, kill_bonus, 0.0)
+
+        total = sum(terms[name] for name in self.TERMS)
+        return total, terms
+
+    def compute_one(self, action, delta, done, prev_min, px, py, dist, path, frames=1):
+        """
+        compute() for a single game, with the per-game terms in plain Python
+        so a step does not pay for dozens of tiny array operations; dist and
+        path hold only live asteroids. Returns (total, terms) as floats.
+        The terms must stay the same as compute()'s.
+        """
+        prox = 1 - prev_min / MAX_DIST
+        terms = dict.fromkeys(self.TERMS, 0.0)
+        if delta > 0:
+            terms["kill"] = 2.0 * delta + 0.8 * delta * (1 + prox)
+        if action == 0:
+            terms["action"] = frames * 0.99
+        elif action == 4:
+            terms["action"] = frames * -(0.02 + 0.1 * (delta == 0))
+        if len(dist):
+            new_min = float(dist.min())
+            terms["dodge"] = min(0.05, max(-0.05, (new_min - prev_min) / MAX_DIST * 0.8 * (1 + prox)))
+            margin = self.border_margin
+            if px < margin or px > SCREEN_WIDTH - margin or py < margin or py > SCREEN_HEIGHT - margin:
+                terms["border"] = frames * -10.0
+            path_dist = segment_distance(np.array([px]), np.array([py]), path[None])[0]
+            close = path_dist[path_dist < self.danger_threshold]
+            terms["path_danger"] = frames * (-2.0 * len(close))
+            if delta > 0:
+                terms["path_kill"] = float((10.0 * (close / self.danger_threshold)).sum())
+        if done:
+            terms["death"] = -100.0
+        total = sum(terms[name] for name in self.TERMS)
+        return total, terms
@@ -1,23 +1,55 @@
 # run.py
+#
+#   python run.py                                  watch one rendered episode
+#   python run.py --episodes 200 [--workers 4]     headless evaluation; any other
+#                                                  evaluate.py option is passed on
+#
+# A policy trained on another observation than dict or flat, or with top_k,
+# needs the options it was trained with (--obs-mode rays --n-rays 32,
+# --obs-mode pixels, --top-k 16 --rank-by distance, ...), as for evaluate.py.
 
-import glob, os
+import argparse
+import sys
+from gymnasium import spaces
 from stable_baselines3 import PPO
 from asteroid_shooter_env import AsteroidShooterEnv
+from evaluate import add_env_arguments, env_kwargs_from_args, find_latest_model, main as evaluate_main
 
-def find_latest_model(pattern="ppo_asteroids*.zip"):
-    files = glob.glob(pattern)
-    if not files:
-        raise FileNotFoundError("No saved model found matching " + pattern)
-    return max(files, key=os.path.getmtime)
+def describe_space(space):
+    if isinstance(space, spaces.Dict):
+        return f"a Dict of {', '.join(space.spaces)}"
+    return f"a {space.dtype} Box of shape {space.shape}"
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    parser = argparse.ArgumentParser(description="Watch or evaluate the latest saved model")
+    parser.add_argument("--episodes", type=int, default=None,
+                        help="evaluate over this many seeded headless episodes instead of watching one")
+    add_env_arguments(parser)
+    args, _ = parser.parse_known_args(argv)
+    if args.episodes:
+        evaluate_main(argv)
+        return
 
-def main():
     # 1) Find and load the latest model
     path = find_latest_model()
     model = PPO.load(path)
     print(f"Loaded model from: {path}")
 
     # 2) Create a raw (non-vectorized) game environment
-    env = AsteroidShooterEnv()
+    # without --obs-mode, models trained on the flat observation expect a
+    # Box, older ones the Dict; rays and pixel policies are Boxes too, which
+    # only the options can tell apart
+    env_kwargs = env_kwargs_from_args(args)
+    env_kwargs.setdefault("obs_mode", "flat" if isinstance(model.observation_space, spaces.Box) else "dict")
+    env = AsteroidShooterEnv(**env_kwargs)
+    if env.observation_space != model.observation_space:
+        env.close()
+        raise ValueError(
+            f"{path} expects {describe_space(model.observation_space)}, but {env_kwargs} observes "
+            f"{describe_space(env.observation_space)}; pass the --obs-mode / --n-rays / --pixel-size / "
+            f"--frame-stack / --top-k / --rank-by options the model was trained with"
+        )
 
     # 3) Reset and get the first observation
     obs, _ = env.reset()
@@ -0,0 +1,213 @@
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import numpy as np
+from stable_baselines3.common.env_util import is_wrapped
+from stable_baselines3.common.vec_env import SubprocVecEnv, VecEnv
+from stable_baselines3.common.vec_env.base_vec_env import CloudpickleWrapper
+from stable_baselines3.common.vec_env.util import dict_to_obs, obs_space_info
+
+# the two alternating observation buffers; the learner says which one a step writes
+_OBS_SLOTS = ("obs0", "obs1")
+# every array starts on a cache line
+_ALIGN = 64
+
+
+def _layout(observation_space, action_space, n_envs):
+    # {(part, key): (offset, shape, dtype)} of every array in the shared
+    # block, and the block's size; observation parts are indexed by the
+    # observation keys of obs_space_info, the others by None
+    keys, shapes, dtypes = obs_space_info(observation_space)
+    arrays = [((part, key), (n_envs,) + shapes[key], dtypes[key])
+              for part in _OBS_SLOTS + ("terminal",) for key in keys]
+    arrays += [
+        (("actions", None), (n_envs,) + action_space.shape, action_space.dtype),
+        (("rewards", None), (n_envs,), np.float32),
+        (("dones", None), (n_envs,), np.bool_),
+    ]
+    layout, size = {}, 0
+    for name, shape, dtype in arrays:
+        dtype = np.dtype(dtype)
+        layout[name] = (size, shape, dtype)
+        size += -(-int(np.prod(shape)) * dtype.itemsize // _ALIGN) * _ALIGN
+    return layout, max(size, 1)
+
+
+def _views(buf, layout):
+    return {name: np.ndarray(shape, dtype, buffer=buf, offset=offset)
+            for name, (offset, shape, dtype) in layout.items()}
+
+
+def _write(arrays, keys, part, index, observation):
+    # one env's observation into its row of the observation part
+    for key in keys:
+        arrays[part, key][index] = observation if key is None else observation[key]
+
+
+def _worker(remote, parent_remote, env_fn_wrapper, index):
+    # SubprocVecEnv's worker, except that step and reset put observations,
+    # rewards and dones into row index of the shared block instead of
+    # sending them back
+    parent_remote.close()
+    env = env_fn_wrapper.var()
+    shm, arrays, keys = None, None, None
+    try:
+        while True:
+            cmd, data = remote.recv()
+            if cmd == "step":
+                observation, reward, terminated, truncated, info = env.step(arrays["actions", None][index])
+                done = terminated or truncated
+                info["TimeLimit.truncated"] = truncated and not terminated
+                reset_info = None
+                if done:
+                    # the final observation stays in the shared block, the
+                    # learner adds a copy as info["terminal_observation"]
+                    _write(arrays, keys, "terminal", index, observation)
+                    observation, reset_info = env.reset()
+                _write(arrays, keys, _OBS_SLOTS[data], index, observation)
+                arrays["rewards", None][index] = reward
+                arrays["dones", None][index] = done
+                remote.send((info, reset_info))
+            elif cmd == "reset":
+                seed, options, slot = data
+                observation, reset_info = env.reset(seed=seed, **({"options": options} if options else {}))
+                _write(arrays, keys, _OBS_SLOTS[slot], index, observation)
+                remote.send(reset_info)
+            elif cmd == "attach":
+                name, layout, keys = data
+                shm = shared_memory.SharedMemory(name)
+                arrays = _views(shm.buf, layout)
+                remote.send(None)
+            elif cmd == "render":
+                remote.send(env.render())
+            elif cmd == "close":
+                env.close()
+                remote.close()
+                break
+            elif cmd == "get_spaces":
+                remote.send((env.observation_space, env.action_space))
+            elif cmd == "env_method":
+                method = env.get_wrapper_attr(data[0])
+                remote.send(method(*data[1], **data[2]))
+            elif cmd == "get_attr":
+                remote.send(env.get_wrapper_attr(data))
+            elif cmd == "has_attr":
+                try:
+                    env.get_wrapper_attr(data)
+                    remote.send(True)
+                except AttributeError:
+                    remote.send(False)
+            elif cmd == "set_attr":
+                remote.send(setattr(env, data[0], data[1]))
+            elif cmd == "is_wrapped":
+                remote.send(is_wrapped(env, data))
+            else:
+                raise NotImplementedError(f"`{cmd}` is not implemented in the worker")
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        arrays = None
+        if shm is not None:
+            shm.close()
+
+
+class SharedMemoryVecEnv(SubprocVecEnv):
+    """
+    A SubprocVecEnv, one env per worker process, whose steps do not send
+    observations through the pipes.
+
+    All workers share one block of shared memory that holds, per env, a row
+    of every observation key (twice, see below), of its last terminal
+    observation, and its action, reward and done. step_async writes the
+    actions into the block and sends every worker just the index of the
+    observation buffer to fill; a worker steps its env, writes its row and
+    answers with the env's info dict only. The observations step_wait and
+    reset return are views of the block, nothing is unpickled or stacked.
+
+    Like AsteroidBatchVecEnv's, those observations alternate between two
+    buffers, so one stays valid until the step after next, which covers how
+    Stable-Baselines3 keeps _last_obs across env.step(). Rewards and dones
+    are returned as copies, terminal observations as copies in
+    info["terminal_observation"]. Everything else (get_attr, env_method,
+    render, close) goes through the pipes as with SubprocVecEnv.
+    """
+
+    def __init__(self, env_fns, start_method=None):
+        # SubprocVecEnv.__init__, with this module's worker
+        self.waiting = False
+        self.closed = False
+        if start_method is None:
+            start_method = "forkserver" if "forkserver" in mp.get_all_start_methods() else "spawn"
+        ctx = mp.get_context(start_method)
+
+        self.remotes, self.work_remotes = zip(*[ctx.Pipe() for _ in env_fns])
+        self.processes = []
+        for index, (work_remote, remote, env_fn) in enumerate(zip(self.work_remotes, self.remotes, env_fns)):
+            args = (work_remote, remote, CloudpickleWrapper(env_fn), index)
+            # daemon=True: if the main process crashes, we should not cause things to hang
+            process = ctx.Process(target=_worker, args=args, daemon=True)
+            process.start()
+            self.processes.append(process)
+            work_remote.close()
+
+        self.remotes[0].send(("get_spaces", None))
+        observation_space, action_space = self.remotes[0].recv()
+
+        self._keys = obs_space_info(observation_space)[0]
+        layout, size = _layout(observation_space, action_space, len(env_fns))
+        self._shm = shared_memory.SharedMemory(create=True, size=size)
+        self._arrays = _views(self._shm.buf, layout)
+        for remote in self.remotes:
+            remote.send(("attach", (self._shm.name, layout, self._keys)))
+        for remote in self.remotes:
+            remote.recv()
+        # observation buffer the last step or reset wrote
+        self._slot = 0
+
+        VecEnv.__init__(self, len(env_fns), observation_space, action_space)
+
+    def _obs(self):
+        part = _OBS_SLOTS[self._slot]
+        return dict_to_obs(self.observation_space, {key: self._arrays[part, key] for key in self._keys})
+
+    def step_async(self, actions):
+        self._arrays["actions", None][...] = actions
+        self._slot ^= 1
+        for remote in self.remotes:
+            remote.send(("step", self._slot))
+        self.waiting = True
+
+    def step_wait(self):
+        results = [remote.recv() for remote in self.remotes]
+        self.waiting = False
+        dones = self._arrays["dones", None].copy()
+        infos = []
+        for i, (info, reset_info) in enumerate(results):
+            if dones[i]:
+                self.reset_infos[i] = reset_info
+                terminal = {key: self._arrays["terminal", key][i].copy() for key in self._keys}
+                info["terminal_observation"] = dict_to_obs(self.observation_space, terminal)
+            infos.append(info)
+        return self._obs(), self._arrays["rewards", None].copy(), dones, infos
+
+    def reset(self):
+        self._slot ^= 1
+        for env_idx, remote in enumerate(self.remotes):
+            remote.send(("reset", (self._seeds[env_idx], self._options[env_idx], self._slot)))
+        self.reset_infos = [remote.recv() for remote in self.remotes]
+        # Seeds and options are only used once
+        self._reset_seeds()
+        self._reset_options()
+        return self._obs()
+
+    def close(self):
+        if self.closed:
+            return
+        super().close()
+        self._arrays = None
+        try:
+            self._shm.close()
+        except BufferError:
+            # observations handed out still point into the block; the mapping
+            # goes away with them, unlinking below already frees the name
+            pass
+        self._shm.unlink()
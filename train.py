@@ -5,12 +5,158 @@ from stable_baselines3.common.vec_env import DummyVecEnv
 from stable_baselines3.common.monitor import Monitor
 from stable_baselines3.common.callbacks import BaseCallback, CallbackList
 from asteroid_shooter_env import AsteroidShooterEnv   
+from batch_env import AsteroidBatchVecEnv
+from viewer import AsyncViewer
+from export_policy import to_numpy_policy
+from pipeline import PipelinedPPO, PipelinedVecEnv
+from shm_vec_env import SharedMemoryVecEnv
+
+# number of games simulated in lockstep by AsteroidBatchVecEnv;
+# 0 trains on a single AsteroidShooterEnv in a DummyVecEnv
+N_BATCH_ENVS = 0
+# number of headless AsteroidShooterEnv worker processes for a
+# SharedMemoryVecEnv (observations come back through shared memory instead of
+# pipes), used when N_BATCH_ENVS is 0; 0 keeps the single in-process env
+N_SUBPROC_ENVS = 0
+# number of headless AsteroidShooterEnvs collected with PipelinedPPO, used
+# when N_BATCH_ENVS is 0: they step in two groups, in PIPELINE_WORKERS
+# ("thread" or "process") workers, while the policy infers on the other
+# group; takes precedence over N_SUBPROC_ENVS, 0 disables it
+N_PIPELINED_ENVS = 0
+PIPELINE_WORKERS = "process"
+# physics frames each policy decision is held for (AsteroidShooterEnv action_repeat)
+ACTION_REPEAT = 1
+# observation the policy trains on: "flat" (every field in one vector),
+# "rays" (N_RAYS egocentric ray sensors, not available for the batch env) or
+# "pixels" (FRAME_STACK stacked PIXEL_SIZE images, trained with CnnPolicy)
+OBS_MODE = "flat"
+N_RAYS = 32
+PIXEL_SIZE = (84, 84)
+FRAME_STACK = 4
+# observe only the TOP_K most relevant asteroids by RANK_BY ("distance",
+# "time_to_impact" or "path_danger"); None observes all of them in spawn order
+TOP_K = None
+RANK_BY = None
+# asteroid field difficulty of every training env, an
+# asteroids.difficulty.DifficultySchedule; None plays the fixed defaults.
+# With CURRICULUM_LENGTHS = (low, high) a CurriculumCallback moves the
+# schedule's level from easy towards hard while the agent's mean episode
+# length is above high, and back while it is below low
+DIFFICULTY = None
+CURRICULUM_LENGTHS = None
+# e.g., importing both from asteroids.difficulty,
+#      DIFFICULTY = DifficultySchedule(
+#          easy=Difficulty(spawn_interval=2.0, speed_max=60, max_asteroids=4),
+#          hard=Difficulty(spawn_interval=0.4, speed_min=60, speed_max=140, max_asteroids=12))
+#      CURRICULUM_LENGTHS = (300, 900)
+# watching training: frames per second the viewer process draws at most, and
+# how often an episode is shown (1 = every episode); None trains without a window
+VIEWER_FPS = 30
+VIEWER_EVERY_N_EPISODES = 1
+# time every stage of AsteroidShooterEnv.step and log them to tensorboard
+# (StageTimingCallback); not available for the batch env
+PROFILE_STAGES = False
+# append every episode of the first env to this file, to replay or re-simulate
+# bad episodes afterwards with recording.py; None records nothing. Not
+# available for the batch env
+RECORD_EPISODES = None
+
+class ViewerCallback(BaseCallback):
+    """ Sends frames of the first env to an AsyncViewer, which drops what it cannot keep up with. """
+    def __init__(self, fps=30, every_n_episodes=1, verbose=0):
+        super().__init__(verbose)
+        self.fps = fps
+        self.every_n_episodes = every_n_episodes
+        self.viewer = None
+
+    def _on_training_start(self) -> None:
+        self.viewer = AsyncViewer(self.fps, self.every_n_episodes)
+
+    def _on_step(self) -> bool:
+        if self.viewer.wants_frame():
+            self.viewer.publish(self.training_env.env_method("snapshot", indices=[0])[0])
+        if self.locals["dones"][0]:
+            self.viewer.episode_done()
+        return True
+
+    def _on_training_end(self) -> None:
+        self.viewer.close()
+        if self.verbose:
+            print(f"Viewer showed {self.viewer.shown} frames, dropped {self.viewer.dropped}")
+
+class StageTimingCallback(BaseCallback):
+    """
+    Logs the per-stage step timings envs report in info["stage_times"], once
+    per rollout, along with the sprite pool overflows of info["pool_overflows"].
+    """
+    def __init__(self, verbose=0):
+        super().__init__(verbose)
+        self.samples = {}
+        self.overflows = {}
 
-class RenderCallback(BaseCallback):
-    """ Renders the first env in the VecEnv each step. """
     def _on_step(self) -> bool:
-        env = self.training_env.envs[0]
-        env.render()
+        for i, info in enumerate(self.locals.get("infos", [])):
+            for stage, seconds in info.get("stage_times", {}).items():
+                self.samples.setdefault(stage, []).append(seconds * 1e6)
+            for kind, n in info.get("pool_overflows", {}).items():
+                # counters are per env and only ever grow
+                self.overflows[kind, i] = n
+        return True
+
+    def _on_rollout_end(self) -> None:
+        for stage, us in self.samples.items():
+            us = np.asarray(us)
+            self.logger.record(f"stages/{stage}_mean_us", float(us.mean()), exclude="stdout")
+            self.logger.record(f"stages/{stage}_p50_us", float(np.percentile(us, 50)), exclude="stdout")
+            self.logger.record(f"stages/{stage}_p99_us", float(np.percentile(us, 99)), exclude="stdout")
+            self.logger.record(f"stages/{stage}_us", us, exclude=("stdout", "log", "json", "csv"))
+        self.samples = {}
+        totals = {}
+        for (kind, _), n in self.overflows.items():
+            totals[kind] = totals.get(kind, 0) + n
+        for kind, n in totals.items():
+            self.logger.record(f"pools/{kind}_overflows", n, exclude="stdout")
+
+class CurriculumCallback(BaseCallback):
+    """
+    Moves the difficulty level of every training env with the agent's
+    rolling performance: after every `window` finished episodes the level
+    goes up by `step` when their mean length (steps survived) is above
+    high, and down when it is below low. The envs pick it up through
+    set_difficulty, AsteroidShooterEnvs from their next episode on.
+    """
+    def __init__(self, low, high, window=20, step=0.05, level=0.0, verbose=0):
+        super().__init__(verbose)
+        self.low = low
+        self.high = high
+        self.window = window
+        self.step = step
+        self.level = level
+        self.lengths = []
+
+    def _on_training_start(self) -> None:
+        self.training_env.env_method("set_difficulty", level=self.level)
+
+    def _on_step(self) -> bool:
+        for info in self.locals.get("infos", []):
+            ep = info.get("episode")
+            if ep is not None:
+                self.lengths.append(ep["l"])
+        if len(self.lengths) >= self.window:
+            mean_length = float(np.mean(self.lengths))
+            self.lengths = []
+            if mean_length > self.high:
+                level = min(1.0, self.level + self.step)
+            elif mean_length < self.low:
+                level = max(0.0, self.level - self.step)
+            else:
+                level = self.level
+            if level != self.level:
+                self.level = level
+                self.training_env.env_method("set_difficulty", level=level)
+                if self.verbose:
+                    print(f"Curriculum level {level:.2f} (mean episode length {mean_length:.0f})")
+            self.logger.record("curriculum/level", self.level)
         return True
 
 class RewardCallback(BaseCallback):
@@ -32,13 +178,41 @@ class RewardCallback(BaseCallback):
 
 def main():
     # 1) Vectorized env with Monitor to collect 'episode' info
-    env = DummyVecEnv([
-        lambda: Monitor(AsteroidShooterEnv())
-    ])
+    # the flat observation is one contiguous float32 vector per step, so the
+    # rollout buffer stores a single array and a plain MlpPolicy can be used.
+    # obs_views skips a copy per step: every VecEnv below copies observations
+    # out before the next step, and the env copies the observation ending an
+    # episode itself, so info["terminal_observation"] survives the reset
+    if N_BATCH_ENVS:
+        # reports Monitor-style episode info itself
+        env = AsteroidBatchVecEnv(N_BATCH_ENVS, obs_mode=OBS_MODE, top_k=TOP_K, rank_by=RANK_BY,
+                                  pixel_size=PIXEL_SIZE, frame_stack=FRAME_STACK, difficulty=DIFFICULTY)
+    elif N_PIPELINED_ENVS or N_SUBPROC_ENVS:
+        make_envs = [
+            lambda record=(RECORD_EPISODES if i == 0 else None):
+                Monitor(AsteroidShooterEnv(obs_views=True, obs_mode=OBS_MODE, n_rays=N_RAYS, pixel_size=PIXEL_SIZE,
+                                           frame_stack=FRAME_STACK, headless=True,
+                                           action_repeat=ACTION_REPEAT, profile=PROFILE_STAGES, record=record,
+                                           top_k=TOP_K, rank_by=RANK_BY, difficulty=DIFFICULTY))
+            for i in range(N_PIPELINED_ENVS or N_SUBPROC_ENVS)
+        ]
+        # one game per worker, or two groups of games stepping in turns
+        if N_PIPELINED_ENVS:
+            env = PipelinedVecEnv(make_envs, workers=PIPELINE_WORKERS)
+        else:
+            env = SharedMemoryVecEnv(make_envs)
+    else:
+        env = DummyVecEnv([
+            lambda: Monitor(AsteroidShooterEnv(obs_views=True, obs_mode=OBS_MODE, n_rays=N_RAYS, pixel_size=PIXEL_SIZE,
+                                               frame_stack=FRAME_STACK, headless=True,
+                                               action_repeat=ACTION_REPEAT, profile=PROFILE_STAGES,
+                                               record=RECORD_EPISODES, top_k=TOP_K, rank_by=RANK_BY,
+                                               difficulty=DIFFICULTY))
+        ])
 
-    # 2) PPO model
-    model = PPO(
-        policy="MultiInputPolicy",
+    # 2) PPO model, collecting with PipelinedPPO on the pipelined envs
+    model = (PipelinedPPO if N_PIPELINED_ENVS and not N_BATCH_ENVS else PPO)(
+        policy="CnnPolicy" if OBS_MODE == "pixels" else "MlpPolicy",
         env=env,
         device="cuda:0",
         policy_kwargs=dict(
@@ -53,19 +227,33 @@ def main():
         tensorboard_log="./ppo_tensorboard/",
     )
 
-    # 3) Train with both Render and Reward callbacks
-    callbacks = CallbackList([RenderCallback(), RewardCallback()])
+    # 3) Train with the Reward callback, watched through the async viewer;
+    # the training envs are headless, only the viewer process opens a window
+    callbacks = [RewardCallback()]
+    if VIEWER_FPS:
+        callbacks.append(ViewerCallback(VIEWER_FPS, VIEWER_EVERY_N_EPISODES))
+    if PROFILE_STAGES:
+        callbacks.append(StageTimingCallback())
+    if CURRICULUM_LENGTHS:
+        # starting from the level the schedule was configured with
+        level = DIFFICULTY.level if DIFFICULTY is not None else 0.0
+        callbacks.append(CurriculumCallback(*CURRICULUM_LENGTHS, level=level, verbose=1))
+    callbacks = CallbackList(callbacks)
     model.learn(
         total_timesteps=10_000_000,
         callback=callbacks,
         tb_log_name="run_1"
     )
 
-    # 4) Save
+    # 4) Save, plus the torch-free actor for policy_runtime.NumpyPolicy
     model.save("ppo_asteroids")
+    # (the NumPy runtime has no convolutions, pixel policies stay torch-only)
+    if OBS_MODE != "pixels":
+        to_numpy_policy(model).save("ppo_asteroids.npz")
 
     # 5) Watch a final rollout
-    play_env = AsteroidShooterEnv()
+    play_env = AsteroidShooterEnv(obs_mode=OBS_MODE, n_rays=N_RAYS, pixel_size=PIXEL_SIZE, frame_stack=FRAME_STACK,
+                                  action_repeat=ACTION_REPEAT, top_k=TOP_K, rank_by=RANK_BY, difficulty=DIFFICULTY)
     obs, _ = play_env.reset()
     done = False
     while not done:
@@ -0,0 +1,101 @@
+import multiprocessing as mp
+import queue
+import time
+import pygame
+from asteroids.constants import *
+from asteroids.player import triangle
+
+
+def draw_snapshot(screen, font, snap):
+    # same picture as MainGameLoop.render, drawn from an asteroids.telemetry.Snapshot
+    screen.fill("black")
+    for x, y, radius in snap.asteroids.tolist():
+        pygame.draw.circle(screen, "white", (x, y), radius, 2)
+    for x, y in snap.shots.tolist():
+        pygame.draw.circle(screen, "white", (x, y), SHOT_RADIUS, 2)
+    px, py, rotation = snap.player
+    pygame.draw.polygon(screen, "white", triangle(pygame.Vector2(px, py), rotation), 2)
+    s1 = font.render(f"Score: {snap.score}", True, pygame.Color('white'))
+    s2 = font.render(f"High : {snap.high_score}", True, pygame.Color('white'))
+    screen.blit(s1, (10, 10))
+    screen.blit(s2, (10, 10 + s1.get_height() + 5))
+
+
+def _viewer_main(frames, fps):
+    # runs in the viewer process: draw whatever snapshot is newest
+    pygame.init()
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption("Asteroids (training)")
+    font = pygame.font.Font(None, 36)
+    clock = pygame.time.Clock()
+    while True:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                return
+        try:
+            snap = frames.get(timeout=0.1)
+        except queue.Empty:
+            continue
+        if snap is None:
+            break
+        draw_snapshot(screen, font, snap)
+        pygame.display.flip()
+        clock.tick(fps)
+    pygame.quit()
+
+
+class AsyncViewer:
+    """
+    Draws training frames in a separate process so rendering never holds up
+    the rollout.
+
+    The trainer offers snapshots with publish(); at most one waits in the
+    queue and any frame the viewer is not ready for is dropped, never waited
+    on. Snapshots are only taken at up to fps per second, and only during
+    every every_n_episodes-th episode (counted with episode_done()), so the
+    cost on the training side is one small pickle per shown frame.
+    """
+
+    def __init__(self, fps=30, every_n_episodes=1):
+        self.fps = fps
+        self.every_n_episodes = every_n_episodes
+        self.episode = 0
+        self.shown = 0
+        self.dropped = 0
+        self._last_publish = 0.0
+        # spawn keeps the trainer's pygame / CUDA state out of the viewer
+        ctx = mp.get_context("spawn")
+        self._frames = ctx.Queue(maxsize=1)
+        self._process = ctx.Process(target=_viewer_main, args=(self._frames, fps), daemon=True)
+        self._process.start()
+
+    def wants_frame(self):
+        # cheap check to make before building a snapshot
+        if self.episode % self.every_n_episodes:
+            return False
+        if not self._process.is_alive():
+            return False
+        return time.perf_counter() - self._last_publish >= 1.0 / self.fps
+
+    def publish(self, snap):
+        self._last_publish = time.perf_counter()
+        try:
+            self._frames.put_nowait(snap)
+            self.shown += 1
+        except queue.Full:
+            self.dropped += 1
+
+    def episode_done(self):
+        self.episode += 1
+
+    def close(self):
+        if self._process.is_alive():
+            try:
+                self._frames.put(None, timeout=1.0)
+            except queue.Full:
+                pass
+            self._process.join(timeout=2.0)
+            if self._process.is_alive():
+                self._process.terminate()
+        self._frames.close()